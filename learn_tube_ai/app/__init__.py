@@ -1,10 +1,13 @@
 from flask import Flask
 from dotenv import load_dotenv
+import logging
 import os
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS # <--- IMPORT IT HERE
 
+logger = logging.getLogger(__name__)
+
 # Initialize extensions (outside the factory function so they are globally accessible)
 db = SQLAlchemy()
 migrate = Migrate()
@@ -23,12 +26,44 @@ def create_app():
     CORS(app) # <--- INITIALIZE IT HERE
     # -----------------------
 
+    # --- Logging / Metrics / Tracing (GET /metrics) ---
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+    app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'text') # 'text' or 'json' (one object per line)
+    app.config['OTEL_ENABLED'] = os.environ.get('OTEL_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['OTEL_SERVICE_NAME'] = os.environ.get('OTEL_SERVICE_NAME', 'learn_tube_ai')
+    from . import observability
+    observability.init_app(app)
+    # --------------------------------------------------
+
     # --- Database Configuration ---
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(app.instance_path, 'learn_tube_ai.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Compression of transcript segments written from now on: 'none', 'zlib' or 'zstd' (needs the zstandard package).
+    app.config['SEGMENTS_COMPRESSION'] = os.environ.get('SEGMENTS_COMPRESSION', 'none')
+    app.config['SEGMENTS_ZSTD_LEVEL'] = int(os.environ.get('SEGMENTS_ZSTD_LEVEL', 3))
+    from .services import segment_codec
+    segment_codec.init_app(app)
     # -----------------------------
 
+    # --- Request Size Limit (also caps transcript_file uploads to /api/process_video_with_custom_transcript) ---
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+    # ------------------------------------------------------------------------------------------------------
+
+    # --- Background Job Configuration ---
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+    app.config['JOB_STALE_SECONDS'] = int(os.environ.get('JOB_STALE_SECONDS', 900)) # queued/running this long without a heartbeat -> failed
+    app.config['JOB_HEARTBEAT_SECONDS'] = int(os.environ.get('JOB_HEARTBEAT_SECONDS', 30)) # how often a process stamps the jobs it holds
+    # ------------------------------------
+
+    # --- Batch Ingestion Configuration (/api/process_videos and `flask ingest`) ---
+    app.config['INGEST_PARALLELISM'] = int(os.environ.get('INGEST_PARALLELISM', 4))
+    app.config['INGEST_PARALLELISM_MAX'] = int(os.environ.get('INGEST_PARALLELISM_MAX', 16))
+    app.config['INGEST_RATE_PER_SECOND'] = float(os.environ.get('INGEST_RATE_PER_SECOND', 1.0)) # transcript fetches started per second
+    app.config['INGEST_BATCH_SIZE'] = int(os.environ.get('INGEST_BATCH_SIZE', 50)) # videos per DB transaction
+    app.config['INGEST_MAX_URLS'] = int(os.environ.get('INGEST_MAX_URLS', 1000))
+    # -----------------------------------------------------------------------------
+
     # Initialize other extensions with the app
     db.init_app(app)
     migrate.init_app(app, db)
@@ -40,19 +75,126 @@ def create_app():
         pass 
     # ------------------------------------
 
+    # --- LLM Provider (GET /api/llm/stats) ---
+    # LLM_PROVIDER: 'auto' (real Anthropic client if ANTHROPIC_API_KEY is set and the SDK is installed,
+    # otherwise the mock), 'anthropic' or 'mock'. The client is created on the first LLM call.
+    app.config['LLM_PROVIDER'] = os.environ.get('LLM_PROVIDER', 'auto')
+    app.config['ANTHROPIC_API_KEY'] = os.environ.get('ANTHROPIC_API_KEY')
+    app.config['LLM_MODEL'] = os.environ.get('LLM_MODEL', 'claude-3-haiku-20240307')
+    app.config['LLM_TIMEOUT'] = float(os.environ.get('LLM_TIMEOUT', 60))
+    app.config['LLM_MAX_IN_FLIGHT'] = int(os.environ.get('LLM_MAX_IN_FLIGHT', 8)) # concurrent LLM calls across the process
+    app.config['LLM_QUEUE_MAX_WAIT'] = float(os.environ.get('LLM_QUEUE_MAX_WAIT', 30)) # seconds a call may wait before it is shed (503)
+    app.config['LLM_TOKENS_PER_MINUTE'] = int(os.environ.get('LLM_TOKENS_PER_MINUTE', 0)) # 0 = no token budget
+    app.config['LLM_MOCK_LATENCY'] = float(os.environ.get('LLM_MOCK_LATENCY', 0.5)) # simulated latency / failures of the mock (benchmarks)
+    app.config['LLM_MOCK_JITTER'] = float(os.environ.get('LLM_MOCK_JITTER', 0.5))
+    app.config['LLM_MOCK_ERROR_RATE'] = float(os.environ.get('LLM_MOCK_ERROR_RATE', 0.0))
+    # Transcripts longer than LLM_CHUNK_MAX_CHARS are analyzed in chunks (at most LLM_CHUNK_MAX_SECONDS of video each), in parallel.
+    app.config['LLM_CHUNK_MAX_CHARS'] = int(os.environ.get('LLM_CHUNK_MAX_CHARS', 12000))
+    app.config['LLM_CHUNK_MAX_SECONDS'] = float(os.environ.get('LLM_CHUNK_MAX_SECONDS', 600))
+    app.config['LLM_CHUNK_CONCURRENCY'] = int(os.environ.get('LLM_CHUNK_CONCURRENCY', 4)) # chunk calls in flight per analysis
+    from .services.llm_service import llm_client
+    llm_client.init_app(app)
+    # -------------------------------------------
+
+    # --- LLM Result Cache ---
+    # In-memory LRU in front of a SQLite file so cached analyses survive restarts.
+    # Set LLM_CACHE_SQLITE_PATH to an empty string to keep the cache in memory only.
+    app.config['LLM_CACHE_MAX_ENTRIES'] = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1024))
+    app.config['LLM_CACHE_TTL_SECONDS'] = float(os.environ['LLM_CACHE_TTL_SECONDS']) if os.environ.get('LLM_CACHE_TTL_SECONDS') else None
+    app.config['LLM_CACHE_SQLITE_PATH'] = os.environ.get('LLM_CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'llm_cache.db'))
+    from .services.llm_cache import llm_cache
+    llm_cache.init_app(app)
+    # ------------------------
+
+    # --- HTTP Caching / Compression ---
+    app.config['VIDEO_CACHE_MAX_AGE'] = int(os.environ.get('VIDEO_CACHE_MAX_AGE', 0)) # seconds; clients revalidate with ETag after that
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024)) # bytes; smaller JSON bodies are sent as-is
+    # Cache-hit responses of /api/process_video and /api/videos/<id> are stored pre-serialized (and pre-gzipped) per video.
+    app.config['VIDEO_PAYLOAD_CACHE'] = os.environ.get('VIDEO_PAYLOAD_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    app.config['VIDEO_PAYLOAD_GZIP_LEVEL'] = int(os.environ.get('VIDEO_PAYLOAD_GZIP_LEVEL', 6)) # 0 = store identity bodies only
+    from . import http_cache
+    http_cache.init_app(app)
+    # ---------------------------------
+
+    # --- YouTube Transcript Fetcher ---
+    app.config['YOUTUBE_TIMEOUT'] = float(os.environ.get('YOUTUBE_TIMEOUT', 10)) # seconds per HTTP request
+    app.config['YOUTUBE_POOL_SIZE'] = int(os.environ.get('YOUTUBE_POOL_SIZE', 10)) # keep-alive connections shared by all threads
+    app.config['YOUTUBE_RATE_PER_SECOND'] = float(os.environ.get('YOUTUBE_RATE_PER_SECOND', 2.0))
+    app.config['YOUTUBE_MAX_RETRIES'] = int(os.environ.get('YOUTUBE_MAX_RETRIES', 3))
+    app.config['YOUTUBE_BACKOFF_BASE'] = float(os.environ.get('YOUTUBE_BACKOFF_BASE', 0.5))
+    app.config['YOUTUBE_BACKOFF_MAX'] = float(os.environ.get('YOUTUBE_BACKOFF_MAX', 8.0))
+    app.config['YOUTUBE_BREAKER_THRESHOLD'] = int(os.environ.get('YOUTUBE_BREAKER_THRESHOLD', 5))
+    app.config['YOUTUBE_BREAKER_RESET_SECONDS'] = float(os.environ.get('YOUTUBE_BREAKER_RESET_SECONDS', 60))
+    app.config['YOUTUBE_BASE_URL'] = os.environ.get('YOUTUBE_BASE_URL') # e.g. http://127.0.0.1:8765 to use a local stub server
+    from .services.youtube_fetcher import youtube_fetcher
+    youtube_fetcher.init_app(app)
+    # ---------------------------------
+
+    # --- Transcript Languages (?languages=de,en on the video endpoints) ---
+    app.config['TRANSCRIPT_LANGUAGES'] = os.environ.get('TRANSCRIPT_LANGUAGES', 'en,en-US,en-GB') # default preference chain
+    app.config['TRANSCRIPT_TRANSLATION_FALLBACK'] = os.environ.get('TRANSCRIPT_TRANSLATION_FALLBACK', 'true').lower() in ('1', 'true', 'yes') # translate when no chain language exists
+    app.config['TRANSCRIPT_LISTING_TTL_SECONDS'] = int(os.environ.get('TRANSCRIPT_LISTING_TTL_SECONDS', 24 * 3600)) # cached transcript lists per video
+    from .services.transcript_languages import transcript_languages
+    transcript_languages.init_app(app)
+    # ----------------------------------------------------------------------
+
+    # --- Transcript Embeddings (semantic retrieval, /api/videos/<id>/retrieve) ---
+    app.config['EMBEDDING_DIR'] = os.environ.get('EMBEDDING_DIR', os.path.join(app.instance_path, 'embeddings')) # one .npy + .json per video
+    app.config['EMBEDDING_BACKEND'] = os.environ.get('EMBEDDING_BACKEND', 'hashing') # 'hashing' or 'sentence-transformers'
+    app.config['EMBEDDING_MODEL'] = os.environ.get('EMBEDDING_MODEL') # sentence-transformers model name
+    app.config['EMBEDDING_DIM'] = int(os.environ.get('EMBEDDING_DIM', 512)) # hashing embedder only
+    app.config['EMBEDDING_WINDOW_SEGMENTS'] = int(os.environ.get('EMBEDDING_WINDOW_SEGMENTS', 6)) # segments per window
+    app.config['EMBEDDING_WINDOW_STRIDE'] = int(os.environ.get('EMBEDDING_WINDOW_STRIDE', 3))
+    app.config['EMBEDDING_MAX_LOADED'] = int(os.environ.get('EMBEDDING_MAX_LOADED', 64)) # videos kept memory-mapped
+    from .services.embedding_service import embedding_index
+    embedding_index.init_app(app)
+    # ---------------------------------------------------------------------------
+
+    # --- Explain Context (/api/explain_text) ---
+    app.config['EXPLAIN_CONTEXT_BEFORE'] = int(os.environ.get('EXPLAIN_CONTEXT_BEFORE', 3)) # segments before the selection
+    app.config['EXPLAIN_CONTEXT_AFTER'] = int(os.environ.get('EXPLAIN_CONTEXT_AFTER', 3)) # segments after the selection
+    app.config['EXPLAIN_MIN_SIMILARITY'] = float(os.environ.get('EXPLAIN_MIN_SIMILARITY', 0.2)) # cosine score for a semantic match to be used as context
+    app.config['EXPLAIN_INDEX_CACHE_SIZE'] = int(os.environ.get('EXPLAIN_INDEX_CACHE_SIZE', 128)) # videos kept in each in-memory cache
+    from .services.explain_service import explain_context
+    explain_context.init_app(app)
+    # -------------------------------------------
+
+    # Start the background worker pool used by /api/process_video
+    from .services.job_service import job_queue
+    job_queue.init_app(app)
+
+    # --- Prefetch Scheduler (keeps watchlist videos analyzed; GET /api/prefetch/status) ---
+    # Enable it in one process only (e.g. the one running `flask prefetch serve`, or a single web worker).
+    app.config['PREFETCH_ENABLED'] = os.environ.get('PREFETCH_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['PREFETCH_INTERVAL_SECONDS'] = int(os.environ.get('PREFETCH_INTERVAL_SECONDS', 300))
+    app.config['PREFETCH_WINDOW'] = os.environ.get('PREFETCH_WINDOW', '') # off-peak hours, local time, e.g. "01:00-06:00"; empty = any time
+    app.config['PREFETCH_TTL_SECONDS'] = int(os.environ.get('PREFETCH_TTL_SECONDS', 7 * 24 * 3600)) # re-fetch videos older than this
+    app.config['PREFETCH_CONCURRENCY'] = int(os.environ.get('PREFETCH_CONCURRENCY', 2)) # keep below LLM_MAX_IN_FLIGHT
+    app.config['PREFETCH_BATCH_SIZE'] = int(os.environ.get('PREFETCH_BATCH_SIZE', 50)) # videos per pass
+    app.config['PREFETCH_RATE_PER_SECOND'] = float(os.environ.get('PREFETCH_RATE_PER_SECOND', 0.5)) # transcript fetches started per second
+    app.config['PREFETCH_WATCHLIST_FILE'] = os.environ.get('PREFETCH_WATCHLIST_FILE') # optional URL file merged into the watchlist table
+    from .services.prefetch_service import prefetch_scheduler
+    prefetch_scheduler.init_app(app)
+    # ---------------------------------------------------------------------------------------
+
     # Import and register blueprints
     from .routes import main_bp
     app.register_blueprint(main_bp)
 
+    # Register CLI commands (e.g. `flask ingest urls.txt`)
+    from .cli import ingest_command, prefetch_group
+    app.cli.add_command(ingest_command)
+    app.cli.add_command(prefetch_group)
+
     # Import models here so Flask-Migrate can find them
     from . import models 
 
-    print("Flask app created, extensions initialized (including CORS), and blueprint registered.") # Updated print
-    if os.environ.get('ANTHROPIC_API_KEY'):
-        print("ANTHROPIC_API_KEY is SET.")
+    logger.info("Flask app created, extensions initialized (including CORS), and blueprint registered.")
+    if app.config['ANTHROPIC_API_KEY']:
+        logger.info("ANTHROPIC_API_KEY is SET.")
     else:
-        print("ANTHROPIC_API_KEY not found. Using MOCK LLM client (implicitly).")
+        logger.info("ANTHROPIC_API_KEY not found. Using MOCK LLM client (implicitly).")
     
-    print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    logger.info("Database URI: %s", app.config['SQLALCHEMY_DATABASE_URI'])
 
     return app
\ No newline at end of file
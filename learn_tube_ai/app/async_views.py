@@ -0,0 +1,227 @@
+# learn_tube_ai/app/async_views.py
+# Async (ASGI) versions of the endpoints that wait on upstream calls inline. asgi.py routes these
+# paths to the handlers below and mounts the Flask app for everything else, so one worker can keep
+# hundreds of LLM/YouTube calls in flight instead of one per thread.
+# Same URLs and JSON contracts as the Flask views in routes.py.
+import functools
+import json
+import logging
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from sqlalchemy.orm import undefer
+
+from .models import Video
+from .observability import new_request_id, observe_request, request_id_var
+from .services.video_processing_service import (
+    extract_video_id, get_youtube_transcript_async, process_video_for_llm_analysis_async, stream_llm_analysis_async, analysis_error
+)
+from .services.video_store import build_video_response, save_video_results
+from .services.transcript_languages import transcript_languages, parse_languages, choose_stored_language, store_listing
+from .services.custom_text_service import (
+    content_digest, find_custom_text, save_custom_text, build_custom_text_response, CACHED_MESSAGE as CUSTOM_TEXT_CACHED_MESSAGE
+)
+from .services.llm_service import explain_selected_text_async
+from .services.explain_service import build_explain_context
+from .services.singleflight import AsyncSingleFlight
+from .services.llm_providers import LLMOverloadedError
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _llm_overloaded_response(error):
+    return JSONResponse({"error": "LLM service is overloaded. Try again shortly.", "details": str(error), "retry_after": error.retry_after},
+                        status_code=503, headers={"Retry-After": str(int(error.retry_after))})
+
+
+def _observed(route: str):
+    """Request id + latency histogram for a Starlette endpoint, like observability.init_app does for Flask views."""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request: Request):
+            request_id = new_request_id(request.headers.get("X-Request-ID"))
+            request_id_var.set(request_id) # each request runs in its own task, so the value doesn't leak
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = await endpoint(request)
+                status = response.status_code
+                response.headers.setdefault("X-Request-ID", request_id)
+                return response
+            finally:
+                # Streaming responses are observed when their headers are ready, not when the stream ends.
+                observe_request(request.method, route, status, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+async def _json_body(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def build_async_routes(flask_app) -> list:
+    """Starlette routes bound to `flask_app`; database work runs on the threadpool inside its app context."""
+    custom_text_flight = AsyncSingleFlight()
+
+    async def in_app_context(fn, *args, **kwargs):
+        def call():
+            with flask_app.app_context():
+                return fn(*args, **kwargs)
+        return await run_in_threadpool(call)
+
+    def load_cached_video(video_id, languages):
+        language, _ = choose_stored_language(video_id, languages)
+        if language is None:
+            return None
+        video_obj = Video.query.options(undefer(Video.transcript_text), undefer(Video.transcript_segments)).filter_by(video_id=video_id, language=language).first()
+        if video_obj and video_obj.transcript_text:
+            return build_video_response(video_obj, "Video data retrieved from cache.")
+        return None
+
+    def load_custom_text_analysis(digest):
+        custom_text_obj = find_custom_text(digest)
+        return custom_text_obj.analysis if custom_text_obj else None
+
+    def store_custom_text(digest, title, custom_text, analysis_results):
+        try:
+            save_custom_text(digest, title, custom_text, analysis_results)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def save_streamed_video(video_id, video_url, transcript_text, transcript_segments, analysis_results, fetch_result):
+        try:
+            store_listing(video_id, fetch_result["listing"], commit=False) # one transaction with the video
+            return save_video_results(video_id, video_url, transcript_text, transcript_segments, analysis_results,
+                                      language=fetch_result["language"], translated_from=fetch_result["translated_from"]).title
+        except Exception:
+            db.session.rollback()
+            raise
+
+    async def process_video_stream(request: Request):
+        video_url = request.query_params.get('video_url')
+        if not video_url: return JSONResponse({"error": "Missing video_url"}, status_code=400)
+        video_id = extract_video_id(video_url)
+        if not video_id: return JSONResponse({"error": "Invalid YouTube URL", "details": "Could not extract video ID.", "video_url": video_url}, status_code=400)
+        try: languages = transcript_languages.chain(request.query_params.get('languages') or request.query_params.get('language'))
+        except ValueError as e: return JSONResponse({"error": "Invalid languages", "details": str(e)}, status_code=400)
+        logger.info("Streaming video URL: %s -> Extracted video ID: %s", video_url, video_id)
+
+        async def events():
+            payload = await in_app_context(load_cached_video, video_id, languages)
+            if payload:
+                analysis = payload.pop("analysis")
+                yield _sse("transcript", payload)
+                yield _sse("analysis", analysis)
+                yield _sse("done", {"message": payload["message"], "video_id": video_id})
+                return
+
+            yield ": fetching transcript\n\n"
+            fetch_result = await get_youtube_transcript_async(video_id, languages)
+            transcript_text = fetch_result.get("text")
+            transcript_segments = fetch_result.get("segments")
+            if fetch_result.get("error") or not transcript_text:
+                if fetch_result.get("listing"):
+                    await in_app_context(store_listing, video_id, fetch_result["listing"])
+                yield _sse("error", {"error": "Failed to retrieve transcript automatically", "details": fetch_result.get("error") or "Transcript is unavailable or empty.",
+                                     "video_id": video_id, "video_url": video_url, "status": 422})
+                return
+            yield _sse("transcript", {"video_id": video_id, "video_url": video_url, "title": f"Video: {video_id}",
+                                      "language": fetch_result["language"], "translated_from": fetch_result["translated_from"],
+                                      "transcript_text": transcript_text, "segments": transcript_segments or []})
+
+            analysis_results = None
+            try:
+                async for event in stream_llm_analysis_async(video_id, transcript_text, transcript_segments):
+                    if event["type"] == "analysis":
+                        analysis_results = event["analysis"]
+                    else:
+                        yield _sse(event["type"], {key: value for key, value in event.items() if key != "type"})
+            except LLMOverloadedError as e:
+                yield _sse("error", {"error": "LLM service is overloaded. Try again shortly.", "details": str(e), "retry_after": e.retry_after, "status": 503})
+                return
+            yield _sse("analysis", analysis_results)
+            analysis_problem = analysis_error(analysis_results)
+            if analysis_problem:
+                # Not saved: a partial or placeholder analysis would be served as a complete cache hit from now on.
+                if fetch_result.get("listing"):
+                    await in_app_context(store_listing, video_id, fetch_result["listing"])
+                logger.warning("Analysis of %s did not complete, not saving it: %s", video_id, analysis_problem)
+                yield _sse("error", {"error": "LLM analysis did not complete; the video was not saved.", "details": analysis_problem,
+                                     "video_id": video_id, "status": 502})
+                return
+
+            try:
+                title = await in_app_context(save_streamed_video, video_id, video_url, transcript_text, transcript_segments, analysis_results, fetch_result)
+            except Exception as e:
+                logger.error("Database error for %s: %s", video_id, str(e))
+                yield _sse("error", {"error": "Database error after processing video.", "details": str(e), "status": 500})
+                return
+            yield _sse("done", {"message": "Video processed successfully.", "video_id": video_id, "title": title})
+
+        return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    async def explain_text(request: Request):
+        data = await _json_body(request)
+        if not data or 'selected_text' not in data:
+            return JSONResponse({"error": "Missing 'selected_text' in request"}, status_code=400)
+        selected_text = data['selected_text']
+        if not selected_text.strip():
+            return JSONResponse({"error": "Selected text cannot be empty"}, status_code=400)
+
+        try: languages = parse_languages(data.get('languages') or data.get('language'))
+        except ValueError as e: return JSONResponse({"error": "Invalid languages", "details": str(e)}, status_code=400)
+        explain_context = await in_app_context(build_explain_context, selected_text, data.get('current_video_id'), languages)
+        try:
+            explanation_data = await explain_selected_text_async(selected_text, explain_context["prompt_prefix"], explain_context["context_text"])
+        except LLMOverloadedError as e:
+            return _llm_overloaded_response(e)
+        if explanation_data and "explanation" in explanation_data:
+            return JSONResponse({
+                "message": "Explanation generated.",
+                "explanation": explanation_data["explanation"],
+                "original_text": selected_text,
+                "context": explain_context["context"]
+            })
+        return JSONResponse({"error": "Failed to generate explanation", "details": explanation_data.get("error")}, status_code=500)
+
+    async def process_custom_text(request: Request):
+        data = await _json_body(request)
+        if not data or 'custom_text' not in data:
+            return JSONResponse({"error": "Missing 'custom_text' field"}, status_code=400)
+        custom_text = data.get('custom_text')
+        title = data.get('title', 'Custom Text Analysis')
+        if not custom_text.strip():
+            return JSONResponse({"error": "Custom text cannot be empty"}, status_code=400)
+
+        logger.info("Received custom text for analysis. Title: '%s', Length: %s", title, len(custom_text))
+        digest = content_digest(custom_text)
+        stored_analysis = await in_app_context(load_custom_text_analysis, digest)
+        if stored_analysis is not None:
+            return JSONResponse(build_custom_text_response(digest, title, custom_text, stored_analysis, CUSTOM_TEXT_CACHED_MESSAGE))
+        try:
+            analysis_results = await custom_text_flight.do(digest, process_video_for_llm_analysis_async, video_id="custom_text_id", transcript_text=custom_text)
+        except LLMOverloadedError as e:
+            return _llm_overloaded_response(e)
+        try:
+            await in_app_context(store_custom_text, digest, title, custom_text, analysis_results)
+        except Exception as e: # the analysis is still returned; the next submission analyzes again
+            logger.error("Database error storing custom text %s: %s", digest[:12], str(e))
+        return JSONResponse(build_custom_text_response(digest, title, custom_text, analysis_results, "Custom text processed successfully."))
+
+    return [
+        Route('/api/process_video/stream', _observed('/api/process_video/stream')(process_video_stream), methods=['GET']),
+        Route('/api/explain_text', _observed('/api/explain_text')(explain_text), methods=['POST']),
+        Route('/api/process_custom_text', _observed('/api/process_custom_text')(process_custom_text), methods=['POST']),
+    ]
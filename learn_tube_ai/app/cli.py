@@ -0,0 +1,116 @@
+# learn_tube_ai/app/cli.py
+import json
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.command('ingest')
+@click.argument('url_file', type=click.File('r'), required=False)
+@click.option('--url', 'urls', multiple=True, help='A YouTube URL to ingest. Can be repeated.')
+@click.option('--parallelism', type=int, default=None, help='Concurrent transcript fetches/analyses.')
+@click.option('--rate', 'rate_per_second', type=float, default=None, help='Max transcript fetches started per second.')
+@click.option('--batch-size', type=int, default=None, help='Videos written per database transaction.')
+@click.option('--refresh', is_flag=True, help='Re-process videos that are already cached.')
+@click.option('--languages', default=None, help='Transcript language preference chain, e.g. "de,en" (default: TRANSCRIPT_LANGUAGES).')
+@with_appcontext
+def ingest_command(url_file, urls, parallelism, rate_per_second, batch_size, refresh, languages):
+    """Fetch transcripts and analyze many videos at once.
+
+    URL_FILE contains one YouTube URL per line ('-' reads stdin); blank lines and lines starting with '#' are ignored.
+    """
+    from .services.ingest_service import ingest_videos
+    from .services.transcript_languages import parse_languages
+
+    video_urls = list(urls)
+    if url_file:
+        video_urls += [line.strip() for line in url_file if line.strip() and not line.strip().startswith('#')]
+    if not video_urls:
+        raise click.UsageError("Provide a URL file or at least one --url.")
+    try:
+        languages = parse_languages(languages or '') or None
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--languages')
+
+    config = current_app.config
+    results = ingest_videos(
+        video_urls,
+        parallelism=parallelism or config['INGEST_PARALLELISM'],
+        rate_per_second=rate_per_second if rate_per_second is not None else config['INGEST_RATE_PER_SECOND'],
+        batch_size=batch_size or config['INGEST_BATCH_SIZE'],
+        refresh=refresh,
+        languages=languages,
+        report_progress=lambda stage: click.echo(f"  {stage}"),
+    )
+    for result in results:
+        line = f"{result['status']:<10} {result['video_id'] or '-':<12} {result['video_url']}"
+        if result['error']:
+            line += f"  ({result['error']})"
+        click.echo(line)
+    failed = sum(1 for result in results if result['status'] in ('failed', 'invalid'))
+    click.echo(f"Done: {len(results)} URLs, {failed} failed/invalid.")
+
+
+@click.group('prefetch')
+def prefetch_group():
+    """Manage the prefetch watchlist and run the prefetch scheduler."""
+
+
+@prefetch_group.command('add')
+@click.argument('url_file', type=click.File('r'), required=False)
+@click.option('--url', 'urls', multiple=True, help='A YouTube URL to add. Can be repeated.')
+@click.option('--course', default=None, help='Label of the course that assigned the videos.')
+@click.option('--priority', type=int, default=0, help='Higher priorities are prefetched first.')
+@with_appcontext
+def prefetch_add_command(url_file, urls, course, priority):
+    """Add videos to the watchlist. URL_FILE has the same format as for `flask ingest`."""
+    from .services.prefetch_service import add_to_watchlist
+
+    video_urls = list(urls)
+    if url_file:
+        video_urls += [line.strip() for line in url_file if line.strip() and not line.strip().startswith('#')]
+    if not video_urls:
+        raise click.UsageError("Provide a URL file or at least one --url.")
+    result = add_to_watchlist(video_urls, course=course, priority=priority)
+    click.echo(f"Added {len(result['added'])}, updated {len(result['updated'])}, invalid {len(result['invalid'])}.")
+    for video_url in result['invalid']:
+        click.echo(f"invalid    {video_url}")
+
+
+@prefetch_group.command('run')
+@click.option('--respect-window', is_flag=True, help='Do nothing outside PREFETCH_WINDOW.')
+@with_appcontext
+def prefetch_run_command(respect_window):
+    """Run one prefetch pass now (e.g. from cron)."""
+    from .services.prefetch_service import prefetch_scheduler
+
+    result = prefetch_scheduler.run_once(force=not respect_window)
+    if 'skipped' in result:
+        click.echo(f"Skipped: {result['skipped']}.")
+    else:
+        click.echo(f"Done: {result['counts']}")
+
+
+@prefetch_group.command('serve')
+@with_appcontext
+def prefetch_serve_command():
+    """Run the prefetch scheduler in the foreground (a dedicated process instead of PREFETCH_ENABLED in a web worker)."""
+    from .services.prefetch_service import prefetch_scheduler
+
+    prefetch_scheduler.start()
+    try:
+        while prefetch_scheduler.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        prefetch_scheduler.stop()
+
+
+@prefetch_group.command('status')
+@with_appcontext
+def prefetch_status_command():
+    """Show the watchlist's freshness and the scheduler state."""
+    from .services.prefetch_service import prefetch_scheduler
+
+    click.echo(json.dumps(prefetch_scheduler.status(), indent=2))
@@ -0,0 +1,92 @@
+# learn_tube_ai/app/http_cache.py
+# Conditional GET (ETag / Last-Modified) and response compression helpers.
+import gzip
+import hashlib
+from datetime import timezone
+
+from flask import request, current_app
+
+try:
+    import brotli # optional: `pip install brotli` enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
+
+def video_etag(video_obj, variant: str = "") -> str:
+    """Strong ETag for a stored video (row). `variant` distinguishes different projections of the same row."""
+    changed_at = video_obj.updated_at or video_obj.created_at
+    raw = f"{video_obj.video_id}:{video_obj.language}:{changed_at.isoformat() if changed_at else ''}:{variant}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def video_last_modified(video_obj):
+    changed_at = video_obj.updated_at or video_obj.created_at
+    if changed_at is None:
+        return None
+    # Timestamps are stored as naive UTC.
+    return changed_at.replace(tzinfo=timezone.utc) if changed_at.tzinfo is None else changed_at
+
+
+def is_not_modified(etag: str, last_modified=None) -> bool:
+    """True if the request's If-None-Match / If-Modified-Since says the client already has this version."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def add_cache_headers(response, etag: str, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get("VIDEO_CACHE_MAX_AGE", 0)
+    response.cache_control.must_revalidate = True
+    return response
+
+
+def not_modified_response(etag: str, last_modified=None):
+    response = current_app.response_class(status=304)
+    return add_cache_headers(response, etag, last_modified)
+
+
+def _choose_encoding(accept_encoding):
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response):
+    """after_request hook: compresses large JSON bodies with brotli or gzip, as the client allows."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype != "application/json"):
+        return response
+    body = response.get_data()
+    if len(body) < current_app.config.get("COMPRESS_MIN_SIZE", 1024):
+        return response
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=current_app.config.get("COMPRESS_BROTLI_QUALITY", 5))
+    else:
+        compressed = gzip.compress(body, compresslevel=current_app.config.get("COMPRESS_GZIP_LEVEL", 6))
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # The encoded bytes differ from the identity representation, so a strong ETag must not be shared.
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
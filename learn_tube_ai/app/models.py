@@ -1,23 +1,46 @@
 # learn_tube_ai/app/models.py
 
-from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, String, Text, JSON, DateTime # Added DateTime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import Integer, String, Text, JSON, DateTime, Float, ForeignKey, Index, UniqueConstraint, LargeBinary, TypeDecorator, select, func # Added DateTime
 from datetime import datetime, timezone # Keep your datetime import
 from typing import Optional # For Optional type hinting
 
 from app import db # Assuming db is initialized in learn_tube_ai/app/__init__.py
+from app.services.segment_codec import encode_segments, decode_segments
 from typing import List # For type hinting if you want
 
+
+class PackedSegments(TypeDecorator):
+    """Transcript segments stored in the binary columnar format of services/segment_codec.py; reads and writes lists of dicts."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode_segments(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return decode_segments(value) if value is not None else None
+
+
 class Video(db.Model):
     __tablename__ = 'video' # Explicit table name is good practice
+    __table_args__ = (
+        UniqueConstraint('video_id', 'language', name='uq_video_video_id_language'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    video_id: Mapped[str] = mapped_column(String(20), unique=True, nullable=False, index=True) # Added index
+    video_id: Mapped[str] = mapped_column(String(20), nullable=False, index=True) # one row per transcript language
+    # Language code of the stored transcript (see services/transcript_languages.py). For a transcript
+    # YouTube translated for us this is the target language, and translated_from the original one.
+    language: Mapped[str] = mapped_column(String(20), nullable=False)
+    translated_from: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
     video_url: Mapped[str] = mapped_column(String(255), nullable=False)
     title: Mapped[Optional[str]] = mapped_column(String(300), nullable=True) # Increased length for titles
     
-    transcript_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    transcript_segments: Mapped[Optional[List[dict]]] = mapped_column(JSON, nullable=True) # <<< ADD THIS LINE
+    # The transcript columns can be megabytes for long videos; they are only loaded when accessed
+    # (or explicitly undeferred in the query), so list/analysis-only reads stay cheap.
+    transcript_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    transcript_segments: Mapped[Optional[List[dict]]] = mapped_column('transcript_segments_bin', PackedSegments, nullable=True, deferred=True)
     
     # LLM Analysis Fields
     summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -29,28 +52,294 @@ class Video(db.Model):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, onupdate=lambda: datetime.now(timezone.utc), nullable=True)
 
+    # Normalized copy of transcript_segments, one row per segment, for indexed time-window reads.
+    segments: Mapped[List["TranscriptSegment"]] = relationship(back_populates="video", order_by="TranscriptSegment.ordinal",
+                                                               cascade="all, delete-orphan", passive_deletes=True)
+    # Per-chunk analyses of the last chunked (map-reduce) analysis, reused when the transcript is edited.
+    analysis_chunks: Mapped[List["AnalysisChunk"]] = relationship(back_populates="video", order_by="AnalysisChunk.ordinal",
+                                                                  cascade="all, delete-orphan", passive_deletes=True)
+    # Pre-rendered API responses (services/payload_cache.py), rewritten whenever the video is.
+    payloads: Mapped[List["VideoPayload"]] = relationship(back_populates="video", cascade="all, delete-orphan", passive_deletes=True)
+
     # You could add a relationship here if you had a User model, for example:
     # user_id: Mapped[int] = mapped_column(Integer, db.ForeignKey('user.id'), nullable=False)
     # user: Mapped["User"] = relationship(back_populates="videos")
 
     def __repr__(self):
-        return f'<Video id={self.id} video_id={self.video_id}>'
+        return f'<Video id={self.id} video_id={self.video_id} language={self.language}>'
+
+    # Fields that can be requested via ?fields=... on top of the always-present basic fields.
+    OPTIONAL_FIELDS = ("analysis", "transcript", "segments")
 
     # Optional: A method to convert model to dictionary, useful for API responses if not handled elsewhere
-    def to_dict(self):
-        return {
+    def to_dict(self, fields=None, segment_from: Optional[float] = None, segment_to: Optional[float] = None):
+        """
+        Serializes the video. `fields` is an iterable of OPTIONAL_FIELDS to include (None = all of them).
+        Deferred transcript columns are only touched when their field is requested.
+        `segment_from`/`segment_to` (seconds) restrict the returned segments to that time window.
+        """
+        fields = set(self.OPTIONAL_FIELDS if fields is None else fields)
+        data = {
             "id": self.id,
             "video_id": self.video_id,
             "video_url": self.video_url,
             "title": self.title,
-            "transcript_text": self.transcript_text,
-            "segments": self.transcript_segments or [], # <<< ADD THIS
-            "analysis": {
+            "language": self.language,
+            "translated_from": self.translated_from,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+        if "transcript" in fields:
+            data["transcript_text"] = self.transcript_text
+        if "segments" in fields:
+            if segment_from is None and segment_to is None:
+                data["segments"] = self.transcript_segments or [] # <<< ADD THIS
+            else:
+                data["segments"] = [segment.to_dict() for segment in TranscriptSegment.in_range(self.id, segment_from, segment_to)]
+        if "analysis" in fields:
+            data["analysis"] = {
                 "summary": self.summary,
                 "table_of_contents": self.table_of_contents,
                 "key_terms": self.key_terms,
                 "logical_flow": self.logical_flow
-            },
+            }
+        return data
+
+
+class TranscriptSegment(db.Model):
+    __tablename__ = 'transcript_segment'
+    __table_args__ = (
+        Index('ix_transcript_segment_video_pk_start', 'video_pk', 'start'),
+        UniqueConstraint('video_pk', 'ordinal', name='uq_transcript_segment_video_pk_ordinal'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    video_pk: Mapped[int] = mapped_column(Integer, ForeignKey('video.id', ondelete='CASCADE'), nullable=False) # Video.id, not the YouTube video_id
+    ordinal: Mapped[int] = mapped_column(Integer, nullable=False) # position within the transcript, 0-based
+    start: Mapped[float] = mapped_column(Float, nullable=False)
+    duration: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    text: Mapped[str] = mapped_column(Text, nullable=False, default="")
+
+    video: Mapped["Video"] = relationship(back_populates="segments")
+
+    def __repr__(self):
+        return f'<TranscriptSegment video_pk={self.video_pk} ordinal={self.ordinal} start={self.start}>'
+
+    def to_dict(self):
+        return {"text": self.text, "start": self.start, "duration": self.duration}
+
+    @classmethod
+    def in_range(cls, video_pk: int, segment_from: Optional[float] = None, segment_to: Optional[float] = None) -> List["TranscriptSegment"]:
+        """
+        Segments of a video overlapping [segment_from, segment_to) seconds, in order; open ends are unbounded.
+        Both bounds are resolved on the (video_pk, start) index: the lower bound starts at the last
+        segment beginning at or before `segment_from`, i.e. the one in progress at that moment.
+        """
+        query = cls.query.filter(cls.video_pk == video_pk)
+        if segment_from is not None:
+            in_progress_start = (select(func.max(cls.start))
+                                 .where(cls.video_pk == video_pk, cls.start <= segment_from)
+                                 .scalar_subquery())
+            query = query.filter(cls.start >= func.coalesce(in_progress_start, segment_from))
+        if segment_to is not None:
+            query = query.filter(cls.start < segment_to)
+        return query.order_by(cls.start, cls.ordinal).all()
+
+    @classmethod
+    def around(cls, video_pk: int, ordinal: int, before: int, after: int) -> List["TranscriptSegment"]:
+        """Segments ordinal-before .. ordinal+after of a video, in order (a range scan on the (video_pk, ordinal) unique index)."""
+        return (cls.query
+                .filter(cls.video_pk == video_pk, cls.ordinal.between(ordinal - before, ordinal + after))
+                .order_by(cls.ordinal)
+                .all())
+
+
+class AnalysisChunk(db.Model):
+    """
+    One chunk of a chunked transcript analysis (see llm_service.chunk_transcript_segments). `content_hash`
+    covers the model, the analysis prompt and the chunk's timestamped text, so a chunk whose hash is
+    unchanged after a transcript edit can reuse `analysis` instead of calling the LLM again.
+    """
+    __tablename__ = 'analysis_chunk'
+    __table_args__ = (
+        UniqueConstraint('video_pk', 'ordinal', name='uq_analysis_chunk_video_pk_ordinal'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    video_pk: Mapped[int] = mapped_column(Integer, ForeignKey('video.id', ondelete='CASCADE'), nullable=False)
+    ordinal: Mapped[int] = mapped_column(Integer, nullable=False) # chunk index within the transcript
+    start: Mapped[float] = mapped_column(Float, nullable=False) # seconds
+    end: Mapped[float] = mapped_column(Float, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    analysis: Mapped[dict] = mapped_column(JSON, nullable=False) # the chunk's own ToC / key terms / flow / summary
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    video: Mapped["Video"] = relationship(back_populates="analysis_chunks")
+
+    def __repr__(self):
+        return f'<AnalysisChunk video_pk={self.video_pk} ordinal={self.ordinal} start={self.start}>'
+
+
+class VideoPayload(db.Model):
+    """
+    A pre-rendered API response for a video (see services/payload_cache.py): the JSON body serialized
+    once when the video is written, plus its gzip encoding, so cache hits send these bytes as they are.
+    """
+    __tablename__ = 'video_payload'
+    __table_args__ = (
+        UniqueConstraint('video_pk', 'variant', name='uq_video_payload_video_pk_variant'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    video_pk: Mapped[int] = mapped_column(Integer, ForeignKey('video.id', ondelete='CASCADE'), nullable=False)
+    variant: Mapped[str] = mapped_column(String(50), nullable=False) # which response this is, e.g. 'process_video'
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=False) # UTF-8 JSON
+    body_gzip: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    etag: Mapped[str] = mapped_column(String(40), nullable=False) # video_etag of the matching regular response (sha1 hex)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    video: Mapped["Video"] = relationship(back_populates="payloads")
+
+    def __repr__(self):
+        return f'<VideoPayload video_pk={self.video_pk} variant={self.variant} bytes={len(self.body or b"")}>'
+
+
+class TranscriptListing(db.Model):
+    """
+    What transcripts YouTube has for a video (see services/transcript_languages.py), cached so that picking
+    the stored language variant for a preference chain - or knowing that none can be produced - doesn't
+    need another transcript list request.
+    """
+    __tablename__ = 'transcript_listing'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    video_id: Mapped[str] = mapped_column(String(20), unique=True, nullable=False, index=True)
+    transcripts: Mapped[list] = mapped_column(JSON, nullable=False) # [{'language_code', 'language', 'is_generated', 'is_translatable'}]
+    translation_languages: Mapped[list] = mapped_column(JSON, nullable=False) # language codes YouTube can translate into
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def to_dict(self):
+        return {"transcripts": self.transcripts, "translation_languages": self.translation_languages}
+
+    def __repr__(self):
+        return f'<TranscriptListing video_id={self.video_id} transcripts={len(self.transcripts or [])}>'
+
+
+class CustomText(db.Model):
+    """
+    A text analyzed by /api/process_custom_text (see services/custom_text_service.py). Rows are keyed by the
+    SHA-256 of the text, which is also the public id, so resubmitting the same text - from any user or
+    worker - returns the stored analysis instead of calling the LLM again.
+    """
+    __tablename__ = 'custom_text'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content_sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False, index=True) # hex digest of the UTF-8 text
+    title: Mapped[Optional[str]] = mapped_column(String(300), nullable=True) # as first submitted
+    original_content: Mapped[str] = mapped_column(Text, nullable=False, deferred=True) # not needed to answer a resubmission
+
+    # LLM Analysis Fields (same shape as on Video)
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    table_of_contents: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    key_terms: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    logical_flow: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<CustomText id={self.id} content_sha256={self.content_sha256[:12]}>'
+
+    @property
+    def analysis(self) -> dict:
+        return {
+            "table_of_contents": self.table_of_contents or [],
+            "key_terms": self.key_terms or [],
+            "logical_flow": self.logical_flow,
+            "summary": self.summary
+        }
+
+    def to_dict(self, include_content: bool = True):
+        data = {
+            "id": self.content_sha256,
+            "title": self.title,
+            "analysis": self.analysis,
+            "source": "custom_text",
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+        if include_content:
+            data["original_text"] = self.original_content
+        return data
+
+
+class WatchlistEntry(db.Model):
+    """
+    A video the prefetch scheduler keeps warm (see services/prefetch_service.py), e.g. because a course
+    assigned it. The analysis itself lives in `video`; this row only tracks the scheduler's attempts.
+    """
+    __tablename__ = 'watchlist_entry'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    video_id: Mapped[str] = mapped_column(String(20), unique=True, nullable=False, index=True)
+    video_url: Mapped[str] = mapped_column(String(255), nullable=False)
+    course: Mapped[Optional[str]] = mapped_column(String(100), nullable=True) # free-form label of who assigned it
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0) # higher is prefetched first
+
+    last_prefetched_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True) # last attempt, successful or not
+    last_status: Mapped[Optional[str]] = mapped_column(String(20), nullable=True) # processed | failed
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    failures: Mapped[int] = mapped_column(Integer, nullable=False, default=0) # consecutive failed attempts (backoff)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<WatchlistEntry video_id={self.video_id} course={self.course}>'
+
+    def to_dict(self):
+        return {
+            "video_id": self.video_id,
+            "video_url": self.video_url,
+            "course": self.course,
+            "priority": self.priority,
+            "last_prefetched_at": self.last_prefetched_at.isoformat() if self.last_prefetched_at else None,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "failures": self.failures,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class Job(db.Model):
+    __tablename__ = 'job'
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True) # uuid4 hex, handed out to clients
+    kind: Mapped[str] = mapped_column(String(50), nullable=False) # e.g. 'process_video'
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='queued', index=True) # queued | running | done | failed
+    progress: Mapped[Optional[str]] = mapped_column(String(50), nullable=True) # current pipeline stage
+    video_id: Mapped[Optional[str]] = mapped_column(String(20), nullable=True, index=True)
+
+    payload: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True) # job input
+    result: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True) # final API payload (or error payload)
+    result_status: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # HTTP status the synchronous endpoint would have used
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, onupdate=lambda: datetime.now(timezone.utc), nullable=True)
+    worker: Mapped[Optional[str]] = mapped_column(String(100), nullable=True) # "<host>:<pid>:<start>" of the process holding the job
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True) # refreshed by that process while it holds the job
+
+    def __repr__(self):
+        return f'<Job id={self.id} kind={self.kind} status={self.status}>'
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "video_id": self.video_id,
+            "result": self.result,
+            "result_status": self.result_status,
+            "error": self.error,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
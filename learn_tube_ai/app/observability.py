@@ -0,0 +1,174 @@
+# learn_tube_ai/app/observability.py
+# Logging, request ids, stage timings and the Prometheus /metrics endpoint.
+#
+#   - configure_logging(): leveled logging (LOG_LEVEL, LOG_FORMAT=text|json). Records go through a
+#     QueueHandler, so request threads only enqueue; a background QueueListener does the stdout writes.
+#   - Every request gets an id (X-Request-ID header, or a new one) that is attached to its log records
+#     and echoed in the response.
+#   - span("stage") times a block of work into the learntube_stage_duration_seconds histogram and,
+#     with OTEL_ENABLED, also opens an OpenTelemetry span (optional dependency).
+#   - GET /metrics exposes the histograms/counters in the Prometheus text format.
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Upstream calls (YouTube, LLM) take seconds, so the default buckets are extended to two minutes.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REQUEST_DURATION = Histogram("learntube_http_request_duration_seconds", "HTTP request latency.",
+                             ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+STAGE_DURATION = Histogram("learntube_stage_duration_seconds", "Duration of a processing stage (see observability.span).",
+                           ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_ERRORS = Counter("learntube_stage_errors_total", "Stages that ended with an exception.", ["stage"])
+
+# Request id for code outside a Flask request context (ASGI views, job workers).
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_tracer = None # set by init_tracing when OpenTelemetry is enabled and importable
+_listener = None
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        request_id = request_id_var.get()
+        if request_id is None and has_request_context():
+            request_id = g.get("request_id")
+        record.request_id = request_id or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, request_id, plus exc_info when present."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop() # flushes whatever is still queued
+        _listener = None
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text"):
+    """Routes the root logger through a queue to a single stdout handler. Safe to call more than once."""
+    global _listener
+    _stop_listener()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_RequestIdFilter()) # resolved on the request thread, before the record is queued
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(_stop_listener)
+
+
+def init_tracing(service_name: str = "learn_tube_ai"):
+    """
+    Enables OpenTelemetry spans for span(). Uses an already configured tracer provider (e.g. when run
+    under `opentelemetry-instrument`); otherwise sets one up with the OTLP exporter if it is installed.
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logging.getLogger(__name__).warning("OTEL_ENABLED is set but opentelemetry-api is not installed; tracing disabled.")
+        return
+    if type(trace.get_tracer_provider()).__name__ == "ProxyTracerProvider": # nothing configured yet
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logging.getLogger(__name__).warning("opentelemetry-sdk / OTLP exporter not installed; spans go to the default (no-op) provider.")
+        else:
+            provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter())) # endpoint from OTEL_EXPORTER_OTLP_* env vars
+            trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(service_name)
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Times the enclosed block as `stage`: observed in learntube_stage_duration_seconds (and counted in
+    learntube_stage_errors_total if it raises). With tracing enabled it is also an OpenTelemetry span
+    carrying `attributes`.
+    """
+    started = time.perf_counter()
+    otel_span = _tracer.start_as_current_span(stage, attributes={k: v for k, v in attributes.items() if v is not None}) if _tracer else None
+    try:
+        if otel_span is not None:
+            with otel_span:
+                yield
+        else:
+            yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUEST_DURATION.labels(method, route, str(status)).observe(seconds)
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    return incoming if incoming and len(incoming) <= 64 else uuid.uuid4().hex
+
+
+def init_app(app):
+    configure_logging(app.config.get("LOG_LEVEL", "INFO"), app.config.get("LOG_FORMAT", "text"))
+    if app.config.get("OTEL_ENABLED"):
+        init_tracing(app.config.get("OTEL_SERVICE_NAME", "learn_tube_ai"))
+
+    @app.before_request
+    def _start_request():
+        g.request_id = new_request_id(request.headers.get("X-Request-ID"))
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.get("request_started")
+        if started is not None:
+            # Label by URL rule (e.g. /api/videos/<video_id>), not the raw path, to keep cardinality bounded.
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            observe_request(request.method, route, response.status_code, time.perf_counter() - started)
+        response.headers.setdefault("X-Request-ID", g.get("request_id", ""))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
@@ -1,214 +1,470 @@
 # learn_tube_ai/app/routes.py
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, url_for, current_app, Response, stream_with_context
 # Ensure all necessary imports are here
-from .services.video_processing_service import get_youtube_transcript, process_video_for_llm_analysis 
-from .models import Video
+from .services.video_processing_service import (
+    process_video_for_llm_analysis, extract_video_id, is_valid_video_id, get_youtube_transcript, stream_llm_analysis, analysis_error
+)
+from .services.video_store import build_video_response, save_video_results
+from .services.payload_cache import cached_payload_response, backfill_payload
+from .services.transcript_languages import (
+    transcript_languages, parse_languages, choose_stored_language, find_stored_language, resolve_language, store_listing, no_transcript_error
+)
+from .services.custom_text_service import (
+    content_digest as custom_text_content_digest, find_custom_text, save_custom_text, build_custom_text_response,
+    CACHED_MESSAGE as CUSTOM_TEXT_CACHED_MESSAGE
+)
+from .services.search_service import search_transcripts
+from .services.embedding_service import embedding_index
+from .services.transcript_parser import parse_transcript, segments_to_text
+from .services.incremental_analysis import analyze_transcript_incrementally
+from .services.job_service import job_queue
+from .services.prefetch_service import prefetch_scheduler, add_to_watchlist, remove_from_watchlist
+from .services.singleflight import SingleFlight
+from .services.llm_cache import llm_cache
+from .services.llm_providers import LLMOverloadedError
+from .observability import span
+from .http_cache import video_etag, video_last_modified, is_not_modified, not_modified_response, add_cache_headers
+from .models import Video, Job, WatchlistEntry
 from app import db 
-import re
-from .services.llm_service import explain_selected_text_mock # <<< ADD THIS
-from .models import Video # Add CustomText model later if you create one # ...
+from sqlalchemy.orm import undefer
+import io
+import json
+import logging
+import math
+from datetime import timezone
+from .services.llm_service import explain_selected_text, llm_client # <<< ADD THIS
+from .services.explain_service import build_explain_context
+
+logger = logging.getLogger(__name__)
 
 
 main_bp = Blueprint('api', __name__, url_prefix='/api')
 
-def extract_video_id(url):
-    # ... (your existing extract_video_id function) ...
-    patterns = [ r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/watch\?v=([^&]+)', r'(?:https?:\/\/)?(?:www\.)?youtu\.be\/([^?]+)', r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/embed\/([^?]+)', r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/v\/([^?]+)',]
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match: return match.group(1)
-    return None
+# In-flight registry for /process_custom_text, keyed by SHA-256 of the submitted text (see custom_text_service).
+custom_text_flight = SingleFlight()
 
-@main_bp.route('/process_video', methods=['POST', 'OPTIONS'])
+@main_bp.route('/process_video', methods=['GET', 'POST', 'OPTIONS'])
 def process_video_route():
     # ... (your existing process_video_route - the one from my last message that handles
     #          transcript fetch errors by returning video_id and video_url) ...
+    # GET /api/process_video?video_url=...&fields=... behaves like the POST but can be cached by
+    # browsers and proxies: cache hits carry an ETag/Last-Modified and answer 304 when unchanged.
+    # "languages" (e.g. "de,en") is the transcript language preference chain, see services/transcript_languages.py.
     if request.method == 'OPTIONS': return _build_cors_preflight_response()
-    data = request.get_json()
+    data = request.args if request.method == 'GET' else request.get_json()
     if not data or 'video_url' not in data: return jsonify({"error": "Missing video_url"}), 400
     video_url = data['video_url']
-    video_id = extract_video_id(video_url) 
+    with span("extract_video_id"): video_id = extract_video_id(video_url)
+    if not video_id: return jsonify({"error": "Invalid YouTube URL", "details": "Could not extract video ID.", "video_url": video_url}), 400
+    logger.info("Received video URL: %s -> Extracted video ID: %s", video_url, video_id)
+    # Clients that only need e.g. the analysis can pass "fields" to avoid shipping the full transcript.
+    try: fields = _parse_fields(data['fields']) if data.get('fields') else None
+    except ValueError as e: return jsonify({"error": "Invalid fields", "details": str(e)}), 400
+    try: languages = transcript_languages.chain(_languages_param(data))
+    except ValueError as e: return jsonify({"error": "Invalid languages", "details": str(e)}), 400
+    with span("language_lookup"): language, listing = choose_stored_language(video_id, languages)
+    if language is None and listing is not None and resolve_language(listing, languages) is None:
+        # The cached transcript list already says none of these languages exist: answer without asking YouTube.
+        logger.info("Cached transcript list of %s has none of %s.", video_id, languages)
+        return jsonify({"error": "Failed to retrieve transcript automatically", "details": no_transcript_error(languages),
+                        "available_languages": [t["language_code"] for t in listing["transcripts"]], "video_id": video_id, "video_url": video_url}), 422
+    video_obj, has_transcript = None, False
+    if language is not None and fields is None:
+        # Full response of a cached video: send the bytes pre-rendered when it was stored.
+        with span("payload_lookup"): response = cached_payload_response(video_id, "process_video", language)
+        if response is not None:
+            logger.info("Found video %s (%s) with transcript in database (cache).", video_id, language)
+            return response
+    if language is not None:
+        query = Video.query.filter_by(video_id=video_id, language=language)
+        if fields is None: query = query.options(undefer(Video.transcript_text), undefer(Video.transcript_segments))
+        with span("db_lookup"): row = query.add_columns(Video.transcript_text.isnot(None)).first()
+        video_obj, has_transcript = row if row else (None, False)
+    if video_obj and has_transcript:
+        logger.info("Found video %s with transcript in database (cache).", video_id)
+        etag = video_etag(video_obj, variant=f"process_video:{','.join(sorted(fields)) if fields is not None else 'all'}")
+        last_modified = video_last_modified(video_obj)
+        if request.method == 'GET' and is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        if fields is not None:
+            response = jsonify({"message": "Video data retrieved from cache.", **video_obj.to_dict(fields)})
+        else:
+            response = jsonify(build_video_response(video_obj, "Video data retrieved from cache."))
+            backfill_payload(video_obj, "process_video") # stored before payloads existed; next hit takes the fast path
+        return add_cache_headers(response, etag, last_modified), 200
+
+    # Cache miss: fetching the transcript and running the LLM can take many seconds,
+    # so hand the work to the job queue and let the client poll /api/jobs/<job_id>.
+    if video_obj: logger.info("Video %s found in DB but missing transcript text. Queueing re-fetch.", video_id)
+    else: logger.info("Video %s not in database in %s. Queueing transcript fetch.", video_id, languages)
+    with span("job_submit"): job = job_queue.submit("process_video", {"video_id": video_id, "video_url": video_url, "languages": languages}, video_id=video_id)
+    return jsonify({
+        "message": "Video queued for processing.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('api.job_status_route', job_id=job.id),
+        "video_id": video_id,
+        "video_url": video_url
+    }), 202
+
+@main_bp.route('/process_video/stream', methods=['GET'])
+def process_video_stream_route():
+    """
+    Server-Sent Events version of /process_video: ?video_url=...&languages=...
+    Emits 'transcript' (video_id, video_url, title, language, translated_from, transcript_text, segments) once the transcript is
+    fetched, then the analysis as it is generated: 'item' (a ToC entry or key term), 'text_delta' (a piece of
+    logical_flow/summary) and, for long transcripts, 'chunk' (one part's analysis). Ends with 'analysis'
+    (the complete analysis) and 'done', or with 'error' (same payload as the JSON error plus its 'status').
+    """
+    video_url = request.args.get('video_url')
+    if not video_url: return jsonify({"error": "Missing video_url"}), 400
+    with span("extract_video_id"): video_id = extract_video_id(video_url)
     if not video_id: return jsonify({"error": "Invalid YouTube URL", "details": "Could not extract video ID.", "video_url": video_url}), 400
-    print(f"API: Received video URL: {video_url} -> Extracted video ID: {video_id}")
-    video_obj = Video.query.filter_by(video_id=video_id).first()
-    response_data = {}; status_code = 200
+    try: languages = transcript_languages.chain(_languages_param(request.args))
+    except ValueError as e: return jsonify({"error": "Invalid languages", "details": str(e)}), 400
+    logger.info("Streaming video URL: %s -> Extracted video ID: %s", video_url, video_id)
+    return Response(stream_with_context(_video_event_stream(video_id, video_url, languages)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}) # no proxy buffering
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _video_event_stream(video_id, video_url, languages):
+    with span("language_lookup"): language, _ = choose_stored_language(video_id, languages)
+    video_obj = None
+    if language is not None:
+        with span("db_lookup"): video_obj = Video.query.options(undefer(Video.transcript_text), undefer(Video.transcript_segments)).filter_by(video_id=video_id, language=language).first()
     if video_obj and video_obj.transcript_text:
-        print(f"API: Found video {video_id} with transcript in database (cache).")
-        response_data = { "message": "Video data retrieved from cache.", "video_id": video_obj.video_id, "video_url": video_obj.video_url, "title": video_obj.title or f"Video: {video_id}", "transcript_text": video_obj.transcript_text or "", "segments": video_obj.transcript_segments or [], "analysis": { "table_of_contents": video_obj.table_of_contents or [], "key_terms": video_obj.key_terms or [], "logical_flow": video_obj.logical_flow or "Analysis previously cached.", "summary": video_obj.summary or "Summary previously cached."}}
-        status_code = 200
-    else:
-        if video_obj: print(f"API: Video {video_id} found in DB but missing transcript text. Re-fetching.")
-        else: print(f"API: Video {video_id} not in database. Fetching transcript.")
-        transcript_fetch_result = get_youtube_transcript(video_id)
-        transcript_text = transcript_fetch_result.get("text"); transcript_segments = transcript_fetch_result.get("segments"); transcript_error = transcript_fetch_result.get("error")
-        if transcript_error or not transcript_text:
-            print(f"API: Failed to fetch transcript for {video_id}. Error: {transcript_error}")
-            return jsonify({"error": "Failed to retrieve transcript automatically", "details": transcript_error or "Transcript is unavailable or empty.", "video_id": video_id, "video_url": video_url }), 422
-        print(f"API: Transcript for {video_id} fetched. Length: {len(transcript_text)}. Processing for LLM.")
-        analysis_results = process_video_for_llm_analysis(video_id, transcript_text)
-        try:
-            if not video_obj: video_obj = Video(video_id=video_id, video_url=video_url); db.session.add(video_obj)
-            video_obj.title = f"Video: {video_id}"; video_obj.transcript_text = transcript_text; video_obj.transcript_segments = transcript_segments; video_obj.table_of_contents = analysis_results.get("table_of_contents"); video_obj.key_terms = analysis_results.get("key_terms"); video_obj.logical_flow = analysis_results.get("logical_flow"); video_obj.summary = analysis_results.get("summary")
-            db.session.commit(); print(f"API: Video {video_id} and its data (re-)saved to database.")
-            response_data = {"message": "Video processed successfully.", "video_id": video_obj.video_id, "video_url": video_obj.video_url, "title": video_obj.title, "transcript_text": video_obj.transcript_text, "segments": video_obj.transcript_segments, "analysis": analysis_results }; status_code = 200 # Changed from 201 for simplicity, or check if new_video was added
-        except Exception as e: db.session.rollback(); print(f"API: Database error for {video_id}: {str(e)}"); return jsonify({"error": "Database error after processing video.", "details": str(e)}), 500
-    return jsonify(response_data), status_code
-
-# --- MODIFIED ENDPOINT FOR CUSTOM TRANSCRIPT WITH ENHANCED TIMESTAMP PARSING ---
+        logger.info("Found video %s with transcript in database (cache). Streaming stored result.", video_id)
+        payload = build_video_response(video_obj, "Video data retrieved from cache.")
+        analysis = payload.pop("analysis")
+        yield _sse("transcript", payload)
+        yield _sse("analysis", analysis)
+        yield _sse("done", {"message": payload["message"], "video_id": video_id})
+        return
+
+    yield ": fetching transcript\n\n" # SSE comment: sends the headers before the (slow) fetch
+    fetch_result = get_youtube_transcript(video_id, languages)
+    transcript_text = fetch_result.get("text")
+    transcript_segments = fetch_result.get("segments")
+    if fetch_result.get("error") or not transcript_text:
+        if fetch_result.get("listing"):
+            store_listing(video_id, fetch_result["listing"])
+        logger.warning("Failed to fetch transcript for %s. Error: %s", video_id, fetch_result.get('error'))
+        yield _sse("error", {"error": "Failed to retrieve transcript automatically", "details": fetch_result.get("error") or "Transcript is unavailable or empty.",
+                             "video_id": video_id, "video_url": video_url, "status": 422})
+        return
+    yield _sse("transcript", {"video_id": video_id, "video_url": video_url, "title": f"Video: {video_id}",
+                              "language": fetch_result["language"], "translated_from": fetch_result["translated_from"],
+                              "transcript_text": transcript_text, "segments": transcript_segments or []})
+
+    analysis_results = None
+    try:
+        for event in stream_llm_analysis(video_id, transcript_text, transcript_segments):
+            if event["type"] == "analysis":
+                analysis_results = event["analysis"]
+            else:
+                yield _sse(event["type"], {key: value for key, value in event.items() if key != "type"})
+    except LLMOverloadedError as e:
+        yield _sse("error", {"error": "LLM service is overloaded. Try again shortly.", "details": str(e), "retry_after": e.retry_after, "status": 503})
+        return
+    yield _sse("analysis", analysis_results)
+    analysis_problem = analysis_error(analysis_results)
+    if analysis_problem:
+        # Not saved: a partial or placeholder analysis would be served as a complete cache hit from now on.
+        if fetch_result.get("listing"):
+            store_listing(video_id, fetch_result["listing"])
+        logger.warning("Analysis of %s did not complete, not saving it: %s", video_id, analysis_problem)
+        yield _sse("error", {"error": "LLM analysis did not complete; the video was not saved.", "details": analysis_problem,
+                             "video_id": video_id, "status": 502})
+        return
+
+    try:
+        store_listing(video_id, fetch_result["listing"], commit=False) # committed with the video, not held open while streaming
+        video_obj = save_video_results(video_id, video_url, transcript_text, transcript_segments, analysis_results,
+                                       language=fetch_result["language"], translated_from=fetch_result["translated_from"])
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Database error for %s: %s", video_id, str(e))
+        yield _sse("error", {"error": "Database error after processing video.", "details": str(e), "status": 500})
+        return
+    logger.info("Video %s streamed and saved to database.", video_id)
+    yield _sse("done", {"message": "Video processed successfully.", "video_id": video_id, "title": video_obj.title})
+
+@main_bp.route('/videos', methods=['GET'])
+def list_videos_route():
+    """Keyset-paginated list of stored videos (basic fields only): ?limit=20&after_id=<id>."""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        after_id = int(request.args['after_id']) if request.args.get('after_id') else None
+    except ValueError:
+        return jsonify({"error": "limit and after_id must be integers"}), 400
+    query = Video.query.order_by(Video.id)
+    if after_id is not None:
+        query = query.filter(Video.id > after_id)
+    videos = query.limit(limit).all()
+    return jsonify({
+        "videos": [video.to_dict(fields=()) for video in videos],
+        "next_after_id": videos[-1].id if len(videos) == limit else None
+    }), 200
+
+@main_bp.route('/videos/<video_id>', methods=['GET'])
+def get_video_route(video_id):
+    """
+    Single video with field projection: ?fields=analysis,transcript,segments (default: analysis).
+    Segments can be restricted to a time window with ?from=<seconds>&to=<seconds>.
+    ?languages=<chain> picks the stored language variant (default: see find_stored_language).
+    """
+    try:
+        fields = _parse_fields(request.args.get('fields', 'analysis'))
+        segment_from = float(request.args['from']) if request.args.get('from') else None
+        segment_to = float(request.args['to']) if request.args.get('to') else None
+        languages = parse_languages(_languages_param(request.args))
+    except ValueError as e:
+        return jsonify({"error": "Invalid query parameters", "details": str(e)}), 400
+    language = find_stored_language(video_id, languages)
+    if language is None:
+        return jsonify({"error": "Video not found", "video_id": video_id}), 404
+    default_projection = fields == {"analysis"} and segment_from is None and segment_to is None
+    if default_projection:
+        response = cached_payload_response(video_id, "detail:analysis", language)
+        if response is not None:
+            return response
+    # Check freshness before undeferring the (potentially huge) transcript columns.
+    video_obj = Video.query.filter_by(video_id=video_id, language=language).first()
+    if not video_obj:
+        return jsonify({"error": "Video not found", "video_id": video_id}), 404
+    etag = video_etag(video_obj, variant=f"detail:{','.join(sorted(fields))}:{segment_from}:{segment_to}")
+    last_modified = video_last_modified(video_obj)
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response = jsonify(video_obj.to_dict(fields, segment_from=segment_from, segment_to=segment_to))
+    if default_projection and video_obj.transcript_text:
+        backfill_payload(video_obj, "detail:analysis")
+    return add_cache_headers(response, etag, last_modified), 200
+
+@main_bp.route('/videos/<video_id>/retrieve', methods=['GET'])
+def retrieve_route(video_id):
+    """
+    Semantic retrieval of transcript windows: ?q=<text>&k=5. Repeat q to score several queries in one batch.
+    Each match has segment_from/segment_to (ordinals), start/end (seconds), text and a cosine score.
+    ?languages=<chain> picks the stored language variant, like /videos/<video_id>.
+    """
+    queries = [query.strip() for query in request.args.getlist('q') if query and query.strip()]
+    if not queries:
+        return jsonify({"error": "Missing query 'q'"}), 400
+    try:
+        k = min(max(int(request.args.get('k', 5)), 1), 50)
+    except ValueError:
+        return jsonify({"error": "k must be an integer"}), 400
+    try:
+        language = find_stored_language(video_id, parse_languages(_languages_param(request.args)))
+    except ValueError as e:
+        return jsonify({"error": "Invalid languages", "details": str(e)}), 400
+    video_obj = Video.query.filter_by(video_id=video_id, language=language).first() if language else None
+    if not video_obj:
+        return jsonify({"error": "Video not found", "video_id": video_id}), 404
+    matches = embedding_index.retrieve(video_obj, queries, k=k)
+    return jsonify({
+        "video_id": video_id,
+        "language": language,
+        "results": [{"query": query, "matches": query_matches} for query, query_matches in zip(queries, matches)]
+    }), 200
+
+def _languages_param(data):
+    """Raw language preference chain of a request: 'languages' ("de,en" or a JSON list), or a single 'language'."""
+    return data.get('languages') or data.get('language')
+
+def _parse_fields(raw_fields):
+    """Parses a comma-separated string (or list) of Video.OPTIONAL_FIELDS; raises ValueError on unknown names."""
+    if isinstance(raw_fields, str):
+        raw_fields = raw_fields.split(',')
+    fields = {field.strip() for field in raw_fields if field and field.strip()}
+    unknown = fields - set(Video.OPTIONAL_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(Video.OPTIONAL_FIELDS)}.")
+    return fields
+
+def _ingest_limits(data):
+    """(parallelism, rate_per_second, batch_size) of a /process_videos body, config defaults filled in; raises ValueError on bad values."""
+    config = current_app.config
+    try:
+        parallelism = int(data.get('parallelism', config['INGEST_PARALLELISM']))
+        batch_size = int(data.get('batch_size', config['INGEST_BATCH_SIZE']))
+        rate_per_second = data.get('rate_per_second', config['INGEST_RATE_PER_SECOND'])
+        rate_per_second = float(rate_per_second) if rate_per_second is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("parallelism and batch_size must be integers and rate_per_second a number.")
+    if parallelism < 1 or batch_size < 1:
+        raise ValueError("parallelism and batch_size must be at least 1.")
+    if rate_per_second is not None and not (math.isfinite(rate_per_second) and rate_per_second >= 0):
+        raise ValueError("rate_per_second must be a non-negative number (0 or null: no rate limit).")
+    return min(parallelism, config['INGEST_PARALLELISM_MAX']), rate_per_second or None, batch_size
+
+@main_bp.route('/process_videos', methods=['POST', 'OPTIONS'])
+def process_videos_route():
+    if request.method == 'OPTIONS': return _build_cors_preflight_response()
+    data = request.get_json()
+    video_urls = data.get('video_urls') if data else None
+    if not isinstance(video_urls, list) or not video_urls:
+        return jsonify({"error": "Missing video_urls", "details": "Expected a non-empty list of YouTube URLs."}), 400
+    max_urls = current_app.config['INGEST_MAX_URLS']
+    if len(video_urls) > max_urls:
+        return jsonify({"error": "Too many URLs", "details": f"At most {max_urls} URLs per batch."}), 400
+    try: languages = parse_languages(_languages_param(data)) or None # None: the default chain
+    except ValueError as e: return jsonify({"error": "Invalid languages", "details": str(e)}), 400
+    try: parallelism, rate_per_second, batch_size = _ingest_limits(data)
+    except ValueError as e: return jsonify({"error": "Invalid ingest options", "details": str(e)}), 400
+
+    payload = {
+        "video_urls": [str(url) for url in video_urls],
+        "parallelism": parallelism,
+        "rate_per_second": rate_per_second,
+        "batch_size": batch_size,
+        "refresh": bool(data.get('refresh', False)),
+        "languages": languages,
+    }
+    logger.info("Received batch of %s video URLs.", len(video_urls))
+    job = job_queue.submit("process_videos", payload)
+    return jsonify({
+        "message": "Batch queued for processing.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('api.job_status_route', job_id=job.id),
+        "count": len(video_urls)
+    }), 202
+
+@main_bp.route('/watchlist', methods=['GET', 'POST', 'OPTIONS'])
+def watchlist_route():
+    """
+    GET lists the prefetch watchlist (?course= to filter). POST {"video_urls": [...], "course": str, "priority": int}
+    adds videos to it; they are fetched and analyzed by the prefetch scheduler ahead of time.
+    """
+    if request.method == 'OPTIONS': return _build_cors_preflight_response()
+    if request.method == 'GET':
+        query = WatchlistEntry.query.order_by(WatchlistEntry.priority.desc(), WatchlistEntry.created_at)
+        if request.args.get('course'): query = query.filter_by(course=request.args['course'])
+        return jsonify({"entries": [entry.to_dict() for entry in query]}), 200
+    data = request.get_json(silent=True)
+    video_urls = data.get('video_urls') if data else None
+    if not isinstance(video_urls, list) or not video_urls:
+        return jsonify({"error": "Missing video_urls", "details": "Expected a non-empty list of YouTube URLs."}), 400
+    try: priority = int(data.get('priority', 0))
+    except (TypeError, ValueError): return jsonify({"error": "priority must be an integer"}), 400
+    result = add_to_watchlist([str(url) for url in video_urls], course=data.get('course'), priority=priority)
+    prefetch_scheduler.wake()
+    return jsonify(result), 201 if result["added"] else 200
+
+@main_bp.route('/watchlist/<video_id>', methods=['DELETE'])
+def watchlist_entry_route(video_id):
+    if not remove_from_watchlist(video_id):
+        return jsonify({"error": "Video not on the watchlist", "video_id": video_id}), 404
+    return jsonify({"message": "Removed from the watchlist.", "video_id": video_id}), 200
+
+@main_bp.route('/prefetch/status', methods=['GET'])
+def prefetch_status_route():
+    return jsonify(prefetch_scheduler.status()), 200
+
+@main_bp.route('/prefetch/run', methods=['POST'])
+def prefetch_run_route():
+    """Queues a prefetch pass now, ignoring the off-peak window; poll the returned job like /process_videos."""
+    job = job_queue.submit("prefetch", {})
+    return jsonify({
+        "message": "Prefetch pass queued.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('api.job_status_route', job_id=job.id)
+    }), 202
+
+@main_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status_route(job_id):
+    job = db.session.get(Job, job_id)
+    if not job:
+        return jsonify({"error": "Job not found", "job_id": job_id}), 404
+    return jsonify(job_queue.fail_if_stale(job).to_dict()), 200
+
+# --- CUSTOM TRANSCRIPT ENDPOINT (parsing lives in services/transcript_parser.py) ---
 @main_bp.route('/process_video_with_custom_transcript', methods=['POST', 'OPTIONS'])
 def process_video_with_custom_transcript_route():
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
 
-    data = request.get_json()
-    if not data or not all(k in data for k in ['video_id', 'video_url', 'custom_transcript_text']):
-        return jsonify({"error": "Missing required fields: video_id, video_url, or custom_transcript_text"}), 400
+    # JSON body with the transcript inline, or multipart/form-data with the transcript as a file
+    # ('transcript_file') so large transcripts are parsed straight off the upload stream.
+    upload = request.files.get('transcript_file') if request.mimetype == 'multipart/form-data' else None
+    data = request.form if upload else request.get_json(silent=True)
+    required = ['video_id', 'video_url'] if upload else ['video_id', 'video_url', 'custom_transcript_text']
+    if not data or not all(k in data for k in required):
+        return jsonify({"error": "Missing required fields: video_id, video_url, or custom_transcript_text (or a transcript_file upload)"}), 400
 
     video_id = data['video_id']
+    if not is_valid_video_id(video_id):
+        return jsonify({"error": "Invalid video_id", "details": "Expected up to 20 letters, digits, '-' or '_'."}), 400
     video_url = data['video_url'] 
-    custom_transcript_text = data['custom_transcript_text']
     custom_title = data.get('title') 
+    transcript_format = data.get('format', 'auto') # auto | youtube | srt | vtt
+    try: language = (parse_languages(data.get('language') or '') or [transcript_languages.default_language])[0]
+    except ValueError as e: return jsonify({"error": "Invalid language", "details": str(e)}), 400
 
-    print(f"API: Received custom transcript for video_id: {video_id}. Text length: {len(custom_transcript_text)}")
-
-    parsed_segments = []
-    lines = custom_transcript_text.splitlines()
-    
-    # Regex to capture timestamps like [00:00], 00:00, 0:00:00, [0:00:00.123] etc. at the START of a line.
-    # It captures hours (optional, group 2), minutes (group 3), seconds (group 4), and optionally milliseconds (group 5).
-    # Group 6 captures the text after the timestamp.
-    # Adjusted to be more robust for common YouTube transcript formats.
-    timestamp_pattern = re.compile(
-        r"^\s*(?:\[)?((?:(\d{1,2}):)?(\d{1,2}):(\d{2})(?:[\.,](\d{1,3}))?)(?:\])?\s*(.*)"
-    )
-    # Groups: 1:FullTime, 2:Hours(opt), 3:Minutes, 4:Seconds, 5:Millis(opt), 6:Text
-
-    current_segment_text_parts = []
-    last_segment_start_time = 0.0 # For text before the first timestamp
-
-    for line_number, line_text in enumerate(lines):
-        original_line = line_text # Keep original for non-timestamp lines
-        line_text = line_text.strip() # Work with stripped line for matching
-
-        match = timestamp_pattern.match(line_text)
-        
-        if match:
-            # A new timestamp is found. Finalize the previous segment if it had text.
-            if current_segment_text_parts:
-                segment_text_to_add = " ".join(current_segment_text_parts).strip()
-                if segment_text_to_add: # Only add if there's actual text
-                    parsed_segments.append({
-                        "text": segment_text_to_add,
-                        "start": last_segment_start_time, # Start time of this collected text
-                        "duration": 0.0 # Placeholder, calculated later
-                    })
-                current_segment_text_parts = [] # Reset for the new segment
-
-            # Extract time components for the NEW current segment
-            full_time_str, hr_str, min_str, sec_str, ms_str, text_after_timestamp = match.groups()
-            
-            hours = int(hr_str) if hr_str else 0
-            minutes = int(min_str) # Minutes should always be present if matched
-            seconds = int(sec_str)
-            milliseconds = int(ms_str.ljust(3, '0')) if ms_str else 0
-
-            current_start_time_seconds = (hours * 3600) + (minutes * 60) + seconds + (milliseconds / 1000.0)
-            last_segment_start_time = current_start_time_seconds # Update for the next block of text
-
-            # Add the text part from the timestamped line
-            if text_after_timestamp.strip():
-                current_segment_text_parts.append(text_after_timestamp.strip())
-            
-            # If it's the very last line and it's a timestamped line, ensure it gets added
-            if line_number == len(lines) - 1 and current_segment_text_parts:
-                segment_text_to_add = " ".join(current_segment_text_parts).strip()
-                if segment_text_to_add:
-                    parsed_segments.append({
-                        "text": segment_text_to_add,
-                        "start": last_segment_start_time,
-                        "duration": 0.0 
-                    })
-                current_segment_text_parts = []
-
-
-        elif line_text: # Not a timestamp line, but has content
-            current_segment_text_parts.append(original_line.strip()) # Use original_line to preserve internal spacing before stripping ends
-
-    # After loop, if there's any remaining text in current_segments_buffer, it's part of the last segment
-    if current_segment_text_parts:
-        segment_text_to_add = " ".join(current_segment_text_parts).strip()
-        if segment_text_to_add:
-            if not parsed_segments: # Entire text had no timestamps
-                 parsed_segments.append({"text": segment_text_to_add, "start": 0.0, "duration": 0.0})
-            else: # Append to the last segment that had a timestamp
-                 # This assumes the last segment created was the correct one to append to
-                 parsed_segments[-1]["text"] += " " + segment_text_to_add 
-                 parsed_segments[-1]["text"] = parsed_segments[-1]["text"].strip()
-
-
-    # Calculate durations (start of next segment - start of current)
-    if parsed_segments:
-        for i in range(len(parsed_segments)):
-            if i + 1 < len(parsed_segments): # If there's a next segment
-                duration = parsed_segments[i+1]["start"] - parsed_segments[i]["start"]
-                parsed_segments[i]["duration"] = max(0.1, duration) # Min duration 0.1s, ensure not negative
-            else: # Last segment
-                # Estimate duration based on text length (e.g., 5 words per second, avg word length 5 chars)
-                # Or a fixed sensible default if text is very short
-                num_chars = len(parsed_segments[i]["text"])
-                estimated_duration = max(2.0, num_chars / 15.0) # At least 2 seconds, or ~15 chars/sec
-                parsed_segments[i]["duration"] = round(estimated_duration, 1)
-        
-        # If the very first segment had no timestamp (start 0) and there's a second segment,
-        # its duration should be up to the start of the second segment.
-        if len(parsed_segments) > 1 and parsed_segments[0]["start"] == 0.0 and parsed_segments[0]["duration"] == 0.0 :
-            parsed_segments[0]["duration"] = max(0.1, parsed_segments[1]["start"])
-
-
-    if not parsed_segments and custom_transcript_text: # Ultimate fallback if all parsing fails
-         parsed_segments.append({"text": custom_transcript_text, "start": 0, "duration": 600}) # Whole text as one segment
-
-    print(f"API: Parsed {len(parsed_segments)} segments from custom transcript.")
+    try:
+        if upload:
+            logger.info("Received custom transcript upload for video_id: %s: %s", video_id, upload.filename)
+            parsed_segments = parse_transcript(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace'), transcript_format)
+            custom_transcript_text = segments_to_text(parsed_segments)
+        else:
+            custom_transcript_text = data['custom_transcript_text']
+            logger.info("Received custom transcript for video_id: %s. Text length: %s", video_id, len(custom_transcript_text))
+            parsed_segments = parse_transcript(custom_transcript_text, transcript_format)
+    except ValueError as e:
+        return jsonify({"error": "Invalid transcript format", "details": str(e)}), 400
+    if not parsed_segments:
+        return jsonify({"error": "Transcript is empty"}), 400
+
+    logger.info("Parsed %s segments from custom transcript.", len(parsed_segments))
     # for seg in parsed_segments[:5]: print(seg) # For debugging parsed segments
     
-    analysis_results = process_video_for_llm_analysis(video_id, custom_transcript_text) # LLM still gets the full raw text
+    # Only chunks whose content changed since the last submission go to the LLM (see incremental_analysis).
+    # Short texts still go to the LLM as the full raw text.
+    existing_video = Video.query.filter_by(video_id=video_id, language=language).first()
+    try:
+        incremental = analyze_transcript_incrementally(existing_video, video_id, custom_transcript_text, parsed_segments)
+    except LLMOverloadedError as e:
+        return _llm_overloaded_response(e)
+    analysis_results = incremental["analysis"]
 
     try:
-        video_obj = Video.query.filter_by(video_id=video_id).first()
+        video_obj = existing_video
         if not video_obj:
-            print(f"API: Video {video_id} not found for custom transcript. Creating new entry.")
-            video_obj = Video(video_id=video_id, video_url=video_url, title=custom_title or f"Video: {video_id} (custom transcript)")
-            db.session.add(video_obj)
+            logger.info("Video %s not found for custom transcript. Creating new entry.", video_id)
+            title = custom_title or f"Video: {video_id} (custom transcript)"
         else:
-            print(f"API: Updating video {video_id} with custom transcript.")
+            logger.info("Updating video %s with custom transcript.", video_id)
+            title = None # keep the stored title
             if custom_title and (not video_obj.title or "custom transcript" not in video_obj.title): 
-                video_obj.title = custom_title # Prefer user's custom title for this text
-
-        video_obj.transcript_text = custom_transcript_text 
-        video_obj.transcript_segments = parsed_segments 
-        video_obj.table_of_contents = analysis_results.get("table_of_contents")
-        # ... (rest of analysis fields update) ...
-        video_obj.key_terms = analysis_results.get("key_terms")
-        video_obj.logical_flow = analysis_results.get("logical_flow")
-        video_obj.summary = analysis_results.get("summary")
-        
-        db.session.commit()
-        print(f"API: Video {video_id} updated/created with custom transcript and analysis.")
+                title = custom_title # Prefer user's custom title for this text
+
+        # Writes the row and its search index entries in one transaction.
+        video_obj = save_video_results(video_id, video_url, custom_transcript_text, parsed_segments, analysis_results, title=title,
+                                       analysis_chunks=incremental["chunks"], language=language)
+        logger.info("Video %s updated/created with custom transcript and analysis.", video_id)
         
         response_data = {
             "message": "Custom transcript processed successfully.",
             "video_id": video_obj.video_id,
             "video_url": video_obj.video_url,
             "title": video_obj.title,
+            "language": video_obj.language,
             "transcript_text": video_obj.transcript_text,
             "segments": video_obj.transcript_segments, 
-            "analysis": analysis_results
+            "analysis": analysis_results,
+            "reanalyzed_regions": incremental["reanalyzed_regions"], # [{start, end}] seconds sent to the LLM this time
+            "reused_chunks": incremental["reused_chunks"]
         }
         return jsonify(response_data), 200
 
     except Exception as e:
         db.session.rollback()
-        print(f"API: Database error for {video_id} with custom transcript: {str(e)}")
+        logger.error("Database error for %s with custom transcript: %s", video_id, str(e))
         # import traceback; traceback.print_exc(); # For more detailed error
         return jsonify({"error": "Database error processing custom transcript.", "details": str(e)}), 500
 
@@ -218,34 +474,40 @@ def explain_text_route():
     if request.method == 'OPTIONS':
         return _build_cors_preflight_response()
     
-    print(f"API: /api/explain_text HIT with method {request.method}") # Keep this log
-    
+    logger.debug("/api/explain_text HIT with method %s", request.method)
     # Restore original logic
     data = request.get_json()
     if not data or 'selected_text' not in data:
-        print("API Error: Missing 'selected_text' in request") # Add log
+        logger.warning("Missing 'selected_text' in request")
         return jsonify({"error": "Missing 'selected_text' in request"}), 400
 
     selected_text = data['selected_text']
     video_id_context = data.get('current_video_id') 
+    try: languages = parse_languages(_languages_param(data))
+    except ValueError as e: return jsonify({"error": "Invalid languages", "details": str(e)}), 400
 
-    print(f"API: Received request to explain text: '{selected_text[:100]}...', context video_id: {video_id_context}")
+    logger.info("Received request to explain text: '%s...', context video_id: %s", selected_text[:100], video_id_context)
 
     if not selected_text.strip():
-        print("API Error: Selected text cannot be empty") # Add log
+        logger.warning("Selected text cannot be empty")
         return jsonify({"error": "Selected text cannot be empty"}), 400
 
-    mock_explanation_data = explain_selected_text_mock(selected_text, video_id_context)
+    explain_context = build_explain_context(selected_text, video_id_context, languages)
+    try:
+        explanation_data = explain_selected_text(selected_text, explain_context["prompt_prefix"], explain_context["context_text"])
+    except LLMOverloadedError as e:
+        return _llm_overloaded_response(e)
 
-    if mock_explanation_data and "explanation" in mock_explanation_data:
+    if explanation_data and "explanation" in explanation_data:
         return jsonify({
-            "message": "Explanation generated (mock).",
-            "explanation": mock_explanation_data["explanation"],
-            "original_text": selected_text 
+            "message": "Explanation generated.",
+            "explanation": explanation_data["explanation"],
+            "original_text": selected_text,
+            "context": explain_context["context"] # transcript window the explanation was based on (None if not located)
         }), 200
     else:
-        print("API Error: Failed to generate mock explanation") # Add log
-        return jsonify({"error": "Failed to generate mock explanation"}), 500
+        logger.warning("Failed to generate explanation: %s", explanation_data.get('error'))
+        return jsonify({"error": "Failed to generate explanation", "details": explanation_data.get("error")}), 500
 
 
 @main_bp.route('/process_custom_text', methods=['POST', 'OPTIONS'])
@@ -263,28 +525,75 @@ def process_custom_text_route():
     if not custom_text.strip():
         return jsonify({"error": "Custom text cannot be empty"}), 400
 
-    print(f"API: Received custom text for analysis. Title: '{title}', Length: {len(custom_text)}")
+    logger.info("Received custom text for analysis. Title: '%s', Length: %s", title, len(custom_text))
+
+    # Texts are stored under their SHA-256: a resubmission (by anyone, on any worker) reuses the stored analysis.
+    content_digest = custom_text_content_digest(custom_text)
+    with span("db_lookup"): custom_text_obj = find_custom_text(content_digest)
+    if custom_text_obj:
+        logger.info("Found custom text %s in database (cache).", content_digest[:12])
+        return jsonify(build_custom_text_response(content_digest, title, custom_text, custom_text_obj.analysis, CUSTOM_TEXT_CACHED_MESSAGE)), 200
 
     # Use your existing LLM service for analysis
     # You might want to adapt the prompt or create a new LLM function if analysis needs differ
-    analysis_results = process_video_for_llm_analysis(video_id="custom_text_id", transcript_text=custom_text) # Pass a placeholder ID or refine
-
-    # For now, we are not saving custom text to DB, just analyzing
-    # Later, you'd save it and return an ID
-    # custom_text_obj = CustomText(title=title, original_content=custom_text, analysis_data=analysis_results)
-    # db.session.add(custom_text_obj)
-    # db.session.commit()
-    # text_id = custom_text_obj.id
-
-    response_data = {
-        "message": "Custom text processed successfully.",
-        "id": "temp_custom_id_" + str(hash(custom_text))[:8], # Temporary ID
-        "title": title,
-        "original_text": custom_text, # Echo back the original text
-        "analysis": analysis_results,
-        "source": "custom_text" # Explicitly set source for frontend store
-    }
-    return jsonify(response_data), 200
+    # Identical texts submitted concurrently share one LLM analysis.
+    try:
+        analysis_results = custom_text_flight.do(content_digest, process_video_for_llm_analysis, video_id="custom_text_id", transcript_text=custom_text) # Pass a placeholder ID or refine
+    except LLMOverloadedError as e:
+        return _llm_overloaded_response(e)
+
+    try:
+        save_custom_text(content_digest, title, custom_text, analysis_results)
+    except Exception as e: # the analysis is still returned; the next submission analyzes again
+        db.session.rollback()
+        logger.error("Database error storing custom text %s: %s", content_digest[:12], str(e))
+
+    return jsonify(build_custom_text_response(content_digest, title, custom_text, analysis_results, "Custom text processed successfully.")), 200
+
+
+@main_bp.route('/custom_texts/<text_id>', methods=['GET'])
+def get_custom_text_route(text_id):
+    """A stored custom text with its analysis. `text_id` is the id /api/process_custom_text returned (the text's SHA-256)."""
+    custom_text_obj = find_custom_text(text_id.lower())
+    if not custom_text_obj:
+        return jsonify({"error": "Custom text not found", "id": text_id}), 404
+    # Rows are never rewritten, so the content digest is a valid ETag.
+    etag = custom_text_obj.content_sha256
+    last_modified = custom_text_obj.created_at.replace(tzinfo=timezone.utc) if custom_text_obj.created_at else None # stored as naive UTC
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    return add_cache_headers(jsonify(custom_text_obj.to_dict()), etag, last_modified), 200
+
+
+@main_bp.route('/search', methods=['GET'])
+def search_route():
+    """Full-text search over transcripts, summaries and key terms: ?q=<text>&limit=20."""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"error": "Missing search query 'q'"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        results = search_transcripts(query, limit=limit)
+    except NotImplementedError as e:
+        return jsonify({"error": "Search unavailable", "details": str(e)}), 501
+    return jsonify({"query": query, "results": results}), 200
+
+@main_bp.route('/cache/stats', methods=['GET'])
+def llm_cache_stats_route():
+    return jsonify(llm_cache.stats()), 200
+
+@main_bp.route('/llm/stats', methods=['GET'])
+def llm_gate_stats_route():
+    return jsonify({"provider": llm_client.provider.name, **llm_client.gate.stats()}), 200
+
+def _llm_overloaded_response(error):
+    logger.warning("LLM overloaded, answering 503: %s", error)
+    response = jsonify({"error": "LLM service is overloaded. Try again shortly.", "details": str(error), "retry_after": error.retry_after})
+    response.headers["Retry-After"] = str(int(error.retry_after))
+    return response, 503
 
 
 # ... (your _build_cors_preflight_response and hello functions) ...
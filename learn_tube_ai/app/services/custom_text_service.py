@@ -0,0 +1,60 @@
+# learn_tube_ai/app/services/custom_text_service.py
+# Analyzed custom texts (/api/process_custom_text), stored in custom_text under the SHA-256 of the text.
+# A submission whose digest is already stored is answered from the row, so the same article costs one
+# LLM analysis no matter how many users submit it or which worker they reach; the digest doubles as the
+# stable id for GET /api/custom_texts/<id>. Placeholder analyses (LLM skipped or failed) are not stored.
+import hashlib
+import logging
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import CustomText
+from .video_processing_service import analysis_succeeded
+
+logger = logging.getLogger(__name__)
+
+CACHED_MESSAGE = "Custom text retrieved from cache."
+
+
+def content_digest(custom_text: str) -> str:
+    return hashlib.sha256(custom_text.encode("utf-8")).hexdigest()
+
+
+def find_custom_text(digest: str) -> Optional[CustomText]:
+    """The stored text with this digest, or None (one query on the unique digest index)."""
+    return CustomText.query.filter_by(content_sha256=digest).first()
+
+
+def save_custom_text(digest: str, title: Optional[str], custom_text: str, analysis: dict) -> Optional[CustomText]:
+    """
+    Stores an analyzed text and returns its row; None when `analysis` is a placeholder (nothing to reuse).
+    If another worker stored the same digest first, its row is returned instead.
+    Raises on other database errors; the caller is responsible for rolling back.
+    """
+    if not analysis_succeeded(analysis):
+        return None
+    custom_text_obj = CustomText(content_sha256=digest, title=title, original_content=custom_text,
+                                 table_of_contents=analysis.get("table_of_contents"), key_terms=analysis.get("key_terms"),
+                                 logical_flow=analysis.get("logical_flow"), summary=analysis.get("summary"))
+    db.session.add(custom_text_obj)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info("Custom text %s was stored concurrently; using that row.", digest[:12])
+        return find_custom_text(digest)
+    return custom_text_obj
+
+
+def build_custom_text_response(digest: str, title: str, custom_text: str, analysis: dict, message: str) -> dict:
+    """JSON payload of /api/process_custom_text."""
+    return {
+        "message": message,
+        "id": digest, # stable across processes; GET /api/custom_texts/<id>
+        "title": title,
+        "original_text": custom_text, # Echo back the original text
+        "analysis": analysis,
+        "source": "custom_text" # Explicitly set source for frontend store
+    }
@@ -0,0 +1,257 @@
+# learn_tube_ai/app/services/embedding_service.py
+# Semantic retrieval over transcript segments. Segments are grouped into overlapping windows,
+# embedded with a local embedder and stored per video row as a float32 matrix (<video_id>.<language>.npy, one
+# L2-normalized row per window) next to a small JSON file describing the windows. Matrices are
+# memory-mapped on load, so they live in the OS page cache (shared between workers) rather than
+# on each process heap, and a batch of queries is scored with a single matrix product.
+# numpy (and an embedding model) are loaded on the first query, not when the app starts.
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional
+
+from app import db
+from app.models import Video, TranscriptSegment
+from .llm_cache import MemoryLRUBackend
+from .singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _stem(word: str) -> str:
+    """Crude plural folding ('images' -> 'image') so the hashing embedder matches simple inflections."""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _tokens(text: str) -> List[str]:
+    words = [_stem(word) for word in _NON_WORD.sub(" ", (text or "").lower()).split()]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])] # unigrams + bigrams
+
+
+@lru_cache(maxsize=200_000)
+def _token_hash(token: str) -> int:
+    # hash() is salted per process; the stored matrices must be reproducible across restarts.
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder: every unigram/bigram is hashed to one of `dim` buckets
+    with a +/-1 sign, and rows are L2-normalized. No model download, stable across processes, and
+    good enough for lexical-ish retrieval; swap in a real model through EMBEDDING_BACKEND.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in _tokens(text):
+                hashed = _token_hash(token)
+                rows.append(row)
+                cols.append(hashed % self.dim)
+                signs.append(1.0 if hashed >> 63 else -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.asarray(rows), np.asarray(cols)), np.asarray(signs, dtype=np.float32))
+        return _normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a local sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ValueError("EMBEDDING_BACKEND=sentence-transformers requires the 'sentence-transformers' package.") from e
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+        vectors = self._model.encode(list(texts), convert_to_numpy=True, show_progress_bar=False)
+        return _normalize_rows(vectors.astype(np.float32, copy=False))
+
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+EMBEDDING_BACKENDS = ("hashing", "sentence-transformers")
+
+
+def create_embedder(backend: str, dim: int = 512, model_name: Optional[str] = None):
+    if backend == "hashing":
+        return HashingEmbedder(dim)
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbedder(model_name or "all-MiniLM-L6-v2")
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use 'hashing' or 'sentence-transformers'.")
+
+
+def build_windows(segments: List[dict], size: int, stride: int) -> List[dict]:
+    """
+    Overlapping windows of `size` consecutive segments, starting every `stride` segments; the last
+    window always reaches the end of the transcript. Each window keeps its ordinals and time span.
+    """
+    windows = []
+    if not segments:
+        return windows
+    starts = list(range(0, max(len(segments) - size, 0) + 1, stride))
+    if starts[-1] + size < len(segments):
+        starts.append(len(segments) - size)
+    for first in starts:
+        chunk = segments[first:first + size]
+        last = chunk[-1]
+        windows.append({
+            "segment_from": first,
+            "segment_to": first + len(chunk) - 1,
+            "start": float(chunk[0].get("start") or 0.0),
+            "end": float(last.get("start") or 0.0) + float(last.get("duration") or 0.0),
+            "text": " ".join((segment.get("text") or "").strip() for segment in chunk).strip(),
+        })
+    return windows
+
+
+class _VideoEmbeddings:
+    __slots__ = ("version", "matrix", "windows")
+
+    def __init__(self, version: str, matrix: "np.ndarray", windows: List[dict]):
+        self.version = version
+        self.matrix = matrix
+        self.windows = windows
+
+
+class EmbeddingIndex:
+    """
+    Per-video window embeddings on disk, built lazily on the first query and rebuilt whenever the
+    video is re-processed (the stored version is the video's updated_at) or the embedder changes.
+    Queries need an app context (segments are read from transcript_segment on a rebuild).
+    """
+
+    def __init__(self):
+        self.directory = None
+        self._embedder_settings = ("hashing", 512, None) # (backend, dim, model_name)
+        self._embedder = None # created on first use; a sentence-transformers model is expensive to load
+        self._embedder_lock = threading.Lock()
+        self.window_size = 6
+        self.window_stride = 3
+        self._loaded = MemoryLRUBackend(max_entries=64) # _key(video) -> _VideoEmbeddings (memory-mapped matrix)
+        self._builds = SingleFlight()
+        self._write_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = app.config.get("EMBEDDING_DIR") or os.path.join(app.instance_path, "embeddings")
+        os.makedirs(self.directory, exist_ok=True)
+        backend = app.config.get("EMBEDDING_BACKEND", "hashing")
+        if backend not in EMBEDDING_BACKENDS: # fail at startup rather than on the first query
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use 'hashing' or 'sentence-transformers'.")
+        self._embedder_settings = (backend, app.config.get("EMBEDDING_DIM", 512), app.config.get("EMBEDDING_MODEL"))
+        self._embedder = None
+        self.window_size = app.config.get("EMBEDDING_WINDOW_SEGMENTS", 6)
+        self.window_stride = app.config.get("EMBEDDING_WINDOW_STRIDE", 3)
+        self._loaded = MemoryLRUBackend(max_entries=app.config.get("EMBEDDING_MAX_LOADED", 64))
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            with self._embedder_lock:
+                if self._embedder is None:
+                    backend, dim, model_name = self._embedder_settings
+                    self._embedder = create_embedder(backend, dim=dim, model_name=model_name)
+        return self._embedder
+
+    @staticmethod
+    def _key(video_obj: Video) -> str:
+        return f"{video_obj.video_id}.{video_obj.language}" # every language variant has its own windows
+
+    def _paths(self, key: str):
+        # Named by a hash of the key: video ids come from clients and must not pick the path.
+        base = os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+        return base + ".npy", base + ".json"
+
+    def _version(self, video_obj: Video) -> str:
+        changed_at = video_obj.updated_at or video_obj.created_at
+        return f"{self.embedder.name}:{changed_at.isoformat() if changed_at else ''}"
+
+    def _load(self, key: str, version: str) -> Optional[_VideoEmbeddings]:
+        import numpy as np
+        matrix_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != version:
+                return None
+            matrix = np.load(matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return _VideoEmbeddings(version, matrix, meta["windows"])
+
+    def _build(self, video_obj: Video, version: str) -> _VideoEmbeddings:
+        import numpy as np
+        rows = db.session.execute(
+            db.select(TranscriptSegment.start, TranscriptSegment.duration, TranscriptSegment.text)
+            .where(TranscriptSegment.video_pk == video_obj.id).order_by(TranscriptSegment.ordinal)
+        ).all()
+        windows = build_windows([{"start": r.start, "duration": r.duration, "text": r.text} for r in rows], self.window_size, self.window_stride)
+        matrix = self.embedder.embed([window["text"] for window in windows]) if windows else np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+        key = self._key(video_obj)
+        matrix_path, meta_path = self._paths(key)
+        suffix = f".{os.getpid()}.tmp"
+        with self._write_lock: # write-then-rename, so readers never see a half-written file
+            np.save(matrix_path + suffix + ".npy", matrix)
+            with open(meta_path + suffix, "w", encoding="utf-8") as f:
+                json.dump({"version": version, "dim": int(matrix.shape[1]), "windows": windows}, f)
+            os.replace(matrix_path + suffix + ".npy", matrix_path)
+            os.replace(meta_path + suffix, meta_path)
+        logger.info("Indexed %s: %s windows x %s dims.", key, len(windows), matrix.shape[1])
+        return self._load(key, version) or _VideoEmbeddings(version, matrix, windows)
+
+    def get(self, video_obj: Video) -> _VideoEmbeddings:
+        """Embeddings for the current version of `video_obj`: memory, then disk, then a (single-flight) rebuild."""
+        key, version = self._key(video_obj), self._version(video_obj)
+        embeddings = self._loaded.get(key)
+        if embeddings is None or embeddings.version != version:
+            embeddings = self._load(key, version) or self._builds.do((key, version), self._build, video_obj, version)
+            self._loaded.set(key, embeddings)
+        return embeddings
+
+    def retrieve(self, video_obj: Video, queries: List[str], k: int = 5) -> List[List[dict]]:
+        """
+        Top-`k` windows by cosine similarity for each query, best first. All queries are embedded
+        together and scored against the video's matrix in one product.
+        """
+        import numpy as np
+        embeddings = self.get(video_obj)
+        if not queries:
+            return []
+        if not embeddings.windows:
+            return [[] for _ in queries]
+        scores = self.embedder.embed(queries) @ np.asarray(embeddings.matrix).T # (queries, windows); rows are unit length
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            results.append([{**embeddings.windows[i], "score": round(float(scores[row, i]), 4)} for i in ranked])
+        return results
+
+
+embedding_index = EmbeddingIndex()
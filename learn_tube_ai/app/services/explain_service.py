@@ -0,0 +1,159 @@
+# learn_tube_ai/app/services/explain_service.py
+# Context for /api/explain_text. Instead of sending a whole transcript (or nothing) with every
+# explain call, the selected text is located in the video's transcript and only the segments
+# around it are read back (TranscriptSegment.around). Selections that don't occur verbatim (a
+# question, text copied from the summary) get the best-matching window from the embedding index.
+# Video-level context (title, summary, key terms, sections) goes into a per-video prompt prefix
+# that is byte-for-byte identical across explain calls, so providers with prompt caching can reuse it.
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from app import db
+from app.models import Video, TranscriptSegment
+from .llm_cache import MemoryLRUBackend
+from .embedding_service import embedding_index
+from .llm_service import _format_timestamp
+from .transcript_languages import find_stored_language
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _normalize(text: str) -> str:
+    """Lowercase, punctuation to spaces, whitespace collapsed; selections copied from the UI rarely match the raw text exactly."""
+    return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+
+class SegmentIndex:
+    """
+    Maps selected text to segment ordinals for one video. Segment texts are normalized and joined with
+    single spaces; `offsets[i]` is where segment i starts in the joined text, so a substring hit is turned
+    into a segment range with two bisects.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.offsets = []
+        parts = []
+        position = 0
+        for text in texts:
+            normalized = _normalize(text)
+            self.offsets.append(position)
+            parts.append(normalized)
+            position += len(normalized) + 1
+        self.text = " ".join(parts)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def locate(self, selected_text: str) -> Optional[Tuple[int, int]]:
+        """(first, last) ordinal of the segments covering `selected_text`, or None if it can't be placed."""
+        needle = _normalize(selected_text)
+        if not needle or not self.offsets:
+            return None
+        at = self.text.find(needle)
+        if at >= 0:
+            return bisect_right(self.offsets, at) - 1, bisect_right(self.offsets, at + len(needle) - 1) - 1
+        return None
+
+
+class ExplainContext:
+    """Context window settings and per-video caches for explain calls (configured by init_app)."""
+
+    def __init__(self):
+        self.context_before = 3 # segments before the selection
+        self.context_after = 3 # segments after the selection
+        self.min_similarity = 0.2 # cosine score for a semantic match to be used as context
+        self.segment_indexes = MemoryLRUBackend(max_entries=128) # _version_key(video) -> SegmentIndex
+        self.prompt_prefixes = MemoryLRUBackend(max_entries=128) # _version_key(video) -> prompt prefix
+
+    def init_app(self, app):
+        self.context_before = app.config.get("EXPLAIN_CONTEXT_BEFORE", 3)
+        self.context_after = app.config.get("EXPLAIN_CONTEXT_AFTER", 3)
+        self.min_similarity = app.config.get("EXPLAIN_MIN_SIMILARITY", 0.2)
+        cache_size = app.config.get("EXPLAIN_INDEX_CACHE_SIZE", 128)
+        self.segment_indexes = MemoryLRUBackend(max_entries=cache_size)
+        self.prompt_prefixes = MemoryLRUBackend(max_entries=cache_size)
+        app.extensions["explain_context"] = self
+
+
+explain_context = ExplainContext()
+
+
+def _version_key(video_obj: Video) -> str:
+    """Cache key that changes whenever the video row is rewritten (re-processing bumps updated_at)."""
+    changed_at = video_obj.updated_at or video_obj.created_at
+    return f"{video_obj.id}:{changed_at.isoformat() if changed_at else ''}"
+
+
+def get_segment_index(video_obj: Video) -> SegmentIndex:
+    key = _version_key(video_obj)
+    index = explain_context.segment_indexes.get(key)
+    if index is None:
+        texts = db.session.execute(
+            db.select(TranscriptSegment.text).where(TranscriptSegment.video_pk == video_obj.id).order_by(TranscriptSegment.ordinal)
+        ).scalars().all()
+        index = SegmentIndex(texts)
+        explain_context.segment_indexes.set(key, index)
+    return index
+
+
+def build_prompt_prefix(video_obj: Video) -> str:
+    """
+    Stable per-video context for explain calls. Only depends on the stored analysis, so every explain
+    call for the same version of the video sends the identical prefix.
+    """
+    key = _version_key(video_obj)
+    prefix = explain_context.prompt_prefixes.get(key)
+    if prefix is not None:
+        return prefix
+
+    lines = [f"Video: {video_obj.title or video_obj.video_id}"]
+    if video_obj.summary:
+        lines += ["", f"Summary: {video_obj.summary}"]
+    key_terms = [term for term in video_obj.key_terms or [] if isinstance(term, dict) and term.get("term")]
+    if key_terms:
+        lines += ["", "Key terms:"] + [f"- {term['term']}: {term.get('definition', '')}" for term in key_terms]
+    sections = [entry for entry in video_obj.table_of_contents or [] if isinstance(entry, dict) and entry.get("title")]
+    if sections:
+        lines += ["", "Sections:"] + [f"- [{_format_timestamp(entry.get('timestamp_seconds') or 0)}] {entry['title']}" for entry in sections]
+    prefix = "\n".join(lines)
+    explain_context.prompt_prefixes.set(key, prefix)
+    return prefix
+
+
+def build_explain_context(selected_text: str, video_id: Optional[str], languages: Optional[List[str]] = None) -> dict:
+    """
+    {'prompt_prefix', 'context_text', 'context'} for explaining `selected_text` within video `video_id`
+    (the stored variant find_stored_language picks for `languages`).
+    `context` is {'segment_from', 'segment_to', 'start', 'end'} for the excerpt sent to the LLM, or None
+    when the video is unknown or nothing in its transcript matches the selection.
+    """
+    result = {"prompt_prefix": None, "context_text": None, "context": None}
+    if not video_id:
+        return result
+    language = find_stored_language(video_id, languages)
+    video_obj = Video.query.filter_by(video_id=video_id, language=language).first() if language else None
+    if not video_obj:
+        return result
+    result["prompt_prefix"] = build_prompt_prefix(video_obj)
+
+    located = get_segment_index(video_obj).locate(selected_text)
+    if located is not None:
+        first, last = located
+        segments = TranscriptSegment.around(video_obj.id, first, explain_context.context_before, last - first + explain_context.context_after)
+    else:
+        matches = embedding_index.retrieve(video_obj, [selected_text], k=1)[0]
+        if not matches or matches[0]["score"] < explain_context.min_similarity:
+            return result
+        first, last = matches[0]["segment_from"], matches[0]["segment_to"]
+        segments = TranscriptSegment.around(video_obj.id, first, 0, last - first)
+    if not segments:
+        return result
+    result["context_text"] = "\n".join(f"[{_format_timestamp(segment.start)}] {segment.text}" for segment in segments)
+    result["context"] = {
+        "segment_from": segments[0].ordinal,
+        "segment_to": segments[-1].ordinal,
+        "start": segments[0].start,
+        "end": segments[-1].start + (segments[-1].duration or 0.0),
+    }
+    return result
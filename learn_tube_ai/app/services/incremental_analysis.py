@@ -0,0 +1,55 @@
+# learn_tube_ai/app/services/incremental_analysis.py
+# Re-analysis of an edited transcript that only pays for the parts that changed.
+# A long transcript is analyzed in time-grid chunks (llm_service.chunk_transcript_segments); each
+# chunk's analysis is stored in analysis_chunk with a hash of its input. On the next submission the
+# new chunks are hashed the same way: chunks with a stored hash reuse their analysis, the others go
+# to the LLM, and everything is merged again into the video's ToC / key terms / flow / summary.
+import logging
+from typing import List, Optional
+
+from app import db
+from app.models import Video, AnalysisChunk
+from .llm_service import llm_client, chunk_transcript_segments, chunk_content_hash, analyze_chunks, merge_chunk_analyses
+from .video_processing_service import process_video_for_llm_analysis, _normalize_analysis, _skip_reason
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_transcript_incrementally(video_obj: Optional[Video], video_id: str, transcript_text: str,
+                                     transcript_segments: Optional[List[dict]]) -> dict:
+    """
+    Analysis of `transcript_text` for `video_obj` (None for a new video), reusing stored chunk analyses.
+    Returns {'analysis': {...}, 'chunks': [...], 'reanalyzed_regions': [...], 'reused_chunks': int}:
+      - 'analysis' has the shape process_video_for_llm_analysis returns;
+      - 'chunks' are the analysis_chunk rows to store (see video_store.save_video_results); empty when the
+        transcript was analyzed in one piece;
+      - 'reanalyzed_regions' lists {'start', 'end'} (seconds) of the chunks that went to the LLM.
+    Raises LLMOverloadedError when the LLM gate sheds a call.
+    """
+    chunks = chunk_transcript_segments(transcript_segments) if transcript_segments and len(transcript_text or "") > llm_client.chunk_max_chars else []
+    if _skip_reason(transcript_text) or len(chunks) <= 1:
+        analysis = process_video_for_llm_analysis(video_id, transcript_text, transcript_segments)
+        last = (transcript_segments or [{}])[-1]
+        end = float(last.get("start") or 0.0) + float(last.get("duration") or 0.0)
+        return {"analysis": analysis, "chunks": [], "reanalyzed_regions": [{"start": 0.0, "end": end}], "reused_chunks": 0}
+
+    hashes = [chunk_content_hash(chunk) for chunk in chunks]
+    stored = {}
+    if video_obj is not None and video_obj.id is not None:
+        stored = dict(db.session.execute(
+            db.select(AnalysisChunk.content_hash, AnalysisChunk.analysis).where(AnalysisChunk.video_pk == video_obj.id)
+        ).all())
+    known = {chunk["index"]: stored[content_hash] for chunk, content_hash in zip(chunks, hashes) if content_hash in stored}
+    logger.info("%s: reusing %s of %s chunk analyses, re-analyzing %s.", video_id, len(known), len(chunks), len(chunks) - len(known))
+
+    partial_results = analyze_chunks(chunks, known)
+    return {
+        "analysis": _normalize_analysis(merge_chunk_analyses(chunks, partial_results)),
+        "chunks": [
+            {"ordinal": chunk["index"], "start": chunk["start"], "end": chunk["end"], "content_hash": content_hash, "analysis": partial}
+            for chunk, content_hash, partial in zip(chunks, hashes, partial_results)
+            if partial and not partial.get("error") # failed chunks are retried next time
+        ],
+        "reanalyzed_regions": [{"start": chunk["start"], "end": chunk["end"]} for chunk in chunks if chunk["index"] not in known],
+        "reused_chunks": len(known),
+    }
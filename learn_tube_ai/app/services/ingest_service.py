@@ -0,0 +1,134 @@
+# learn_tube_ai/app/services/ingest_service.py
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from app import db
+from app.models import Video
+from .rate_limit import TokenBucket
+from .video_processing_service import extract_video_id, fetch_and_analyze_video, video_flight, analysis_error, analysis_succeeded
+from .video_store import save_video_results
+from .transcript_languages import transcript_languages, store_listing
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_videos(video_urls: List[str], parallelism: int = 4, rate_per_second: Optional[float] = None,
+                  batch_size: int = 50, refresh: bool = False, languages: Optional[List[str]] = None,
+                  report_progress: Optional[Callable[[str], None]] = None) -> List[dict]:
+    """
+    Fetches transcripts and runs LLM analysis for many videos at once.
+
+    URLs are deduplicated by extracted video_id and videos already cached in the `video` table in one of
+    the `languages` (default: the TRANSCRIPT_LANGUAGES chain) are skipped (unless `refresh`). Fetch + analysis runs on `parallelism` worker threads, with transcript
+    fetches started at most `rate_per_second` times per second. Worker threads never touch the
+    database: results are written from the calling thread, one transaction per `batch_size` videos.
+
+    Returns one result dict per input URL: {'video_url', 'video_id', 'status', 'error'}, where status
+    is one of 'processed', 'cached', 'duplicate', 'invalid', 'failed'.
+    A video whose LLM analysis was skipped or failed is 'failed': its transcript and placeholder analysis
+    are stored only if there is no real analysis stored for it yet (a refresh never overwrites one).
+    """
+    languages = transcript_languages.chain(languages)
+    results = []
+    pending = {} # video_id -> result dict of the first URL that mentioned it
+    for video_url in video_urls:
+        video_url = (video_url or "").strip()
+        video_id = extract_video_id(video_url) if video_url else None
+        result = {"video_url": video_url, "video_id": video_id, "status": None, "error": None}
+        results.append(result)
+        if not video_id:
+            result["status"] = "invalid"
+            result["error"] = "Could not extract video ID."
+        elif video_id in pending:
+            result["status"] = "duplicate"
+        else:
+            pending[video_id] = result
+
+    if pending and not refresh:
+        cached_ids = {row.video_id for row in db.session.query(Video.video_id)
+                      .filter(Video.video_id.in_(list(pending)), Video.language.in_(languages), Video.transcript_text.isnot(None))}
+        for video_id in cached_ids:
+            pending.pop(video_id)["status"] = "cached"
+
+    total = len(pending)
+    logger.info("%s URLs -> %s videos to process (parallelism %s, rate %s/s).", len(video_urls), total, parallelism, rate_per_second)
+    if not total:
+        return results
+
+    limiter = TokenBucket(rate_per_second) if rate_per_second else None
+
+    def work(video_id):
+        if limiter:
+            limiter.acquire()
+        return video_flight.do((video_id, tuple(languages)), fetch_and_analyze_video, video_id, languages)
+
+    batch = []
+    done_count = 0
+    with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="ingest") as executor:
+        futures = {executor.submit(work, video_id): video_id for video_id in pending}
+        for future in as_completed(futures):
+            video_id = futures[future]
+            result = pending[video_id]
+            done_count += 1
+            try:
+                fetch_result = future.result()
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+                continue
+            if fetch_result.get("error") or not fetch_result.get("text"):
+                result["status"] = "failed"
+                result["error"] = fetch_result.get("error") or "Transcript is unavailable or empty."
+            if result["status"] is None or fetch_result.get("listing"): # failed fetches still cache what YouTube listed
+                batch.append((result, fetch_result))
+                if len(batch) >= batch_size:
+                    _write_batch(batch)
+                    batch = []
+            if report_progress:
+                report_progress(f"processed {done_count}/{total}")
+    if batch:
+        _write_batch(batch)
+
+    logger.info("Finished. %s", ", ".join(f"{status}={sum(1 for r in results if r['status'] == status)}"
+                                          for status in ("processed", "cached", "duplicate", "invalid", "failed")))
+    return results
+
+
+def _write_batch(batch: list):
+    """Writes a batch of results (videos and transcript listings) in a single transaction."""
+    try:
+        for result, fetch_result in batch:
+            if fetch_result.get("listing"):
+                store_listing(result["video_id"], fetch_result["listing"], commit=False)
+            if result["status"] == "failed":
+                continue
+            analysis_problem = analysis_error(fetch_result["analysis"])
+            if analysis_problem and _has_stored_analysis(result["video_id"], fetch_result["language"]):
+                result["status"] = "failed" # keep the stored analysis (and the transcript it belongs to)
+                result["error"] = f"Analysis not updated: {analysis_problem}"
+                continue
+            try:
+                save_video_results(result["video_id"], result["video_url"], fetch_result["text"],
+                                   fetch_result.get("segments"), fetch_result["analysis"], commit=False,
+                                   language=fetch_result["language"], translated_from=fetch_result["translated_from"])
+                result["status"] = "failed" if analysis_problem else "processed"
+                result["error"] = f"LLM analysis incomplete: {analysis_problem}" if analysis_problem else None
+            except Exception as e: # only this video's SAVEPOINT is rolled back
+                result["status"] = "failed"
+                result["error"] = f"Database error: {e}"
+        db.session.commit()
+        logger.info("Committed batch of %s videos.", len(batch))
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Database error committing batch: %s", e)
+        for result, _ in batch:
+            if result["status"] == "processed": # fetch failures keep their own error
+                result["status"] = "failed"
+                result["error"] = f"Database error: {e}"
+
+
+def _has_stored_analysis(video_id: str, language: str) -> bool:
+    """Whether (video_id, language) is stored with a real LLM analysis (not a skipped/failed placeholder)."""
+    logical_flow = db.session.query(Video.logical_flow).filter_by(video_id=video_id, language=language).scalar()
+    return logical_flow is not None and analysis_succeeded({"logical_flow": logical_flow})
@@ -0,0 +1,314 @@
+# learn_tube_ai/app/services/job_service.py
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import Job
+from .video_processing_service import fetch_and_analyze_video, video_flight, analysis_error
+from .video_store import save_video_results, build_video_response, build_unsaved_video_response
+from .transcript_languages import store_listing
+from .ingest_service import ingest_videos
+from .prefetch_service import prefetch_scheduler
+from .llm_providers import LLMOverloadedError
+
+logger = logging.getLogger(__name__)
+
+def run_process_video_job(job: Job, report_progress) -> tuple:
+    """
+    The fetch -> analyze -> persist pipeline behind /api/process_video.
+    Returns (response_payload, http_status), mirroring what the endpoint used to return inline.
+    """
+    video_id = job.payload["video_id"]
+    video_url = job.payload["video_url"]
+    languages = job.payload.get("languages") # None (the default chain) for jobs queued before languages existed
+
+    report_progress("fetching_and_analyzing")
+    try:
+        fetch_result = video_flight.do((video_id, tuple(languages or ())), fetch_and_analyze_video, video_id, languages)
+    except LLMOverloadedError as e:
+        logger.warning("LLM overloaded while processing %s: %s", video_id, e)
+        return {"error": "LLM service is overloaded. Try again shortly.", "details": str(e), "retry_after": e.retry_after, "video_id": video_id, "video_url": video_url}, 503
+    transcript_text = fetch_result.get("text")
+    transcript_segments = fetch_result.get("segments")
+    transcript_error = fetch_result.get("error")
+    analysis_results = fetch_result.get("analysis")
+    analysis_problem = analysis_error(analysis_results) if transcript_text and not transcript_error else None
+    if fetch_result.get("listing"): # committed together with the video below, or on its own otherwise
+        store_listing(video_id, fetch_result["listing"], commit=bool(transcript_error or not transcript_text or analysis_problem))
+    if transcript_error or not transcript_text:
+        logger.warning("Failed to fetch transcript for %s. Error: %s", video_id, transcript_error)
+        return {"error": "Failed to retrieve transcript automatically", "details": transcript_error or "Transcript is unavailable or empty.", "video_id": video_id, "video_url": video_url}, 422
+    if analysis_problem:
+        # A partial or placeholder analysis would be served as a complete cache hit from now on.
+        logger.warning("Analysis of %s did not complete, not saving it: %s", video_id, analysis_problem)
+        return build_unsaved_video_response(video_id, video_url, fetch_result, analysis_results, analysis_problem), 200
+
+    report_progress("saving")
+    try:
+        video_obj = save_video_results(video_id, video_url, transcript_text, transcript_segments, analysis_results,
+                                       language=fetch_result["language"], translated_from=fetch_result["translated_from"])
+    except Exception as e:
+        db.session.rollback()
+        logger.error("Database error for %s: %s", video_id, str(e))
+        return {"error": "Database error after processing video.", "details": str(e)}, 500
+    logger.info("Video %s and its data (re-)saved to database.", video_id)
+    return build_video_response(video_obj, "Video processed successfully.", analysis=analysis_results), 200
+
+
+def run_process_videos_job(job: Job, report_progress) -> tuple:
+    """Batch ingestion behind /api/process_videos."""
+    results = ingest_videos(
+        job.payload["video_urls"],
+        parallelism=job.payload.get("parallelism", 4),
+        rate_per_second=job.payload.get("rate_per_second"),
+        batch_size=job.payload.get("batch_size", 50),
+        refresh=job.payload.get("refresh", False),
+        languages=job.payload.get("languages"),
+        report_progress=report_progress,
+    )
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"message": "Batch processed.", "counts": counts, "results": results}, 200
+
+
+def run_prefetch_job(job: Job, report_progress) -> tuple:
+    """One prefetch pass over the watchlist behind /api/prefetch/run, regardless of the off-peak window."""
+    report_progress("prefetching")
+    result = prefetch_scheduler.run_once(force=True)
+    if "skipped" in result:
+        return {"message": f"Prefetch skipped: {result['skipped']}.", **result}, 200
+    return {"message": "Prefetch pass finished.", **result}, 200
+
+
+# Maps Job.kind to the function that executes it.
+JOB_HANDLERS = {
+    "process_video": run_process_video_job,
+    "process_videos": run_process_videos_job,
+    "prefetch": run_prefetch_job,
+}
+
+
+class JobQueue:
+    """
+    In-process job queue. Job state lives in the `job` table (SQLite by default),
+    work is executed by a thread pool so request threads return immediately.
+    While a process holds a job (queued in its pool or running) it stamps the job's heartbeat_at,
+    so a job is only considered abandoned once no process has stamped it for JOB_STALE_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._submit_lock = threading.Lock()
+        self._held = set() # ids of jobs this process accepted and has not finished
+        self._held_lock = threading.Lock()
+        self._heartbeat_thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        max_workers = app.config.get("JOB_WORKERS", 4)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+        app.extensions["job_queue"] = self
+        with app.app_context():
+            try:
+                self.fail_stale_jobs()
+            except SQLAlchemyError as e: # e.g. `flask db upgrade` creating the job table
+                db.session.rollback()
+                logger.debug("Skipped reconciling stale jobs: %s", e)
+
+    def submit(self, kind: str, payload: dict, video_id: str = None) -> Job:
+        """
+        Persists a new queued Job and hands it to the worker pool.
+        If a job of the same kind is already queued or running for `video_id` (and the same
+        payload["languages"]), that job is returned instead so concurrent callers share one execution.
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._submit_lock:
+            if video_id:
+                existing_job = self.find_active(kind, video_id, payload.get("languages"))
+                if existing_job:
+                    logger.info("Reusing in-flight job %s (%s) for video %s.", existing_job.id, kind, video_id)
+                    return existing_job
+            job = Job(id=uuid.uuid4().hex, kind=kind, status="queued", progress="queued", video_id=video_id, payload=payload,
+                      worker=self.worker_id, heartbeat_at=_utcnow())
+            db.session.add(job)
+            db.session.commit()
+        logger.info("Queued job %s (%s) for video %s.", job.id, kind, video_id)
+        with self._held_lock:
+            self._held.add(job.id)
+        self._ensure_heartbeat()
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def find_active(self, kind: str, video_id: str, languages=None):
+        """
+        Returns the queued/running job for (kind, video_id, languages), if any.
+        The lookup goes through the job table so it also sees jobs submitted by other worker processes.
+        Jobs without a heartbeat for JOB_STALE_SECONDS are ignored (their worker died).
+        """
+        active = (Job.query
+                  .filter_by(kind=kind, video_id=video_id)
+                  .filter(Job.status.in_(["queued", "running"]))
+                  .filter(_last_seen(Job) >= self._stale_cutoff())
+                  .order_by(Job.created_at.desc()))
+        return next((job for job in active if (job.payload or {}).get("languages") == languages), None)
+
+    @property
+    def worker_id(self) -> str:
+        """Identifies this process in job.worker; computed per call so forked workers get their own pid."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _stale_cutoff(self) -> datetime:
+        stale_after = timedelta(seconds=self.app.config.get("JOB_STALE_SECONDS", 900))
+        return _utcnow() - stale_after
+
+    def beat(self) -> int:
+        """
+        Stamps heartbeat_at on every job this process holds and returns how many rows were stamped.
+        Jobs waiting in the pool's backlog and jobs stuck in one long stage are stamped alike,
+        so neither looks abandoned to fail_stale_jobs while this process is alive.
+        """
+        with self._held_lock:
+            held = list(self._held)
+        if not held:
+            return 0
+        with self.app.app_context():
+            try:
+                stamped = db.session.execute(
+                    update(Job)
+                    .where(Job.id.in_(held), Job.status.in_(["queued", "running"]))
+                    .values(heartbeat_at=_utcnow(), updated_at=Job.updated_at) # a heartbeat is not an update
+                ).rowcount
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.warning("Job heartbeat failed: %s", e)
+                return 0
+        return stamped
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_thread is not None and self._heartbeat_thread.is_alive():
+            return
+        with self._held_lock:
+            if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+                self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+                self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self):
+        interval = self.app.config.get("JOB_HEARTBEAT_SECONDS", 30)
+        while True:
+            time.sleep(interval)
+            self.beat()
+
+    def fail_stale_jobs(self) -> int:
+        """
+        Marks queued/running jobs without a heartbeat for JOB_STALE_SECONDS as failed and returns how many.
+        The process holding them died or was restarted, so nothing will finish them and their pollers would wait forever.
+        Jobs held by live processes (this one or others) are stamped every JOB_HEARTBEAT_SECONDS, so they are left alone.
+        """
+        stale_jobs = (Job.query
+                      .filter(Job.status.in_(["queued", "running"]))
+                      .filter(_last_seen(Job) < self._stale_cutoff())
+                      .all())
+        for job in stale_jobs:
+            self._mark_abandoned(job)
+        if stale_jobs:
+            db.session.commit()
+            logger.warning("Marked %s stale jobs as failed.", len(stale_jobs))
+        return len(stale_jobs)
+
+    def fail_if_stale(self, job: Job) -> Job:
+        """Status lookups: fails `job` if it is queued/running but stale (see fail_stale_jobs)."""
+        if job.status in ("queued", "running") and (job.heartbeat_at or job.updated_at or job.created_at) < self._stale_cutoff():
+            self._mark_abandoned(job)
+            db.session.commit()
+            logger.warning("Job %s was stale; marked as failed.", job.id)
+        return job
+
+    @staticmethod
+    def _mark_abandoned(job: Job):
+        job.status = "failed"
+        job.progress = "failed"
+        job.error = "Job was abandoned: its worker stopped before it finished."
+        job.result = {"error": "Job was abandoned.", "details": job.error, "video_id": job.video_id}
+        job.result_status = 500
+
+    def _run(self, job_id: str):
+        try:
+            with self.app.app_context():
+                self._execute(job_id)
+        finally:
+            with self._held_lock:
+                self._held.discard(job_id)
+
+    def _execute(self, job_id: str):
+        # Claim the job only if it is still queued: a job failed as abandoned while it sat in the
+        # backlog must not come back to life as running and then done.
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", worker=self.worker_id, heartbeat_at=_utcnow())
+        ).rowcount
+        db.session.commit()
+        job = db.session.get(Job, job_id)
+        if job is None:
+            logger.warning("Job %s vanished before it could run.", job_id)
+            return
+        if not claimed:
+            logger.warning("Job %s is '%s' rather than queued; not running it.", job_id, job.status)
+            return
+        video_id = job.video_id
+
+        def report_progress(stage: str):
+            db.session.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(progress=stage))
+            db.session.commit()
+
+        try:
+            result, status_code = JOB_HANDLERS[job.kind](job, report_progress)
+            status = "done" if status_code < 400 else "failed"
+            finished = self._finish(job_id, status=status, result=result, result_status=status_code,
+                                    error=result.get("error") if status_code >= 400 else None)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Job %s crashed: %s", job_id, e)
+            finished = self._finish(job_id, status="failed", error=str(e), result_status=500,
+                                    result={"error": "Job failed unexpectedly.", "details": str(e), "video_id": video_id})
+        if finished:
+            logger.info("Job %s finished with status '%s'.", job_id, db.session.get(Job, job_id).status)
+        else:
+            logger.warning("Job %s was no longer running when it finished; its result was dropped.", job_id)
+
+    @staticmethod
+    def _finish(job_id: str, **values) -> bool:
+        """Writes the outcome of a running job; returns False (writing nothing) if it is no longer running."""
+        finished = db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status == "running").values(progress=values["status"], **values)
+        ).rowcount
+        db.session.commit()
+        return bool(finished)
+
+
+def _utcnow() -> datetime:
+    # Naive UTC, like the values the job table's DateTime columns hand back.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _last_seen(job_model):
+    # Rows written before the heartbeat column existed fall back to their last update.
+    return func.coalesce(job_model.heartbeat_at, job_model.updated_at, job_model.created_at)
+
+
+job_queue = JobQueue()
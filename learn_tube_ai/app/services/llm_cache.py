@@ -0,0 +1,172 @@
+# learn_tube_ai/app/services/llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class MemoryLRUBackend:
+    """In-process LRU cache with a maximum entry count and optional TTL (seconds)."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Persistent cache stored in a standalone SQLite file, shared by all workers on the host."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._connect().execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), time.time()))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM results, keyed by a hash of (prompt template, model, input text).
+    Backends are checked in order (fastest first); a hit in a slower backend is copied into the faster ones.
+    Results carrying an 'error' key (failed or incomplete analyses, failed explanations) are never stored.
+    """
+
+    def __init__(self, backends: Optional[list] = None):
+        self.backends = backends if backends is not None else [MemoryLRUBackend()]
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def init_app(self, app):
+        backends = [MemoryLRUBackend(max_entries=app.config.get("LLM_CACHE_MAX_ENTRIES", 1024),
+                                     ttl_seconds=app.config.get("LLM_CACHE_TTL_SECONDS"))]
+        sqlite_path = app.config.get("LLM_CACHE_SQLITE_PATH")
+        if sqlite_path:
+            backends.append(SQLiteBackend(sqlite_path, ttl_seconds=app.config.get("LLM_CACHE_TTL_SECONDS")))
+        self.backends = backends
+        app.extensions["llm_cache"] = self
+
+    @staticmethod
+    def make_key(prompt_template: str, model: str, input_text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (prompt_template, model, input_text):
+            part_bytes = (part or "").encode("utf-8")
+            digest.update(len(part_bytes).to_bytes(8, "big")) # length prefix keeps ("ab","c") != ("a","bc")
+            digest.update(part_bytes)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        for i, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for faster_backend in self.backends[:i]:
+                    faster_backend.set(key, value)
+                self._count(hit=True)
+                return value
+        self._count(hit=False)
+        return None
+
+    def set(self, key: str, value):
+        if value is None or (isinstance(value, dict) and value.get("error")):
+            return
+        for backend in self.backends:
+            backend.set(key, value)
+
+    def get_or_compute(self, prompt_template: str, model: str, input_text: str, compute: Callable[[], dict]) -> dict:
+        """Returns the cached result for the inputs, or calls `compute()` and caches what it returns."""
+        key = self.make_key(prompt_template, model, input_text)
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        for backend in self.backends:
+            backend.clear()
+
+    def _count(self, hit: bool):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "backends": [{"name": backend.name, "entries": len(backend)} for backend in self.backends],
+        }
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,375 @@
+# learn_tube_ai/app/services/llm_providers.py
+# LLM provider interface: the real Anthropic client and the offline mock behind one API,
+# with a shared admission gate (in-flight cap, queue timeout, tokens-per-minute budget).
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+from typing import Iterator, AsyncIterator, Optional, Union
+
+from app.observability import span
+from .rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class LLMOverloadedError(Exception):
+    """A call waited longer than the queue limit for a free slot / token budget and was shed."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class LLMResult:
+    text: str
+    input_tokens: int
+    output_tokens: int
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); only used for budgeting before the real count is known."""
+    return max(1, len(text) // 4)
+
+
+def _system_text(system) -> str:
+    """`system` is a string or a list of text blocks (the form that can carry cache_control)."""
+    if isinstance(system, list):
+        return "\n".join(block.get("text", "") for block in system)
+    return system or ""
+
+
+def _prompt_text(messages: list, system) -> str:
+    parts = [_system_text(system)]
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content or [] if block.get("type") == "text")
+    return "\n".join(parts)
+
+
+class LLMGate:
+    """
+    Admission control shared by every LLM call in the process (sync and async):
+      - at most `max_in_flight` calls run at once,
+      - a call waits at most `max_queue_wait` seconds for a slot and for token budget, then is shed
+        with LLMOverloadedError instead of piling up behind a slow provider,
+      - with `tokens_per_minute` set, each call reserves (estimated input + max output) tokens from a
+        token bucket; the unused part is returned when the call reports its real usage.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue_wait: float = 30.0, tokens_per_minute: Optional[int] = None):
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.budget = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute) if tokens_per_minute else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+        self.completed = 0
+        self._condition = threading.Condition()
+
+    def _try_enter(self, tokens: float) -> Optional[float]:
+        """Takes a slot (and budget) and returns None, or returns how long to wait before retrying."""
+        with self._condition:
+            if self.in_flight >= self.max_in_flight:
+                return 0.05
+            if self.budget:
+                tokens = min(tokens, self.budget.capacity)
+                if not self.budget.try_acquire(tokens):
+                    return max(0.01, self.budget.wait_time(tokens))
+            self.in_flight += 1
+            return None
+
+    def _leave(self, reserved: float, used: Optional[float]):
+        with self._condition:
+            self.in_flight -= 1
+            self.completed += 1
+            if self.budget and used is not None:
+                self.budget.adjust(min(reserved, self.budget.capacity) - used)
+            self._condition.notify()
+
+    def _shed(self, waited: float):
+        with self._condition:
+            self.shed += 1
+        logger.warning("Shedding LLM call after waiting %.1fs (in flight: %s/%s).", waited, self.in_flight, self.max_in_flight)
+        raise LLMOverloadedError(f"LLM capacity exhausted; waited {waited:.1f}s for a slot.", retry_after=max(1.0, self.max_queue_wait / 2))
+
+    @contextmanager
+    def slot(self, reserved_tokens: float):
+        """Blocks until the call may run. Yields a dict; set 'used_tokens' in it to settle the token budget."""
+        started = time.monotonic()
+        with self._condition:
+            self.waiting += 1
+        try:
+            while True:
+                retry_in = self._try_enter(reserved_tokens)
+                if retry_in is None:
+                    break
+                remaining = self.max_queue_wait - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._shed(time.monotonic() - started)
+                with self._condition:
+                    self._condition.wait(min(retry_in, remaining))
+        finally:
+            with self._condition:
+                self.waiting -= 1
+        usage = {"used_tokens": None}
+        try:
+            yield usage
+        finally:
+            self._leave(reserved_tokens, usage["used_tokens"])
+
+    @asynccontextmanager
+    async def slot_async(self, reserved_tokens: float):
+        """Async variant of slot(); waits with asyncio.sleep so the event loop keeps running."""
+        started = time.monotonic()
+        with self._condition:
+            self.waiting += 1
+        try:
+            while True:
+                retry_in = self._try_enter(reserved_tokens)
+                if retry_in is None:
+                    break
+                remaining = self.max_queue_wait - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._shed(time.monotonic() - started)
+                await asyncio.sleep(min(retry_in, remaining))
+        finally:
+            with self._condition:
+                self.waiting -= 1
+        usage = {"used_tokens": None}
+        try:
+            yield usage
+        finally:
+            self._leave(reserved_tokens, usage["used_tokens"])
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "shed": self.shed,
+            "completed": self.completed,
+            "max_queue_wait_seconds": self.max_queue_wait,
+            "tokens_per_minute": self.budget.capacity if self.budget else None,
+        }
+
+
+class LLMProvider:
+    """
+    Base class for LLM backends. Subclasses implement the _complete/_stream methods (and their async
+    variants); the public methods run them through the shared LLMGate, so every backend honours the same limits.
+    `complete` returns an LLMResult; `stream` yields text deltas. `system` may be a list of text blocks
+    (e.g. with cache_control, so a stable prompt prefix can be cached by the provider).
+    """
+
+    name = "base"
+
+    def __init__(self, gate: LLMGate):
+        self.gate = gate
+
+    @staticmethod
+    def _reservation(max_tokens: int, messages: list, system: Optional[Union[str, list]]) -> int:
+        return estimate_tokens(_prompt_text(messages, system)) + max_tokens
+
+    def complete(self, model: str, max_tokens: int, messages: list, system: Optional[Union[str, list]] = None) -> LLMResult:
+        with self.gate.slot(self._reservation(max_tokens, messages, system)) as usage, span("llm_call", provider=self.name, model=model):
+            result = self._complete(model, max_tokens, messages, system)
+            usage["used_tokens"] = result.input_tokens + result.output_tokens
+            return result
+
+    def stream(self, model: str, max_tokens: int, messages: list, system: Optional[Union[str, list]] = None) -> Iterator[str]:
+        with self.gate.slot(self._reservation(max_tokens, messages, system)) as usage, span("llm_stream", provider=self.name, model=model):
+            streamed = []
+            for delta in self._stream(model, max_tokens, messages, system, usage):
+                streamed.append(delta)
+                yield delta
+            if usage["used_tokens"] is None:
+                usage["used_tokens"] = estimate_tokens(_prompt_text(messages, system)) + estimate_tokens("".join(streamed))
+
+    async def complete_async(self, model: str, max_tokens: int, messages: list, system: Optional[Union[str, list]] = None) -> LLMResult:
+        async with self.gate.slot_async(self._reservation(max_tokens, messages, system)) as usage:
+            with span("llm_call", provider=self.name, model=model):
+                result = await self._complete_async(model, max_tokens, messages, system)
+            usage["used_tokens"] = result.input_tokens + result.output_tokens
+            return result
+
+    async def stream_async(self, model: str, max_tokens: int, messages: list, system: Optional[Union[str, list]] = None) -> AsyncIterator[str]:
+        async with self.gate.slot_async(self._reservation(max_tokens, messages, system)) as usage:
+            streamed = []
+            with span("llm_stream", provider=self.name, model=model):
+                async for delta in self._stream_async(model, max_tokens, messages, system, usage):
+                    streamed.append(delta)
+                    yield delta
+            if usage["used_tokens"] is None:
+                usage["used_tokens"] = estimate_tokens(_prompt_text(messages, system)) + estimate_tokens("".join(streamed))
+
+    def _complete(self, model, max_tokens, messages, system) -> LLMResult:
+        raise NotImplementedError
+
+    def _stream(self, model, max_tokens, messages, system, usage) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def _complete_async(self, model, max_tokens, messages, system) -> LLMResult:
+        raise NotImplementedError
+
+    async def _stream_async(self, model, max_tokens, messages, system, usage) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield # pragma: no cover (makes this an async generator)
+
+
+class AnthropicProvider(LLMProvider):
+    """
+    The real Anthropic Messages API. One SDK client per process is reused for every call, so its
+    HTTP connection pool keeps connections alive between requests. Needs `pip install anthropic`.
+    """
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str, gate: LLMGate, timeout: float = 60.0, max_retries: int = 2):
+        super().__init__(gate)
+        import anthropic # optional dependency, only needed when the real provider is selected
+        self._anthropic = anthropic
+        self._api_key = api_key
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._client = anthropic.Anthropic(api_key=api_key, timeout=timeout, max_retries=max_retries)
+        self._async_clients = {} # event loop -> AsyncAnthropic (async connection pools can't be shared across loops)
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._anthropic.AsyncAnthropic(api_key=self._api_key, timeout=self._timeout, max_retries=self._max_retries)
+            self._async_clients = {loop: client} # the server runs one loop; drop clients of finished loops
+        return client
+
+    @staticmethod
+    def _request(model, max_tokens, messages, system) -> dict:
+        request = {"model": model, "max_tokens": max_tokens, "messages": messages}
+        if system:
+            request["system"] = system
+        return request
+
+    @staticmethod
+    def _result(message) -> LLMResult:
+        text = "".join(block.text for block in message.content if getattr(block, "type", None) == "text")
+        return LLMResult(text=text, input_tokens=message.usage.input_tokens, output_tokens=message.usage.output_tokens)
+
+    def _complete(self, model, max_tokens, messages, system) -> LLMResult:
+        return self._result(self._client.messages.create(**self._request(model, max_tokens, messages, system)))
+
+    def _stream(self, model, max_tokens, messages, system, usage) -> Iterator[str]:
+        with self._client.messages.stream(**self._request(model, max_tokens, messages, system)) as stream:
+            yield from stream.text_stream
+            final = stream.get_final_message()
+        usage["used_tokens"] = final.usage.input_tokens + final.usage.output_tokens
+
+    async def _complete_async(self, model, max_tokens, messages, system) -> LLMResult:
+        return self._result(await self._async_client().messages.create(**self._request(model, max_tokens, messages, system)))
+
+    async def _stream_async(self, model, max_tokens, messages, system, usage) -> AsyncIterator[str]:
+        async with self._async_client().messages.stream(**self._request(model, max_tokens, messages, system)) as stream:
+            async for delta in stream.text_stream:
+                yield delta
+            final = await stream.get_final_message()
+        usage["used_tokens"] = final.usage.input_tokens + final.usage.output_tokens
+
+
+class MockLLMError(RuntimeError):
+    """Simulated upstream failure of MockAnthropicClient (see its error_rate)."""
+
+
+class MockAnthropicClient(LLMProvider):
+    """
+    Offline drop-in for AnthropicProvider with simulated latency. Prompts that ask for the JSON analysis
+    get a JSON analysis back (streamed in small pieces, like real tokens); anything else gets plain text.
+    A call takes `latency` plus up to `jitter` seconds (streams: a fifth of that to the first token), and
+    fails with MockLLMError at `error_rate`, so benchmarks can model a slow or flaky provider.
+    """
+
+    name = "mock"
+
+    def __init__(self, gate: LLMGate, api_key=None, latency: float = 0.5, jitter: float = 0.5, error_rate: float = 0.0):
+        super().__init__(gate)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        if api_key: logger.info("MockAnthropicClient initialized WITH API key: %s... (but will use placeholder data).", api_key[:5])
+        else: logger.info("MockAnthropicClient initialized WITHOUT API key (will use placeholder data).")
+        self.api_key = api_key
+
+    def _mock_text(self, messages, system) -> str:
+        user_prompt_summary = "Generic user prompt"
+        if messages and messages[-1].get("role") == "user":
+            content = messages[-1].get("content")
+            if isinstance(content, list): user_prompt_summary = " ".join([block.get("text", "") for block in content if block.get("type") == "text"])
+            elif isinstance(content, str): user_prompt_summary = content
+        if "table_of_contents" not in _system_text(system):
+            return f"This is a MOCK LLM answer to: '{user_prompt_summary[:70]}...'. A real model would respond based on the full prompt."
+        mock_response_text = f"This is a structured MOCK LLM response for general analysis based on the prompt: '{user_prompt_summary[:70]}...'. "
+        return json.dumps({ "table_of_contents": [{"title": "Mock ToC - Intro", "timestamp_seconds": 10}, {"title": "Mock ToC - Main", "timestamp_seconds": 60}], "key_terms": [{"term": "Mock Data", "definition": "Placeholder info. " + mock_response_text}, {"term": "Simulation", "definition": "Mimicking behavior. " + mock_response_text}], "logical_flow": "Mock flow: 1. A, 2. B, 3. C. " + mock_response_text, "summary": "This is a mock summary. " + mock_response_text })
+
+    def _delay(self, share: float = 1.0) -> float:
+        if self.error_rate and random.random() < self.error_rate:
+            raise MockLLMError("Simulated LLM failure (mock error_rate).")
+        return share * (self.latency + random.random() * self.jitter)
+
+    def _result(self, text, messages, system) -> LLMResult:
+        return LLMResult(text=text, input_tokens=estimate_tokens(_prompt_text(messages, system)), output_tokens=estimate_tokens(text))
+
+    @staticmethod
+    def _pieces(text: str):
+        return [text[i:i + 12] for i in range(0, len(text), 12)]
+
+    def _complete(self, model, max_tokens, messages, system) -> LLMResult:
+        logger.debug("MockAnthropicClient: messages.create called. Model: %s, Max Tokens: %s", model, max_tokens)
+        time.sleep(self._delay())
+        return self._result(self._mock_text(messages, system), messages, system)
+
+    def _stream(self, model, max_tokens, messages, system, usage) -> Iterator[str]:
+        logger.debug("MockAnthropicClient: messages.stream called. Model: %s, Max Tokens: %s", model, max_tokens)
+        text = self._mock_text(messages, system)
+        time.sleep(self._delay(0.2)) # time to first token
+        for piece in self._pieces(text):
+            time.sleep(0.01)
+            yield piece
+
+    async def _complete_async(self, model, max_tokens, messages, system) -> LLMResult:
+        logger.debug("MockAnthropicClient: async messages.create called. Model: %s, Max Tokens: %s", model, max_tokens)
+        await asyncio.sleep(self._delay())
+        return self._result(self._mock_text(messages, system), messages, system)
+
+    async def _stream_async(self, model, max_tokens, messages, system, usage) -> AsyncIterator[str]:
+        logger.debug("MockAnthropicClient: async messages.stream called. Model: %s, Max Tokens: %s", model, max_tokens)
+        text = self._mock_text(messages, system)
+        await asyncio.sleep(self._delay(0.2))
+        for piece in self._pieces(text):
+            await asyncio.sleep(0.01)
+            yield piece
+
+
+def create_llm_provider(provider: str, api_key: Optional[str], gate: LLMGate, timeout: float = 60.0,
+                        mock_profile: Optional[dict] = None) -> LLMProvider:
+    """
+    'anthropic' -> AnthropicProvider, 'mock' -> MockAnthropicClient, 'auto' -> the real client when an
+    API key is set and the SDK is installed, otherwise the mock. `mock_profile` holds MockAnthropicClient's
+    latency / jitter / error_rate keyword arguments.
+    """
+    if provider in ("anthropic", "auto") and api_key:
+        try:
+            return AnthropicProvider(api_key, gate, timeout=timeout)
+        except ImportError:
+            if provider == "anthropic":
+                raise
+            logger.warning("ANTHROPIC_API_KEY found but the anthropic package is not installed. Using MOCK LLM client.")
+    elif provider == "anthropic":
+        raise ValueError("LLM_PROVIDER=anthropic requires ANTHROPIC_API_KEY.")
+    return MockAnthropicClient(gate, api_key=api_key, **(mock_profile or {}))
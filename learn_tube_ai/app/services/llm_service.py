@@ -1,130 +1,653 @@
 # learn_tube_ai/app/services/llm_service.py
-import os
-import time 
-import random 
-from typing import Optional # <<< ADD THIS IMPORT (or add Optional to existing typing import)
-# import anthropic 
-# import json 
-
-# --- MockAnthropicClient class definition (remains the same as before) ---
-class MockAnthropicClient:
-    # ... (your existing MockAnthropicClient code)
-    def __init__(self, api_key=None):
-        if api_key: print(f"MockAnthropicClient initialized WITH API key: {api_key[:5]}... (but will use placeholder data).")
-        else: print("MockAnthropicClient initialized WITHOUT API key (will use placeholder data).")
-        self.api_key = api_key
-    def messagescreate(self, model, max_tokens, messages, system=None):
-        print(f"MockAnthropicClient: messages.create called. Model: {model}, Max Tokens: {max_tokens}")
-        time.sleep(0.5 + random.random() * 0.5)
-        user_prompt_summary = "Generic user prompt"
-        if messages and messages[0].get("role") == "user":
-            content = messages[0].get("content")
-            if isinstance(content, list): user_prompt_summary = " ".join([block.get("text", "") for block in content if block.get("type") == "text"])
-            elif isinstance(content, str): user_prompt_summary = content
-        mock_response_text = f"This is a structured MOCK LLM response for general analysis based on the prompt: '{user_prompt_summary[:70]}...'. "
-        return { "table_of_contents": [{"title": "Mock ToC - Intro", "timestamp_seconds": 10}, {"title": "Mock ToC - Main", "timestamp_seconds": 60}], "key_terms": [{"term": "Mock Data", "definition": "Placeholder info. " + mock_response_text}, {"term": "Simulation", "definition": "Mimicking behavior. " + mock_response_text}], "logical_flow": "Mock flow: 1. A, 2. B, 3. C. " + mock_response_text, "summary": "This is a mock summary. " + mock_response_text }
-
-# --- Global LLM_CLIENT initialization (remains the same) ---
-LLM_CLIENT = None
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-if not ANTHROPIC_API_KEY: # ... (rest of LLM_CLIENT init)
-    print("LLM_SERVICE: ANTHROPIC_API_KEY not found. Using MOCK LLM client.")
-    LLM_CLIENT = MockAnthropicClient()
-else:
-    try:
-        print(f"LLM_SERVICE: ANTHROPIC_API_KEY found. Real client would be initialized (currently using mock).")
-        LLM_CLIENT = MockAnthropicClient(api_key=ANTHROPIC_API_KEY) 
-    except Exception as e:
-        print(f"LLM_SERVICE: Error initializing real Anthropic client: {e}. Falling back to MOCK LLM client.")
-        LLM_CLIENT = MockAnthropicClient()
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from typing import Optional, List, Iterator, AsyncIterator # <<< ADD THIS IMPORT (or add Optional to existing typing import)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .llm_cache import llm_cache
+from .llm_providers import LLMGate, LLMOverloadedError, LLMProvider, create_llm_provider
+
+logger = logging.getLogger(__name__)
 
-def generate_analysis_from_text(transcript_text: str) -> dict:
+DEFAULT_LLM_MODEL = "claude-3-haiku-20240307"
+
+
+class LLMClient:
+    """
+    The process's LLM provider and the admission gate every call goes through, configured from app.config
+    by init_app (see create_app; LLM_PROVIDER 'auto' uses the real Anthropic client if ANTHROPIC_API_KEY is
+    set and the SDK is installed, otherwise the mock). The provider is built on first use, so importing
+    this module is cheap and the Anthropic SDK is only loaded by processes that actually call the LLM.
+    Also holds the chunking settings for long transcripts: transcripts longer than chunk_max_chars are
+    split into chunks that are analyzed in parallel and merged back together (map-reduce), so latency
+    follows the slowest chunk, not the total length.
     """
-    Generates video analysis (ToC, key terms, logical flow, summary) from transcript text.
-    Uses the globally initialized LLM_CLIENT (mock or real).
-    """
-    if not LLM_CLIENT:
-        print("LLM_SERVICE: LLM Client not initialized. Cannot generate analysis.")
-        return {
-            "table_of_contents": [], "key_terms": [], 
-            "logical_flow": "LLM client not available for analysis.", 
-            "summary": "Summary generation skipped as LLM client is not available."
-        }
 
-    # This system prompt can be refined to better instruct the LLM
-    system_prompt = """You are a helpful assistant. Analyze the provided video transcript and generate the following:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.configure()
+
+    def configure(self, provider: str = "auto", api_key: Optional[str] = None, model: str = DEFAULT_LLM_MODEL,
+                  timeout: float = 60.0, max_in_flight: int = 8, max_queue_wait: float = 30.0,
+                  tokens_per_minute: Optional[int] = None, mock_profile: Optional[dict] = None,
+                  chunk_max_chars: int = 12000, chunk_max_seconds: float = 600.0, chunk_concurrency: int = 4):
+        self.provider_name = provider
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.mock_profile = mock_profile # simulated latency / failures of the mock (benchmarks)
+        self.gate = LLMGate(max_in_flight=max_in_flight, max_queue_wait=max_queue_wait, tokens_per_minute=tokens_per_minute)
+        self.chunk_max_chars = chunk_max_chars
+        self.chunk_max_seconds = chunk_max_seconds
+        self.chunk_concurrency = chunk_concurrency
+        with self._lock:
+            self._provider = None
+
+    def init_app(self, app):
+        self.configure(
+            provider=app.config.get("LLM_PROVIDER", "auto"),
+            api_key=app.config.get("ANTHROPIC_API_KEY"),
+            model=app.config.get("LLM_MODEL", DEFAULT_LLM_MODEL),
+            timeout=app.config.get("LLM_TIMEOUT", 60.0),
+            max_in_flight=app.config.get("LLM_MAX_IN_FLIGHT", 8),
+            max_queue_wait=app.config.get("LLM_QUEUE_MAX_WAIT", 30.0),
+            tokens_per_minute=app.config.get("LLM_TOKENS_PER_MINUTE") or None, # 0 = no token budget
+            mock_profile={
+                "latency": app.config.get("LLM_MOCK_LATENCY", 0.5),
+                "jitter": app.config.get("LLM_MOCK_JITTER", 0.5),
+                "error_rate": app.config.get("LLM_MOCK_ERROR_RATE", 0.0),
+            },
+            chunk_max_chars=app.config.get("LLM_CHUNK_MAX_CHARS", 12000),
+            chunk_max_seconds=app.config.get("LLM_CHUNK_MAX_SECONDS", 600.0),
+            chunk_concurrency=app.config.get("LLM_CHUNK_CONCURRENCY", 4),
+        )
+        app.extensions["llm_client"] = self
+
+    @property
+    def provider(self) -> LLMProvider:
+        provider = self._provider
+        if provider is None:
+            with self._lock:
+                if self._provider is None:
+                    if not self.api_key:
+                        logger.info("ANTHROPIC_API_KEY not found. Using MOCK LLM client.")
+                    self._provider = create_llm_provider(self.provider_name, self.api_key, self.gate,
+                                                         timeout=self.timeout, mock_profile=self.mock_profile)
+                    logger.info("Using '%s' LLM provider.", self._provider.name)
+                provider = self._provider
+        return provider
+
+    @property
+    def analysis_enabled(self) -> bool:
+        """False when there is no API key and the mock wasn't asked for explicitly; analyses are then skipped."""
+        return bool(self.api_key) or self.provider_name == "mock"
+
+
+llm_client = LLMClient()
+
+ANALYSIS_SYSTEM_PROMPT = """You are a helpful assistant. Analyze the provided video transcript and generate the following:
     1.  A table of contents (list of objects, each with "title" and approximate "timestamp_seconds" if inferable, otherwise just titles).
     2.  A list of key terms (list of objects, each with "term" and "definition" relevant to the transcript).
     3.  A description of the logical flow or structure of the content (string).
     4.  A concise summary of the video (string).
     Return your response as a single JSON object with keys: "table_of_contents", "key_terms", "logical_flow", and "summary"."""
 
+
+ANALYSIS_FIELDS = ("table_of_contents", "key_terms", "logical_flow", "summary")
+
+
+def parse_analysis_json(text: str) -> dict:
+    """Parses the model's JSON answer, tolerating surrounding prose or ```json fences."""
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        if start == -1 or end < start:
+            raise ValueError("no JSON object found")
+        return json.loads(text[start:end + 1])
+    except ValueError as e:
+        logger.warning("Failed to parse JSON from LLM response text: %s", e)
+        raise ValueError("LLM response was not valid JSON.") from e
+
+
+class AnalysisStreamParser:
+    """
+    Incremental parser for the analysis JSON as the model writes it. feed() returns the events the
+    stream endpoints send: {'type': 'item', 'field', 'item'} for each completed table_of_contents /
+    key_terms entry and {'type': 'text_delta', 'field', 'text'} for each new piece of logical_flow / summary.
+    """
+
+    LIST_FIELDS = ("table_of_contents", "key_terms")
+    TEXT_FIELDS = ("logical_flow", "summary")
+
+    def __init__(self):
+        self.text = ""
+        self.analysis = {"table_of_contents": [], "key_terms": [], "logical_flow": "", "summary": ""}
+        self._pos = 0
+        self._state = "start"
+        self._field = None
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        events = []
+        while self._step(events):
+            pass
+        return events
+
+    def finish(self) -> dict:
+        """
+        The complete analysis; the full text is authoritative when it parses. An answer that was cut off
+        gives the fields parsed so far with an 'error' key, so it is neither cached nor persisted.
+        """
+        try:
+            return parse_analysis_json(self.text)
+        except ValueError:
+            if self._state == "start":
+                raise
+            return {**self.analysis, "error": "LLM response was cut off; the analysis is incomplete."}
+
+    def _skip(self, chars: str = " \t\r\n"):
+        while self._pos < len(self.text) and self.text[self._pos] in chars:
+            self._pos += 1
+        return self._pos < len(self.text)
+
+    def _decode_complete(self):
+        """Decodes the JSON value at _pos if it is complete (something follows it), else returns None."""
+        try:
+            value, end = self._decoder.raw_decode(self.text, self._pos)
+        except ValueError:
+            return None
+        if end >= len(self.text): # a number could still grow; wait for the delimiter
+            return None
+        self._pos = end
+        return (value,)
+
+    def _step(self, events: list) -> bool:
+        if self._state == "start":
+            brace = self.text.find("{", self._pos)
+            if brace == -1:
+                self._pos = len(self.text)
+                return False
+            self._pos, self._state = brace + 1, "key"
+            return True
+        if self._state == "key":
+            if not self._skip(" \t\r\n,"):
+                return False
+            if self.text[self._pos] == "}":
+                self._state = "end"
+                return False
+            decoded = self._decode_complete()
+            if decoded is None:
+                return False
+            self._field, self._state = decoded[0], "colon"
+            return True
+        if self._state == "colon":
+            if not self._skip():
+                return False
+            self._pos += 1 # ':'
+            self._state = "value"
+            return True
+        if self._state == "value":
+            if not self._skip():
+                return False
+            char = self.text[self._pos]
+            if char == "[" and self._field in self.LIST_FIELDS:
+                self._pos, self._state = self._pos + 1, "array"
+            elif char == '"' and self._field in self.TEXT_FIELDS:
+                self._pos, self._state = self._pos + 1, "string"
+            else:
+                decoded = self._decode_complete()
+                if decoded is None:
+                    return False
+                if self._field in self.analysis:
+                    self.analysis[self._field] = decoded[0]
+                self._state = "key"
+            return True
+        if self._state == "array":
+            if not self._skip(" \t\r\n,"):
+                return False
+            if self.text[self._pos] == "]":
+                self._pos, self._state = self._pos + 1, "key"
+                return True
+            decoded = self._decode_complete()
+            if decoded is None:
+                return False
+            self.analysis[self._field].append(decoded[0])
+            events.append({"type": "item", "field": self._field, "item": decoded[0]})
+            return True
+        if self._state == "string":
+            return self._step_string(events)
+        return False
+
+    def _step_string(self, events: list) -> bool:
+        """Emits the decoded part of a JSON string value that has arrived so far."""
+        i, closed = self._pos, False
+        while i < len(self.text):
+            char = self.text[i]
+            if char == '"':
+                closed = True
+                break
+            if char == "\\":
+                escape_len = 6 if self.text[i + 1:i + 2] == "u" else 2
+                if i + escape_len > len(self.text):
+                    break # wait for the rest of the escape sequence
+                i += escape_len
+                continue
+            i += 1
+        if i > self._pos:
+            piece = json.loads('"' + self.text[self._pos:i] + '"')
+            self.analysis[self._field] += piece
+            events.append({"type": "text_delta", "field": self._field, "text": piece})
+        self._pos = i
+        if closed:
+            self._pos, self._state = i + 1, "key"
+            return True
+        return False
+
+
+def _analysis_messages(transcript_text: str, transcript_intro: str) -> list:
     # Using the newer message format if your client expects it
-    messages_payload = [
+    return [
         {
             "role": "user",
             "content": [ # Claude 3 often prefers content as a list of blocks
                 {
                     "type": "text",
-                    "text": f"Here is the transcript:\n\n{transcript_text}"
+                    "text": f"{transcript_intro}\n\n{transcript_text}"
                 }
             ]
         }
     ]
+
+
+def _failed_analysis(error) -> dict:
+    return {
+        "table_of_contents": [], "key_terms": [], 
+        "logical_flow": f"LLM call failed: {error}", 
+        "summary": f"Summary generation failed: {error}",
+        "error": str(error) # kept by merge_chunk_analyses/_normalize_analysis; callers don't persist analyses that carry it
+    }
+
+
+def generate_analysis_from_text(transcript_text: str, transcript_intro: str = "Here is the transcript:") -> dict:
+    """
+    Generates video analysis (ToC, key terms, logical flow, summary) from transcript text.
+    Uses llm_client's provider (mock or real).
+    Raises LLMOverloadedError when the call is shed by the LLM gate; other failures return an error analysis.
+    """
+    # This system prompt can be refined to better instruct the LLM
+    system_prompt = ANALYSIS_SYSTEM_PROMPT
+
+    messages_payload = _analysis_messages(transcript_text, transcript_intro)
     
-    print("LLM_SERVICE: Sending request to LLM client...")
-    try:
-        # Ensure the method name matches your client (mock or real)
-        # For Anthropic SDK, it's often client.messages.create
-        # Our mock uses client.messagescreate directly
-        response = LLM_CLIENT.messagescreate( 
-            model="claude-3-haiku-20240307", # Or your preferred model like opus or sonnet
+    def call_llm():
+        logger.debug("Sending request to LLM client...")
+        result = llm_client.provider.complete(
+            model=llm_client.model, # Or your preferred model like opus or sonnet
             max_tokens=3000, # Increased token limit for potentially long analysis
-            # system=system_prompt, # Pass system prompt if your client/model supports it this way
+            system=system_prompt,
             messages=messages_payload
         )
-        
-        # If the mock client directly returns the dict:
-        analysis_data = response 
-        
-        # If using the real Anthropic SDK, you might need to parse response.content
-        # For example:
-        # if response.content and isinstance(response.content, list) and response.content[0].type == "text":
-        #   try:
-        #     analysis_data = json.loads(response.content[0].text)
-        #   except json.JSONDecodeError:
-        #     print("LLM_SERVICE: Failed to parse JSON from LLM response text.")
-        #     # Fallback or re-raise error
-        #     raise ValueError("LLM response was not valid JSON.")
-        # else:
-        #   print("LLM_SERVICE: Unexpected LLM response format.")
-        #   raise ValueError("LLM response format not recognized.")
-
-        return analysis_data
+        return parse_analysis_json(result.text)
+
+    try:
+        # Identical (prompt, model, text) triples are served from the cache; failures raise and are never cached.
+        return llm_cache.get_or_compute(f"{system_prompt}\n{transcript_intro}", llm_client.model, transcript_text, call_llm)
+    except LLMOverloadedError:
+        raise
     except Exception as e:
-        print(f"LLM_SERVICE: Error calling LLM: {e}")
+        logger.warning("Error calling LLM: %s", e)
         # import traceback # For debugging
         # print(traceback.format_exc())
-        return {
-            "table_of_contents": [], "key_terms": [], 
-            "logical_flow": f"LLM call failed: {e}", 
-            "summary": f"Summary generation failed: {e}"
-        }
+        return _failed_analysis(e)
     
-    # --- NEW FUNCTION FOR EXPLAINING SELECTED TEXT (MOCK) ---
-def explain_selected_text_mock(selected_text: str, video_id_context: Optional[str] = None) -> dict:
+def stream_analysis_from_text(transcript_text: str, transcript_intro: str = "Here is the transcript:") -> Iterator[dict]:
     """
-    Generates a MOCK explanation for a selected piece of text, optionally using video context.
+    Streaming variant of generate_analysis_from_text. Yields 'item' / 'text_delta' events as the model
+    writes its answer and finishes with {'type': 'analysis', 'analysis': {...}} holding the complete result.
+    Shares cache entries with generate_analysis_from_text: a cached result is yielded as the final event
+    right away, and a completed stream is cached for later calls.
     """
-    print(f"LLM_SERVICE (Mock): explain_selected_text_mock called with text: '{selected_text[:100]}...' and video_id: {video_id_context}")
-    
-    # Simulate some processing time
-    time.sleep(0.3 + random.random() * 0.4)
+    prompt_template = f"{ANALYSIS_SYSTEM_PROMPT}\n{transcript_intro}"
+    cache_key = llm_cache.make_key(prompt_template, llm_client.model, transcript_text)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        yield {"type": "analysis", "analysis": cached}
+        return
+
+    parser = AnalysisStreamParser()
+    try:
+        logger.debug("Streaming request to LLM client...")
+        for delta in llm_client.provider.stream(model=llm_client.model, max_tokens=3000, system=ANALYSIS_SYSTEM_PROMPT,
+                                       messages=_analysis_messages(transcript_text, transcript_intro)):
+            yield from parser.feed(delta)
+        analysis = parser.finish()
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning("Error streaming from LLM: %s", e)
+        yield {"type": "analysis", "analysis": _failed_analysis(e)}
+        return
+    llm_cache.set(cache_key, analysis)
+    yield {"type": "analysis", "analysis": analysis}
+
+async def generate_analysis_from_text_async(transcript_text: str, transcript_intro: str = "Here is the transcript:") -> dict:
+    """Async variant of generate_analysis_from_text. Shares cache entries and LLM gate limits with the sync path."""
+    prompt_template = f"{ANALYSIS_SYSTEM_PROMPT}\n{transcript_intro}"
+    cache_key = llm_cache.make_key(prompt_template, llm_client.model, transcript_text)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    try:
+        logger.debug("Sending async request to LLM client...")
+        result = await llm_client.provider.complete_async(model=llm_client.model, max_tokens=3000, system=ANALYSIS_SYSTEM_PROMPT,
+                                                 messages=_analysis_messages(transcript_text, transcript_intro))
+        analysis = parse_analysis_json(result.text)
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning("Error calling LLM: %s", e)
+        return _failed_analysis(e)
+    llm_cache.set(cache_key, analysis)
+    return analysis
+
+
+async def stream_analysis_from_text_async(transcript_text: str, transcript_intro: str = "Here is the transcript:") -> AsyncIterator[dict]:
+    """Async variant of stream_analysis_from_text (same events, same cache entries)."""
+    prompt_template = f"{ANALYSIS_SYSTEM_PROMPT}\n{transcript_intro}"
+    cache_key = llm_cache.make_key(prompt_template, llm_client.model, transcript_text)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        yield {"type": "analysis", "analysis": cached}
+        return
+
+    parser = AnalysisStreamParser()
+    try:
+        logger.debug("Streaming async request to LLM client...")
+        async for delta in llm_client.provider.stream_async(model=llm_client.model, max_tokens=3000, system=ANALYSIS_SYSTEM_PROMPT,
+                                                   messages=_analysis_messages(transcript_text, transcript_intro)):
+            for event in parser.feed(delta):
+                yield event
+        analysis = parser.finish()
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning("Error streaming from LLM: %s", e)
+        yield {"type": "analysis", "analysis": _failed_analysis(e)}
+        return
+    llm_cache.set(cache_key, analysis)
+    yield {"type": "analysis", "analysis": analysis}
 
-    explanation = f"This is a MOCK explanation for the selected text: \"{selected_text[:70]}...\". "
-    if video_id_context:
-        explanation += f"In the context of video ID '{video_id_context}', this segment likely refers to [mock contextual detail]. "
-    explanation += "A real AI would provide a more detailed and accurate breakdown based on semantic understanding and the broader transcript content."
+# --- CHUNKED (MAP-REDUCE) ANALYSIS FOR LONG TRANSCRIPTS ---
+def _format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
 
-    # The response structure should be simple, e.g., just the explanation text
-    return {"explanation": explanation}
\ No newline at end of file
+
+def chunk_transcript_segments(transcript_segments: List[dict], max_chars: int = None, max_seconds: float = None) -> List[dict]:
+    """
+    Splits transcript segments into chunks for parallel analysis.
+    Chunk boundaries fall on a fixed time grid of `max_seconds` (so an edit in one region does not shift
+    the boundaries of the others); a grid cell is split further if its text exceeds `max_chars`.
+    Returns a list of {'index', 'start', 'end', 'segments'} dicts.
+    """
+    max_chars = max_chars or llm_client.chunk_max_chars
+    max_seconds = max_seconds or llm_client.chunk_max_seconds
+    chunks = []
+    current_segments = []
+    current_chars = 0
+    current_cell = None
+
+    def close_chunk():
+        last = current_segments[-1]
+        chunks.append({
+            "index": len(chunks),
+            "start": float(current_segments[0].get("start") or 0.0),
+            "end": float(last.get("start") or 0.0) + float(last.get("duration") or 0.0),
+            "segments": current_segments,
+        })
+
+    for segment in transcript_segments:
+        start = float(segment.get("start") or 0.0)
+        text_len = len(segment.get("text") or "") + 1
+        cell = int(start // max_seconds)
+        if current_segments and (cell != current_cell or current_chars + text_len > max_chars):
+            close_chunk()
+            current_segments = []
+            current_chars = 0
+        current_segments.append(segment)
+        current_chars += text_len
+        current_cell = cell
+    if current_segments:
+        close_chunk()
+    return chunks
+
+
+def analyze_transcript_chunk(chunk: dict, total_chunks: int) -> dict:
+    """Runs the analysis prompt over one chunk."""
+    chunk_text, intro = _chunk_prompt(chunk, total_chunks)
+    return generate_analysis_from_text(chunk_text, transcript_intro=intro)
+
+
+def chunk_content_hash(chunk: dict) -> str:
+    """
+    SHA-256 of what a chunk's analysis depends on: model, analysis prompt and the timestamped chunk text.
+    Chunk boundaries sit on a fixed time grid, so editing one region leaves the other chunks' hashes unchanged.
+    """
+    chunk_text, _ = _chunk_prompt(chunk, 1)
+    return hashlib.sha256(f"{llm_client.model}\n{ANALYSIS_SYSTEM_PROMPT}\n{chunk_text}".encode("utf-8")).hexdigest()
+
+
+def analyze_chunks(chunks: List[dict], known: Optional[dict] = None) -> List[dict]:
+    """
+    Per-chunk analyses in chunk order. `known` maps chunk index -> an analysis that is already available
+    (e.g. stored from a previous run); only the remaining chunks are sent to the LLM, concurrently.
+    """
+    known = known or {}
+    partial_results = [known.get(chunk["index"]) for chunk in chunks]
+    pending = [chunk for chunk in chunks if partial_results[chunk["index"]] is None]
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(llm_client.chunk_concurrency, len(pending)), thread_name_prefix="llm-chunk") as executor:
+            for chunk, partial in zip(pending, executor.map(lambda chunk: analyze_transcript_chunk(chunk, len(chunks)), pending)):
+                partial_results[chunk["index"]] = partial
+    return partial_results
+
+
+def merge_chunk_analyses(chunks: List[dict], partial_results: List[dict]) -> dict:
+    """
+    Reduces per-chunk analyses into the single analysis shape returned by generate_analysis_from_text.
+    Failed chunks contribute nothing; if any chunk failed the result carries an 'error' key (and is the
+    plain failure analysis when all of them did), so it is not stored as a complete analysis.
+    """
+    table_of_contents = []
+    key_terms = []
+    seen_terms = set()
+    flow_parts = []
+    summary_parts = []
+    errors = []
+
+    for chunk, partial in zip(chunks, partial_results):
+        partial = partial or {}
+        if partial.get("error"):
+            errors.append(partial["error"])
+            continue
+        for entry in partial.get("table_of_contents") or []:
+            entry = dict(entry)
+            timestamp = entry.get("timestamp_seconds")
+            if isinstance(timestamp, (int, float)):
+                if timestamp < chunk["start"]: # LLM answered relative to the chunk
+                    timestamp += chunk["start"]
+                entry["timestamp_seconds"] = int(min(max(timestamp, chunk["start"]), chunk["end"]))
+            table_of_contents.append(entry)
+        for term in partial.get("key_terms") or []:
+            term_key = str(term.get("term", "")).strip().lower()
+            if term_key and term_key not in seen_terms:
+                seen_terms.add(term_key)
+                key_terms.append(term)
+        label = f"Part {chunk['index'] + 1} ({_format_timestamp(chunk['start'])}-{_format_timestamp(chunk['end'])})"
+        if partial.get("logical_flow"):
+            flow_parts.append(f"{label}: {partial['logical_flow']}")
+        if partial.get("summary"):
+            summary_parts.append(partial["summary"])
+
+    if errors and len(errors) == len(chunks):
+        return _failed_analysis(errors[0])
+    table_of_contents.sort(key=lambda entry: entry.get("timestamp_seconds") if isinstance(entry.get("timestamp_seconds"), (int, float)) else float("inf"))
+    merged = {
+        "table_of_contents": table_of_contents,
+        "key_terms": key_terms,
+        "logical_flow": "\n".join(flow_parts),
+        "summary": " ".join(summary_parts),
+    }
+    if errors:
+        merged["error"] = f"{len(errors)} of {len(chunks)} chunks failed: {errors[0]}"
+    return merged
+
+
+def generate_analysis_chunked(transcript_segments: List[dict]) -> dict:
+    """
+    Map-reduce analysis for long transcripts: chunks are analyzed concurrently
+    (at most LLM_CHUNK_CONCURRENCY in flight) and merged.
+    """
+    chunks = chunk_transcript_segments(transcript_segments)
+    if len(chunks) <= 1:
+        return generate_analysis_from_text(" ".join(seg.get("text", "") for seg in transcript_segments))
+
+    logger.info("Analyzing transcript in %s chunks (concurrency %s).", len(chunks), llm_client.chunk_concurrency)
+    return merge_chunk_analyses(chunks, analyze_chunks(chunks))
+
+
+def stream_analysis_chunked(transcript_segments: List[dict]) -> Iterator[dict]:
+    """
+    Streaming variant of generate_analysis_chunked: yields {'type': 'chunk', ...} with each chunk's
+    analysis as soon as it completes (in completion order), then the merged {'type': 'analysis'} event.
+    """
+    chunks = chunk_transcript_segments(transcript_segments)
+    if len(chunks) <= 1:
+        yield from stream_analysis_from_text(" ".join(seg.get("text", "") for seg in transcript_segments))
+        return
+
+    logger.info("Streaming analysis of %s chunks (concurrency %s).", len(chunks), llm_client.chunk_concurrency)
+    partial_results = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=min(llm_client.chunk_concurrency, len(chunks)), thread_name_prefix="llm-chunk") as executor:
+        futures = {executor.submit(analyze_transcript_chunk, chunk, len(chunks)): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            partial_results[chunk["index"]] = future.result()
+            yield {"type": "chunk", "index": chunk["index"], "count": len(chunks), "start": chunk["start"], "end": chunk["end"],
+                   "analysis": merge_chunk_analyses([chunk], [partial_results[chunk["index"]]])}
+    yield {"type": "analysis", "analysis": merge_chunk_analyses(chunks, partial_results)}
+
+
+
+def _chunk_prompt(chunk: dict, total_chunks: int) -> tuple:
+    """(chunk_text, intro) for one chunk. Each line carries its start time so ToC timestamps stay absolute."""
+    chunk_text = "\n".join(f"[{int(float(seg.get('start') or 0))}s] {seg.get('text', '')}" for seg in chunk["segments"])
+    intro = (f"Here is part {chunk['index'] + 1} of {total_chunks} of the transcript, covering "
+             f"{_format_timestamp(chunk['start'])}-{_format_timestamp(chunk['end'])}. "
+             "Each line starts with its timestamp in seconds:")
+    return chunk_text, intro
+
+
+async def generate_analysis_chunked_async(transcript_segments: List[dict]) -> dict:
+    """Async variant of generate_analysis_chunked: at most LLM_CHUNK_CONCURRENCY chunk calls in flight."""
+    chunks = chunk_transcript_segments(transcript_segments)
+    if len(chunks) <= 1:
+        return await generate_analysis_from_text_async(" ".join(seg.get("text", "") for seg in transcript_segments))
+
+    logger.info("Analyzing transcript in %s chunks asynchronously (concurrency %s).", len(chunks), llm_client.chunk_concurrency)
+    semaphore = asyncio.Semaphore(llm_client.chunk_concurrency)
+
+    async def analyze(chunk):
+        async with semaphore:
+            return await generate_analysis_from_text_async(*_chunk_prompt(chunk, len(chunks)))
+
+    partial_results = await asyncio.gather(*(analyze(chunk) for chunk in chunks))
+    return merge_chunk_analyses(chunks, list(partial_results))
+
+
+async def stream_analysis_chunked_async(transcript_segments: List[dict]) -> AsyncIterator[dict]:
+    """Async variant of stream_analysis_chunked."""
+    chunks = chunk_transcript_segments(transcript_segments)
+    if len(chunks) <= 1:
+        async for event in stream_analysis_from_text_async(" ".join(seg.get("text", "") for seg in transcript_segments)):
+            yield event
+        return
+
+    semaphore = asyncio.Semaphore(llm_client.chunk_concurrency)
+
+    async def analyze(chunk):
+        async with semaphore:
+            return chunk, await generate_analysis_from_text_async(*_chunk_prompt(chunk, len(chunks)))
+
+    partial_results = [None] * len(chunks)
+    for next_done in asyncio.as_completed([analyze(chunk) for chunk in chunks]):
+        chunk, partial = await next_done
+        partial_results[chunk["index"]] = partial
+        yield {"type": "chunk", "index": chunk["index"], "count": len(chunks), "start": chunk["start"], "end": chunk["end"],
+               "analysis": merge_chunk_analyses([chunk], [partial])}
+    yield {"type": "analysis", "analysis": merge_chunk_analyses(chunks, partial_results)}
+
+    # --- EXPLAINING SELECTED TEXT ---
+EXPLAIN_SYSTEM_PROMPT = """You explain passages from a video transcript to a learner in plain language.
+Use the video context below and the transcript excerpt around the passage to work out what it refers to.
+Answer with one or two short paragraphs."""
+
+
+def _explain_request(selected_text: str, prompt_prefix: Optional[str], context_text: Optional[str]) -> tuple:
+    """
+    (system, messages, cache_template) for an explain call. The system prompt holds only the stable
+    per-video prefix and is marked cacheable, so the provider can reuse it across explain calls for the
+    same video; the selection and its transcript excerpt go in the user message.
+    """
+    system_text = f"{EXPLAIN_SYSTEM_PROMPT}\n\n{prompt_prefix}" if prompt_prefix else EXPLAIN_SYSTEM_PROMPT
+    system = [{"type": "text", "text": system_text, "cache_control": {"type": "ephemeral"}}]
+    user_text = f'Explain the selected text: "{selected_text}"'
+    if context_text:
+        user_text += f"\n\nTranscript around the selection:\n{context_text}"
+    messages = [{"role": "user", "content": [{"type": "text", "text": user_text}]}]
+    return system, messages, f"{system_text}\n{context_text or ''}"
+
+
+def explain_selected_text(selected_text: str, prompt_prefix: Optional[str] = None, context_text: Optional[str] = None) -> dict:
+    """
+    Explains `selected_text` given an optional per-video prompt prefix and the transcript excerpt around it
+    (see explain_service.build_explain_context). Returns {'explanation': ...}, or {'error': ...} on failure.
+    Results are cached per (prefix, excerpt, selected text). Raises LLMOverloadedError when shed.
+    """
+    logger.debug("explain_selected_text called with text: '%s...' (context: %s chars)", selected_text[:100], len(context_text or ''))
+    system, messages, cache_template = _explain_request(selected_text, prompt_prefix, context_text)
+
+    def explain():
+        result = llm_client.provider.complete(model=llm_client.model, max_tokens=600, system=system, messages=messages)
+        return {"explanation": result.text}
+
+    try:
+        return llm_cache.get_or_compute(cache_template, llm_client.model, selected_text, explain)
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning("Error generating explanation: %s", e)
+        return {"error": str(e)}
+
+
+async def explain_selected_text_async(selected_text: str, prompt_prefix: Optional[str] = None, context_text: Optional[str] = None) -> dict:
+    """Async variant of explain_selected_text (same cache entries)."""
+    system, messages, cache_template = _explain_request(selected_text, prompt_prefix, context_text)
+    cache_key = llm_cache.make_key(cache_template, llm_client.model, selected_text)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    try:
+        result = await llm_client.provider.complete_async(model=llm_client.model, max_tokens=600, system=system, messages=messages)
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning("Error generating explanation: %s", e)
+        return {"error": str(e)}
+    explanation = {"explanation": result.text}
+    llm_cache.set(cache_key, explanation)
+    return explanation
@@ -0,0 +1,121 @@
+# learn_tube_ai/app/services/payload_cache.py
+# Pre-rendered responses for cached videos. When a video is written (video_store), the JSON bodies of
+# its hottest responses are serialized once - and gzip-compressed once - into video_payload rows. A
+# cache hit then reads those bytes with one indexed query and sends them as they are, instead of
+# loading the ORM object, decoding its JSON/transcript columns, rebuilding the dict and re-serializing it.
+# Videos written before this existed get their payloads rendered on their first cache hit.
+import gzip
+import logging
+from datetime import timezone
+from typing import Optional
+
+from flask import current_app, request
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import Video, VideoPayload
+from app.http_cache import add_cache_headers, is_not_modified, not_modified_response, video_etag
+
+logger = logging.getLogger(__name__)
+
+CACHED_MESSAGE = "Video data retrieved from cache."
+
+
+def _process_video_payload(video_obj: Video) -> dict:
+    from .video_store import build_video_response # video_store imports this module
+    return build_video_response(video_obj, CACHED_MESSAGE)
+
+
+# variant -> payload builder. 'process_video' is the full cache-hit response of /api/process_video,
+# 'detail:analysis' the default projection of /api/videos/<video_id>.
+VARIANTS = {
+    "process_video": _process_video_payload,
+    "detail:analysis": lambda video_obj: video_obj.to_dict(["analysis"]),
+}
+
+# variant -> the video_etag variant the regular route path uses for the same response, so a client
+# revalidates with the same ETag whichever path served it.
+ETAG_VARIANTS = {
+    "process_video": "process_video:all",
+    "detail:analysis": "detail:analysis:None:None",
+}
+
+
+def _enabled() -> bool:
+    return current_app.config.get("VIDEO_PAYLOAD_CACHE", True)
+
+
+def render_payload(video_obj: Video, variant: str) -> dict:
+    """Column values of the video_payload row for `variant` (without video_pk)."""
+    body = current_app.json.dumps(VARIANTS[variant](video_obj)).encode("utf-8") # same serializer (and key order) as jsonify
+    level = current_app.config.get("VIDEO_PAYLOAD_GZIP_LEVEL", 6)
+    return {
+        "variant": variant,
+        "body": body,
+        "body_gzip": gzip.compress(body, compresslevel=level) if level else None,
+        "etag": video_etag(video_obj, ETAG_VARIANTS[variant]),
+    }
+
+
+def store_payloads(video_obj: Video, variants=None):
+    """
+    Re-renders the payloads of a (flushed) video inside the current transaction; all VARIANTS by default.
+    A video without transcript is a cache miss for the routes, so it keeps no payloads.
+    """
+    if not _enabled():
+        return
+    variants = list(variants or VARIANTS)
+    db.session.execute(delete(VideoPayload).where(VideoPayload.video_pk == video_obj.id, VideoPayload.variant.in_(variants)))
+    if video_obj.transcript_text:
+        # Reload the timestamps just written: in memory they are tz-aware, read back they are naive UTC,
+        # and the payload has to match what the regular (uncached) path serializes.
+        db.session.refresh(video_obj, ["created_at", "updated_at"])
+        db.session.execute(insert(VideoPayload), [{**render_payload(video_obj, variant), "video_pk": video_obj.id} for variant in variants])
+
+
+def load_payload(video_id: str, variant: str, language: str):
+    """(body, body_gzip, etag, changed_at) of a stored payload of the (video_id, language) row, or None. One indexed query."""
+    if not _enabled():
+        return None
+    return db.session.execute(
+        select(VideoPayload.body, VideoPayload.body_gzip, VideoPayload.etag, func.coalesce(Video.updated_at, Video.created_at))
+        .join(Video, Video.id == VideoPayload.video_pk)
+        .where(Video.video_id == video_id, Video.language == language, VideoPayload.variant == variant)
+    ).first()
+
+
+def backfill_payload(video_obj: Video, variant: str):
+    """Stores the payload of a video that was written before payloads existed. Best effort: failures are only logged."""
+    if not _enabled():
+        return
+    try:
+        store_payloads(video_obj, [variant])
+        db.session.commit()
+    except SQLAlchemyError as e: # e.g. a concurrent request stored it first
+        db.session.rollback()
+        logger.debug("Could not store %s payload for %s: %s", variant, video_obj.video_id, e)
+
+
+def payload_response(payload, status: int = 200):
+    """Response for a stored payload: 304 when the client has it, else the stored gzip or identity bytes."""
+    body, body_gzip, etag, changed_at = payload
+    last_modified = changed_at.replace(tzinfo=timezone.utc) if changed_at else None # stored as naive UTC, like video_last_modified
+    if request.method == 'GET' and is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response = current_app.response_class(mimetype="application/json", status=status)
+    if body_gzip is not None and request.accept_encodings["gzip"]:
+        response.set_data(body_gzip)
+        response.headers["Content-Encoding"] = "gzip" # compress_response leaves encoded responses alone
+        response.vary.add("Accept-Encoding")
+        add_cache_headers(response, etag, last_modified)
+        response.set_etag(etag, weak=True) # the encoded bytes differ from the identity representation
+        return response
+    response.set_data(body)
+    return add_cache_headers(response, etag, last_modified)
+
+
+def cached_payload_response(video_id: str, variant: str, language: str) -> Optional[object]:
+    """payload_response for a stored payload, or None when there is none (the caller takes the regular path)."""
+    payload = load_payload(video_id, variant, language)
+    return payload_response(payload) if payload is not None else None
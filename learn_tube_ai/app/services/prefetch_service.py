@@ -0,0 +1,291 @@
+# learn_tube_ai/app/services/prefetch_service.py
+# Keeps the videos on the watchlist (table watchlist_entry, optionally synced from PREFETCH_WATCHLIST_FILE)
+# fetched and analyzed ahead of time, so students asking for an assigned video hit the cached path.
+# A background thread wakes up every PREFETCH_INTERVAL_SECONDS; inside the off-peak window
+# (PREFETCH_WINDOW, e.g. "01:00-06:00" local time) it picks the due entries - never processed, or
+# Video.updated_at older than PREFETCH_TTL_SECONDS - and runs them through ingest_videos with
+# PREFETCH_CONCURRENCY workers, so live requests keep most of the LLM gate. Failed entries back off
+# exponentially. The scheduler's state is exposed by GET /api/prefetch/status.
+import logging
+import threading
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Video, WatchlistEntry
+from .ingest_service import ingest_videos
+from .transcript_languages import transcript_languages
+from .video_processing_service import extract_video_id
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None) # the DateTime columns hold naive UTC
+
+
+def parse_window(window: Optional[str]) -> Optional[Tuple[dt_time, dt_time]]:
+    """'HH:MM-HH:MM' -> (start, end); None/empty means any time. Windows may wrap midnight ('22:00-06:00')."""
+    if not window:
+        return None
+    try:
+        start, end = (dt_time.fromisoformat(part.strip()) for part in window.split("-", 1))
+    except ValueError:
+        raise ValueError(f"Invalid PREFETCH_WINDOW '{window}', expected HH:MM-HH:MM.")
+    return start, end
+
+
+def in_window(window: Optional[Tuple[dt_time, dt_time]], now: Optional[datetime] = None) -> bool:
+    if window is None:
+        return True
+    current = (now or datetime.now()).time()
+    start, end = window
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def read_watchlist_file(path: str) -> List[str]:
+    """URLs from a watchlist file: one per line, blank lines and '#' comments ignored (same format as `flask ingest`)."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+
+def add_to_watchlist(video_urls: List[str], course: Optional[str] = None, priority: int = 0) -> dict:
+    """
+    Adds URLs to the watchlist (commits). Entries already on it keep their state but take the new
+    course/priority when given. Returns {'added': [...], 'updated': [...], 'invalid': [...]}.
+    """
+    result = {"added": [], "updated": [], "invalid": []}
+    by_id = {}
+    for video_url in video_urls:
+        video_id = extract_video_id(video_url or "")
+        if not video_id:
+            result["invalid"].append(video_url)
+        else:
+            by_id.setdefault(video_id, video_url)
+    existing = {entry.video_id: entry for entry in WatchlistEntry.query.filter(WatchlistEntry.video_id.in_(list(by_id)))} if by_id else {}
+    for video_id, video_url in by_id.items():
+        entry = existing.get(video_id)
+        if entry is None:
+            db.session.add(WatchlistEntry(video_id=video_id, video_url=video_url, course=course, priority=priority, failures=0))
+            result["added"].append(video_id)
+        else:
+            if course is not None:
+                entry.course = course
+            entry.priority = priority
+            result["updated"].append(video_id)
+    db.session.commit()
+    return result
+
+
+def remove_from_watchlist(video_id: str) -> bool:
+    deleted = WatchlistEntry.query.filter_by(video_id=video_id).delete()
+    db.session.commit()
+    return bool(deleted)
+
+
+class PrefetchScheduler:
+    """Background prefetcher for the watchlist. One per process; enable it in a single process (PREFETCH_ENABLED)."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._run_lock = threading.Lock() # one prefetch pass at a time (scheduler thread, `flask prefetch run`, the API)
+        self._state_lock = threading.Lock()
+        self._current = None # {'started_at', 'video_ids', 'progress'} while a pass runs
+        self._last_run = None
+        self._next_run_at = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get("PREFETCH_INTERVAL_SECONDS", 300)
+        self.ttl = timedelta(seconds=app.config.get("PREFETCH_TTL_SECONDS", 7 * 24 * 3600))
+        self.concurrency = app.config.get("PREFETCH_CONCURRENCY", 2)
+        self.batch_size = app.config.get("PREFETCH_BATCH_SIZE", 50) # videos per pass
+        self.rate_per_second = app.config.get("PREFETCH_RATE_PER_SECOND", 0.5)
+        self.window = parse_window(app.config.get("PREFETCH_WINDOW"))
+        self.window_text = app.config.get("PREFETCH_WINDOW") or None
+        self.watchlist_file = app.config.get("PREFETCH_WATCHLIST_FILE")
+        self.enabled = app.config.get("PREFETCH_ENABLED", False)
+        app.extensions["prefetch_scheduler"] = self
+        if self.enabled:
+            self.start()
+
+    # --- scheduling ---
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Prefetch scheduler started (every %ss, window %s, TTL %s, concurrency %s).",
+                    self.interval, self.window_text or "any time", self.ttl, self.concurrency)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def wake(self):
+        """Runs the next pass now instead of at the end of the current interval."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.run_once()
+            except Exception:
+                logger.exception("Prefetch pass crashed.")
+            self._next_run_at = _utcnow() + timedelta(seconds=self.interval)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    # --- one pass ---
+
+    def _scan(self, now: datetime) -> List[Tuple[WatchlistEntry, str]]:
+        """
+        (entry, state) for the whole watchlist, highest priority first. State is 'due' when the video isn't
+        stored (or has no transcript) in a language of the default chain, was last written more than the TTL ago
+        or its last attempt failed (e.g. the LLM analysis failed, see ingest_videos), 'backoff' when it is due but
+        its last attempt failed less than interval * 2^failures (capped at the TTL) ago, otherwise 'fresh'.
+        """
+        # One row per video_id over its stored language variants (prefetch fetches with the default chain).
+        stored = (db.session.query(Video.video_id,
+                                   func.max(func.coalesce(Video.updated_at, Video.created_at)).label("written_at"),
+                                   func.count(Video.transcript_text).label("has_transcript")) # non-NULL transcripts
+                  .filter(Video.language.in_(transcript_languages.chain()))
+                  .group_by(Video.video_id)
+                  .subquery())
+        rows = (db.session.query(WatchlistEntry, stored.c.written_at, stored.c.has_transcript)
+                .outerjoin(stored, stored.c.video_id == WatchlistEntry.video_id)
+                .order_by(WatchlistEntry.priority.desc(), WatchlistEntry.created_at, WatchlistEntry.id)
+                .all())
+        scanned = []
+        for entry, stored_at, has_transcript in rows:
+            # A refresh that produced the same transcript and analysis doesn't touch the row (no UPDATE, so
+            # updated_at stays), hence a successful prefetch also counts as "written".
+            written_at = max(filter(None, [stored_at, entry.last_prefetched_at if entry.last_status == "processed" else None]), default=None)
+            stale = written_at is None or now - written_at >= self.ttl
+            state = "due" if not has_transcript or stale or entry.last_status == "failed" else "fresh"
+            if state == "due" and entry.failures and entry.last_prefetched_at is not None:
+                backoff = min(timedelta(seconds=self.interval * 2 ** min(entry.failures, 16)), self.ttl)
+                if now < entry.last_prefetched_at + backoff:
+                    state = "backoff"
+            scanned.append((entry, state))
+        return scanned
+
+    def due_entries(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> List[WatchlistEntry]:
+        """Watchlist entries that need a (re-)fetch now, highest priority first (see _scan)."""
+        due = [entry for entry, state in self._scan(now or _utcnow()) if state == "due"]
+        return due[:limit] if limit is not None else due
+
+    def sync_watchlist_file(self):
+        if not self.watchlist_file:
+            return
+        try:
+            urls = read_watchlist_file(self.watchlist_file)
+        except OSError as e:
+            logger.warning("Cannot read PREFETCH_WATCHLIST_FILE %s: %s", self.watchlist_file, e)
+            return
+        known = {video_id for (video_id,) in db.session.query(WatchlistEntry.video_id)}
+        new_urls = [url for url in urls if extract_video_id(url) not in known]
+        if new_urls:
+            added = add_to_watchlist(new_urls)["added"]
+            logger.info("Added %s videos from %s to the watchlist.", len(added), self.watchlist_file)
+
+    def run_once(self, force: bool = False) -> dict:
+        """
+        One prefetch pass (needs an app context). Outside the off-peak window nothing is done unless `force`.
+        Videos whose LLM analysis was skipped or failed count as failed; their stored analysis is kept (see ingest_videos).
+        Returns {'skipped': reason} or {'started_at', 'finished_at', 'counts', 'video_ids'}.
+        """
+        if not force and not in_window(self.window):
+            return {"skipped": "outside prefetch window"}
+        if not self._run_lock.acquire(blocking=False):
+            return {"skipped": "a prefetch pass is already running"}
+        try:
+            self.sync_watchlist_file()
+            entries = self.due_entries(limit=self.batch_size)
+            if not entries:
+                return {"skipped": "nothing due"}
+            started_at = _utcnow()
+            video_ids = [entry.video_id for entry in entries]
+            with self._state_lock:
+                self._current = {"started_at": started_at.isoformat(), "video_ids": video_ids, "progress": "starting"}
+            logger.info("Prefetching %s watchlist videos.", len(entries))
+
+            results = ingest_videos([entry.video_url for entry in entries], parallelism=self.concurrency,
+                                    rate_per_second=self.rate_per_second or None, batch_size=self.concurrency * 4,
+                                    refresh=True, report_progress=self._report_progress)
+
+            by_id = {result["video_id"]: result for result in results if result["video_id"]}
+            finished_at = _utcnow()
+            counts = {}
+            for entry in entries:
+                result = by_id.get(entry.video_id) or {"status": "failed", "error": "Not processed."}
+                entry.last_prefetched_at = finished_at
+                entry.last_status = "processed" if result["status"] == "processed" else "failed"
+                entry.last_error = result.get("error")
+                entry.failures = 0 if entry.last_status == "processed" else entry.failures + 1
+                counts[entry.last_status] = counts.get(entry.last_status, 0) + 1
+            db.session.commit()
+            summary = {"started_at": started_at.isoformat(), "finished_at": finished_at.isoformat(), "counts": counts, "video_ids": video_ids}
+            with self._state_lock:
+                self._last_run = summary
+            logger.info("Prefetch pass done: %s", counts)
+            return summary
+        finally:
+            with self._state_lock:
+                self._current = None
+            self._run_lock.release()
+
+    def _report_progress(self, stage: str):
+        with self._state_lock:
+            if self._current is not None:
+                self._current["progress"] = stage
+
+    # --- state ---
+
+    def status(self) -> dict:
+        """Scheduler settings, the running pass (if any), the last pass and the watchlist's freshness (needs an app context)."""
+        scanned = self._scan(_utcnow())
+        states = {"due": 0, "backoff": 0, "fresh": 0}
+        for _, state in scanned:
+            states[state] += 1
+        failing = sum(1 for entry, _ in scanned if entry.failures)
+        with self._state_lock:
+            current = dict(self._current) if self._current else None
+            last_run = self._last_run
+        return {
+            "enabled": self.is_running(),
+            "running": current is not None,
+            "in_window": in_window(self.window),
+            "window": self.window_text,
+            "interval_seconds": self.interval,
+            "ttl_seconds": int(self.ttl.total_seconds()),
+            "concurrency": self.concurrency,
+            "next_run_at": self._next_run_at.isoformat() if self._next_run_at and self.is_running() else None,
+            "current": current,
+            "last_run": last_run,
+            "watchlist": {
+                "total": len(scanned),
+                **states,
+                "failing": failing,
+                "next_up": [entry.video_id for entry, state in scanned if state == "due"][:self.batch_size],
+            },
+        }
+
+
+prefetch_scheduler = PrefetchScheduler()
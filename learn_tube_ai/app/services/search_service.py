@@ -0,0 +1,131 @@
+# learn_tube_ai/app/services/search_service.py
+# Full-text search over transcript segments and analyses.
+# SQLite uses an FTS5 virtual table (`transcript_fts`), PostgreSQL a tsvector column with a GIN index
+# (`transcript_search`). Both tables are created by the migrations. Every language variant of a video
+# (video row) is indexed separately.
+import logging
+import re
+from typing import List
+
+from sqlalchemy import text
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+SQLITE_TABLE = "transcript_fts"
+POSTGRES_TABLE = "transcript_search"
+SQLITE_ROWID_BLOCK = 1_000_000 # max indexed rows per video on SQLite
+
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def _index_rows(video_obj) -> List[dict]:
+    """Rows to index for a video: one per transcript segment plus one each for the summary and key terms."""
+    rows = []
+    # `language` is only stored on PostgreSQL; SQLite rows map to their video row through the rowid block.
+    for segment in video_obj.transcript_segments or []:
+        if segment.get("text"):
+            rows.append({"video_id": video_obj.video_id, "language": video_obj.language, "start": segment.get("start"), "kind": "segment", "text": segment["text"]})
+    if video_obj.summary:
+        rows.append({"video_id": video_obj.video_id, "language": video_obj.language, "start": None, "kind": "summary", "text": video_obj.summary})
+    if video_obj.key_terms:
+        terms_text = " ".join(f"{term.get('term', '')}: {term.get('definition', '')}" for term in video_obj.key_terms if isinstance(term, dict))
+        if terms_text:
+            rows.append({"video_id": video_obj.video_id, "language": video_obj.language, "start": None, "kind": "key_terms", "text": terms_text})
+    return rows
+
+
+def index_video(video_obj):
+    """
+    Replaces the search rows for `video_obj` inside the current transaction, so the index
+    commits (or rolls back) together with the video write.
+    """
+    dialect = _dialect()
+    rows = _index_rows(video_obj)
+    if dialect == "sqlite":
+        # FTS5 can't index the video_id column for equality lookups, so each video owns a block of
+        # rowids (video.id * SQLITE_ROWID_BLOCK + n) and is replaced with a cheap rowid range delete.
+        db.session.flush() # make sure a new video has its primary key
+        first_rowid = video_obj.id * SQLITE_ROWID_BLOCK
+        db.session.execute(text(f"DELETE FROM {SQLITE_TABLE} WHERE rowid >= :lo AND rowid < :hi"),
+                           {"lo": first_rowid, "hi": first_rowid + SQLITE_ROWID_BLOCK})
+        for offset, row in enumerate(rows[:SQLITE_ROWID_BLOCK]):
+            row["rowid"] = first_rowid + offset
+        if rows:
+            db.session.execute(text(f"INSERT INTO {SQLITE_TABLE} (rowid, video_id, start, kind, text) VALUES (:rowid, :video_id, :start, :kind, :text)"),
+                               rows[:SQLITE_ROWID_BLOCK])
+    elif dialect == "postgresql":
+        db.session.execute(text(f"DELETE FROM {POSTGRES_TABLE} WHERE video_id = :video_id AND language = :language"),
+                           {"video_id": video_obj.video_id, "language": video_obj.language})
+        if rows:
+            db.session.execute(text(f"INSERT INTO {POSTGRES_TABLE} (video_id, language, start, kind, text) VALUES (:video_id, :language, :start, :kind, :text)"), rows)
+    else:
+        logger.warning("Full-text search is not supported on '%s'. Skipping index for %s.", dialect, video_obj.video_id)
+
+
+def _fts5_query(query: str) -> str:
+    """
+    Turns free text into an FTS5 query: every word is quoted (so user input can't be FTS syntax) and AND-ed.
+    A trailing '*' on a word is kept as a prefix match (e.g. 'photo*').
+    """
+    words = re.findall(r"(\w+)(\*?)", query)
+    return " ".join('"' + word + '"' + star for word, star in words)
+
+
+def search_transcripts(query: str, limit: int = 20) -> List[dict]:
+    """
+    Ranked hits for `query`. Each hit: {'video_id', 'language', 'title', 'video_url', 'kind', 'start', 'snippet', 'score', 'jump_url'}.
+    `start` is the segment start time in seconds (None for summary/key-term hits).
+    """
+    dialect = _dialect()
+    if dialect == "sqlite":
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return []
+        sql = text(f"""
+            SELECT f.video_id, f.start, f.kind,
+                   snippet({SQLITE_TABLE}, 3, '<mark>', '</mark>', '...', 16) AS snippet,
+                   bm25({SQLITE_TABLE}) AS score,
+                   v.language, v.title, v.video_url
+            FROM {SQLITE_TABLE} AS f
+            LEFT JOIN video AS v ON v.id = f.rowid / {SQLITE_ROWID_BLOCK}
+            WHERE {SQLITE_TABLE} MATCH :query
+            ORDER BY score
+            LIMIT :limit
+        """)
+        rows = db.session.execute(sql, {"query": fts_query, "limit": limit}).mappings().all()
+        # bm25() is "lower is better"; flip the sign so every backend reports "higher is better".
+        return [_hit(row, -row["score"]) for row in rows]
+    if dialect == "postgresql":
+        sql = text(f"""
+            SELECT s.video_id, s.language, s.start, s.kind,
+                   ts_headline('english', s.text, q, 'StartSel=<mark>, StopSel=</mark>, MaxWords=16, MinWords=5') AS snippet,
+                   ts_rank(s.tsv, q) AS score,
+                   v.title, v.video_url
+            FROM {POSTGRES_TABLE} AS s
+            LEFT JOIN video AS v ON v.video_id = s.video_id AND v.language = s.language
+            CROSS JOIN websearch_to_tsquery('english', :query) AS q
+            WHERE s.tsv @@ q
+            ORDER BY score DESC
+            LIMIT :limit
+        """)
+        rows = db.session.execute(sql, {"query": query, "limit": limit}).mappings().all()
+        return [_hit(row, row["score"]) for row in rows]
+    raise NotImplementedError(f"Full-text search is not supported on '{dialect}'.")
+
+
+def _hit(row, score) -> dict:
+    return {
+        "video_id": row["video_id"],
+        "language": row["language"],
+        "title": row["title"],
+        "video_url": row["video_url"],
+        "kind": row["kind"],
+        "start": row["start"],
+        "snippet": row["snippet"],
+        "score": round(float(score), 4),
+        "jump_url": f"https://www.youtube.com/watch?v={row['video_id']}&t={int(row['start'])}s" if row["start"] is not None else None,
+    }
@@ -0,0 +1,143 @@
+# learn_tube_ai/app/services/segment_codec.py
+# Compact binary encoding of transcript segments ([{'text', 'start', 'duration'}, ...]) for the
+# video.transcript_segments_bin column. Columnar layout, all integers little-endian:
+#
+#   header   b"LTS1", flags (u8), count (u32)
+#   body     start_ms[count] (i32), duration_ms[count] (i32), text_bytes[count] (u32), UTF-8 texts concatenated
+#
+# Times are stored as whole milliseconds, which is the precision YouTube and the transcript parser
+# produce, so values round-trip exactly (12.34 stays 12.34, not the float32 12.340000152587890625).
+# With flags & FLAG_ZSTD / FLAG_ZLIB the body is compressed. Decoding is a few array.frombytes calls
+# and one UTF-8 decode instead of parsing a JSON document with three keys per segment.
+import array
+import struct
+import sys
+import zlib
+from typing import List, Optional, Tuple
+
+try: # optional dependency: pip install zstandard
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"LTS1"
+FLAG_ZSTD = 0x01
+FLAG_ZLIB = 0x02
+_HEADER = struct.Struct("<4sBI")
+COMPRESSIONS = ("none", "zlib", "zstd")
+
+# Compression for newly written rows (SEGMENTS_COMPRESSION, see init_app); rows are always decoded
+# according to their own flags.
+_compression = "none"
+_zstd_level = 3
+
+_BIG_ENDIAN = sys.byteorder == "big"
+assert array.array("i").itemsize == 4 and array.array("I").itemsize == 4
+
+
+def init_app(app):
+    """Takes SEGMENTS_COMPRESSION / SEGMENTS_ZSTD_LEVEL from app.config; a setting that can't be used fails at startup."""
+    global _compression, _zstd_level
+    compression = app.config.get("SEGMENTS_COMPRESSION", "none")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown SEGMENTS_COMPRESSION '{compression}'. Use one of: {', '.join(COMPRESSIONS)}.")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("SEGMENTS_COMPRESSION=zstd requires the zstandard package.")
+    _compression = compression
+    _zstd_level = app.config.get("SEGMENTS_ZSTD_LEVEL", 3)
+
+
+def _to_le(values: array.array) -> bytes:
+    if _BIG_ENDIAN:
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode: str, data: bytes) -> array.array:
+    values = array.array(typecode)
+    values.frombytes(data)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _milliseconds(value) -> int:
+    return int(round(float(value or 0.0) * 1000))
+
+
+def encode_segments(segments: List[dict], compression: Optional[str] = None) -> bytes:
+    """
+    Encodes segments (only 'text', 'start' and 'duration' are kept). `compression` is one of COMPRESSIONS,
+    default SEGMENTS_COMPRESSION; 'zstd' needs the zstandard package.
+    """
+    compression = compression or _compression
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown segment compression '{compression}'. Use one of: {', '.join(COMPRESSIONS)}.")
+    texts = [(segment.get("text") or "").encode("utf-8") for segment in segments]
+    body = b"".join([
+        _to_le(array.array("i", [_milliseconds(segment.get("start")) for segment in segments])),
+        _to_le(array.array("i", [_milliseconds(segment.get("duration")) for segment in segments])),
+        _to_le(array.array("I", [len(text) for text in texts])),
+        b"".join(texts),
+    ])
+    flags = 0
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("SEGMENTS_COMPRESSION=zstd requires the zstandard package.")
+        body = zstandard.ZstdCompressor(level=_zstd_level).compress(body)
+        flags |= FLAG_ZSTD
+    elif compression == "zlib":
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(MAGIC, flags, len(segments)) + body
+
+
+def decode_columns(blob: bytes) -> Tuple[array.array, array.array, List[str]]:
+    """
+    (start_ms, duration_ms, texts) of an encoded blob, without building per-segment dicts.
+    Raises ValueError for anything that is not a complete blob (wrong magic, short header, truncated or corrupt body).
+    """
+    if len(blob) < _HEADER.size:
+        raise ValueError("Not an encoded segment blob.")
+    magic, flags, count = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded segment blob.")
+    body = memoryview(blob)[_HEADER.size:]
+    try:
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise ValueError("Segments are zstd-compressed but the zstandard package is not installed.")
+            body = memoryview(zstandard.ZstdDecompressor().decompress(body))
+        elif flags & FLAG_ZLIB:
+            body = memoryview(zlib.decompress(body))
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        raise ValueError(f"Corrupt segment blob: {e}") from e
+    width = 4 * count
+    if len(body) < 3 * width:
+        raise ValueError(f"Truncated segment blob: {len(body)} body bytes for {count} segments.")
+    starts = _from_le("i", body[:width])
+    durations = _from_le("i", body[width:2 * width])
+    lengths = _from_le("I", body[2 * width:3 * width])
+    text_blob = bytes(body[3 * width:])
+    if len(text_blob) != sum(lengths):
+        raise ValueError(f"Truncated segment blob: {len(text_blob)} text bytes, expected {sum(lengths)}.")
+    texts = []
+    position = 0
+    if text_blob.isascii():
+        joined = text_blob.decode("ascii") # byte lengths == character lengths: slice the decoded string
+        for length in lengths:
+            texts.append(joined[position:position + length])
+            position += length
+    else:
+        for length in lengths:
+            texts.append(text_blob[position:position + length].decode("utf-8"))
+            position += length
+    return starts, durations, texts
+
+
+def decode_segments(blob: bytes) -> List[dict]:
+    """The segment dicts of an encoded blob, in the shape they were stored with."""
+    starts, durations, texts = decode_columns(blob)
+    return [{"text": text, "start": start / 1000, "duration": duration / 1000}
+            for text, start, duration in zip(texts, starts, durations)]
@@ -0,0 +1,174 @@
+# learn_tube_ai/app/services/transcript_languages.py
+# Transcript language selection. Clients ask for a preference chain (?languages=de,en; default
+# TRANSCRIPT_LANGUAGES). A chain resolves like youtube-transcript-api's find_transcript: the first code
+# with a transcript, manually created ones before generated ones. With TRANSCRIPT_TRANSLATION_FALLBACK,
+# a chain none of whose languages exist is answered with a YouTube translation into the first code the
+# video can be translated into. Every resolved language is stored as its own Video row (video_id, language).
+# What YouTube offers for a video (its transcript list) is cached in transcript_listing for
+# TRANSCRIPT_LISTING_TTL_SECONDS, so cache hits pick the right variant without listing again.
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import TranscriptListing, Video
+
+logger = logging.getLogger(__name__)
+
+_LANGUAGE_CODE = re.compile(r"^[A-Za-z]{2,3}(-[A-Za-z0-9]{2,8})*$") # 'en', 'pt-BR', 'zh-Hans'
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None) # the DateTime columns hold naive UTC
+
+
+def parse_languages(raw) -> List[str]:
+    """Comma-separated string (or list) of language codes -> deduplicated chain; raises ValueError on bad codes."""
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    chain = []
+    for code in raw or []:
+        code = str(code).strip()
+        if not code:
+            continue
+        if not _LANGUAGE_CODE.match(code):
+            raise ValueError(f"Invalid language code '{code}'.")
+        if code not in chain:
+            chain.append(code)
+    return chain
+
+
+class TranscriptLanguages:
+    """Language settings shared by request handlers and fetch worker threads (configured by init_app)."""
+
+    def __init__(self):
+        self.default_chain = ["en", "en-US", "en-GB"]
+        self.translate = True
+        self.listing_ttl = timedelta(days=1)
+
+    def init_app(self, app):
+        self.default_chain = parse_languages(app.config.get("TRANSCRIPT_LANGUAGES", "en,en-US,en-GB")) or ["en"]
+        self.translate = app.config.get("TRANSCRIPT_TRANSLATION_FALLBACK", True)
+        self.listing_ttl = timedelta(seconds=app.config.get("TRANSCRIPT_LISTING_TTL_SECONDS", 24 * 3600))
+        app.extensions["transcript_languages"] = self
+
+    def chain(self, raw=None) -> List[str]:
+        """The preference chain for a request's `languages` value (None/empty -> the default chain)."""
+        return parse_languages(raw) or list(self.default_chain)
+
+    @property
+    def default_language(self) -> str:
+        """Language stored for transcripts that don't come from YouTube's list (custom transcripts)."""
+        return self.default_chain[0]
+
+
+transcript_languages = TranscriptLanguages()
+
+
+# --- transcript list metadata ---
+
+def listing_metadata(transcript_list) -> dict:
+    """Plain-data summary of a youtube-transcript-api TranscriptList."""
+    transcripts, translation_languages = [], []
+    for transcript in transcript_list:
+        transcripts.append({"language_code": transcript.language_code, "language": transcript.language,
+                            "is_generated": transcript.is_generated, "is_translatable": transcript.is_translatable})
+        for target in transcript.translation_languages or []:
+            if target.language_code not in translation_languages:
+                translation_languages.append(target.language_code)
+    return {"transcripts": transcripts, "translation_languages": translation_languages}
+
+
+def resolve_language(listing: dict, languages: List[str], translate: Optional[bool] = None) -> Optional[dict]:
+    """
+    Which transcript answers `languages`: {'language', 'source_language', 'is_generated', 'translated'}, or None
+    when the video has none of them and no translation into them (or translation is off).
+    """
+    translate = transcript_languages.translate if translate is None else translate
+    transcripts = listing.get("transcripts") or []
+    for code in languages:
+        for is_generated in (False, True): # manually created transcripts first, like find_transcript
+            if any(t["language_code"] == code and t["is_generated"] == is_generated for t in transcripts):
+                return {"language": code, "source_language": code, "is_generated": is_generated, "translated": False}
+    if not translate:
+        return None
+    sources = sorted((t for t in transcripts if t["is_translatable"]), key=lambda t: t["is_generated"])
+    if not sources:
+        return None
+    target = next((code for code in languages if code in (listing.get("translation_languages") or [])), None)
+    if target is None:
+        return None
+    source = sources[0]
+    return {"language": target, "source_language": source["language_code"], "is_generated": source["is_generated"], "translated": True}
+
+
+def load_listing(video_id: str) -> Optional[dict]:
+    """The cached listing for `video_id` if it is younger than the TTL, else None."""
+    row = TranscriptListing.query.filter_by(video_id=video_id).first()
+    if row is None or _utcnow() - row.fetched_at >= transcript_languages.listing_ttl:
+        return None
+    return row.to_dict()
+
+
+def store_listing(video_id: str, listing: dict, commit: bool = True):
+    """
+    Upserts the cached listing. Best effort, it's a cache: losing a race with another writer or a busy
+    database is only logged. With commit=False it is committed with the caller's transaction.
+    """
+    values = {"transcripts": listing["transcripts"], "translation_languages": listing["translation_languages"], "fetched_at": _utcnow()}
+    try:
+        # Write first: on SQLite a SELECT inside the transaction would hold a shared lock that deadlocks
+        # with concurrent writers when it is upgraded for the INSERT.
+        if not db.session.execute(update(TranscriptListing).where(TranscriptListing.video_id == video_id).values(**values)).rowcount:
+            with db.session.begin_nested(): # a concurrent writer may insert it first
+                db.session.execute(insert(TranscriptListing).values(video_id=video_id, **values))
+        if commit:
+            db.session.commit()
+    except SQLAlchemyError as e:
+        if commit:
+            db.session.rollback()
+        logger.debug("Could not store the transcript listing of %s: %s", video_id, e)
+
+
+# --- stored variants ---
+
+def _stored_languages(video_id: str) -> List[str]:
+    """Languages stored for `video_id`, oldest variant first (one query on the video_id index)."""
+    return [language for (language,) in db.session.query(Video.language).filter(Video.video_id == video_id).order_by(Video.id)]
+
+
+def choose_stored_language(video_id: str, languages: List[str]) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    For processing requests: (language of the stored variant that answers `languages`, cached listing or None).
+    A stored first choice always wins. Otherwise the cached listing decides (a better language may exist
+    that isn't stored yet, which makes this a miss); without one, the first stored language of the chain is used.
+    The listing is returned so a miss can tell at once when no transcript can be produced.
+    """
+    stored = _stored_languages(video_id)
+    if languages[0] in stored:
+        return languages[0], None
+    listing = load_listing(video_id)
+    if listing is not None:
+        choice = resolve_language(listing, languages)
+        return (choice["language"] if choice and choice["language"] in stored else None), listing
+    return next((code for code in languages if code in stored), None), None
+
+
+def find_stored_language(video_id: str, languages: Optional[List[str]] = None) -> Optional[str]:
+    """
+    For read endpoints: the first stored language of `languages`. Without an explicit chain, the default
+    chain is tried and then the oldest stored variant, so a video processed in any language can be read.
+    """
+    stored = _stored_languages(video_id)
+    language = next((code for code in languages or transcript_languages.default_chain if code in stored), None)
+    if language is None and not languages and stored:
+        return stored[0]
+    return language
+
+
+def no_transcript_error(languages: List[str]) -> str:
+    return f"No transcript found in preferred languages: {', '.join(languages)}."
@@ -0,0 +1,169 @@
+# learn_tube_ai/app/services/transcript_parser.py
+# Parses user-supplied transcripts into {'text', 'start', 'duration'} segments, the same shape
+# youtube-transcript-api returns. Supported formats:
+#   - 'youtube': YouTube's "Show transcript" copy-paste, i.e. lines starting with a timestamp
+#     ("0:05", "[01:02:03]", "00:12.5 text") followed by text on the same or following lines;
+#   - 'srt' / 'vtt': SubRip and WebVTT cues ("00:00:01,000 --> 00:00:03,500" + text lines).
+# Everything is a generator over lines, so an uploaded file is parsed straight off its stream,
+# and durations are filled in as the next segment starts (one pass, no second loop).
+import io
+import itertools
+import re
+from typing import Iterable, Iterator, List, Union
+
+FORMATS = ("auto", "youtube", "srt", "vtt")
+
+# Timestamps like [00:00], 00:00, 0:00:00, [0:00:00.123] at the START of a (stripped) line.
+# Groups: 1:Hours(opt), 2:Minutes, 3:Seconds, 4:Fraction(opt), 5:Text
+_LINE_TIMESTAMP = re.compile(r"\[?(?:(\d{1,2}):)?(\d{1,2}):(\d{2})(?:[.,](\d{1,3}))?\]?\s*(.*)")
+# Cue timing line: "00:00:01,000 --> 00:00:03,500" (SRT) or "00:01.000 --> 00:03.500 align:start" (VTT).
+_TIME = r"(?:(\d+):)?(\d{1,2}):(\d{2})(?:[.,](\d{1,3}))?"
+_CUE_TIMING = re.compile(rf"{_TIME}\s*-->\s*{_TIME}")
+_TAG = re.compile(r"<[^>]*>") # VTT voice/class/karaoke tags
+
+# Segments without a following timestamp get an estimated duration: ~15 characters per second, at least 2s.
+_CHARS_PER_SECOND = 15.0
+_MIN_LAST_DURATION = 2.0
+_MIN_DURATION = 0.1
+_DETECT_LINES = 20
+
+
+def _seconds(hours, minutes, seconds, fraction) -> float:
+    value = float(int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds))
+    if fraction:
+        value += int(fraction.ljust(3, "0")) / 1000.0
+    return value
+
+
+def iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Lines of `source`: a string (iterated without building a splitlines() list) or any iterable of lines, e.g. a text file."""
+    if isinstance(source, str):
+        return iter(io.StringIO(source))
+    return iter(source)
+
+
+def detect_format(head: List[str]) -> str:
+    """'vtt', 'srt' or 'youtube' from the first few lines of a transcript."""
+    for line in head:
+        stripped = line.strip().lstrip("\ufeff")
+        if stripped:
+            if stripped.startswith("WEBVTT"):
+                return "vtt"
+            break
+    if any("-->" in line for line in head):
+        return "srt"
+    return "youtube"
+
+
+def iter_segments(source: Union[str, Iterable[str]], fmt: str = "auto") -> Iterator[dict]:
+    """Yields segments from `source` (see iter_lines) in order. `fmt` is one of FORMATS."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown transcript format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    lines = iter_lines(source)
+    if fmt == "auto":
+        head = list(itertools.islice(lines, _DETECT_LINES))
+        fmt = detect_format(head)
+        lines = itertools.chain(head, lines)
+    if fmt == "youtube":
+        return _iter_timestamped_lines(lines)
+    return _iter_cues(lines)
+
+
+def parse_transcript(source: Union[str, Iterable[str]], fmt: str = "auto") -> List[dict]:
+    """
+    All segments of `source` as a list. Text with no recognizable timestamps becomes a single segment
+    starting at 0; a non-empty transcript that yields nothing at all is kept whole as one 600s segment.
+    """
+    segments = list(iter_segments(source, fmt))
+    if not segments and isinstance(source, str) and source.strip():
+        segments.append({"text": source, "start": 0, "duration": 600})
+    return segments
+
+
+def _estimated_duration(text: str) -> float:
+    return round(max(_MIN_LAST_DURATION, len(text) / _CHARS_PER_SECOND), 1)
+
+
+def _iter_timestamped_lines(lines: Iterable[str]) -> Iterator[dict]:
+    # Each segment is held back until the next one starts, which gives its duration.
+    pending = None
+    start = 0.0 # text before the first timestamp starts at 0
+    parts = []
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line:
+            continue
+        match = _LINE_TIMESTAMP.fullmatch(line) if line[0].isdigit() or line[0] == "[" else None
+        if match is None:
+            parts.append(line)
+            continue
+        if parts:
+            if pending is not None:
+                pending["duration"] = max(_MIN_DURATION, start - pending["start"])
+                yield pending
+            pending = {"text": " ".join(parts), "start": start, "duration": 0.0}
+            parts = []
+        hours, minutes, seconds, fraction, text = match.groups()
+        start = _seconds(hours, minutes, seconds, fraction)
+        if text:
+            parts.append(text)
+
+    if parts:
+        if pending is not None:
+            pending["duration"] = max(_MIN_DURATION, start - pending["start"])
+            yield pending
+        pending = {"text": " ".join(parts), "start": start, "duration": 0.0}
+    if pending is not None:
+        pending["duration"] = _estimated_duration(pending["text"])
+        yield pending
+
+
+def _iter_cues(lines: Iterable[str]) -> Iterator[dict]:
+    # Only lines after a timing line and before the next blank line are cue text, which skips SRT
+    # indices, VTT cue identifiers and the WEBVTT header / NOTE / STYLE blocks.
+    start = end = None
+    parts = []
+    held_index = None # digits-only line inside a cue: an SRT index if a timing line follows (files without blank lines)
+    for raw_line in lines:
+        line = raw_line.strip()
+        timing = _CUE_TIMING.search(line) if "-->" in line else None
+        if timing:
+            if start is not None and parts:
+                yield {"text": " ".join(parts), "start": start, "duration": max(0.0, end - start)}
+            groups = timing.groups()
+            start, end = _seconds(*groups[:4]), _seconds(*groups[4:])
+            parts = []
+            held_index = None
+            continue
+        if held_index is not None:
+            parts.append(held_index)
+            held_index = None
+        if not line:
+            if start is not None and parts:
+                yield {"text": " ".join(parts), "start": start, "duration": max(0.0, end - start)}
+            start = None
+            parts = []
+        elif start is not None:
+            if line.isdigit():
+                held_index = line
+                continue
+            if "<" in line:
+                line = _TAG.sub("", line).strip()
+            if line:
+                parts.append(line)
+    if held_index is not None:
+        parts.append(held_index)
+    if start is not None and parts:
+        yield {"text": " ".join(parts), "start": start, "duration": max(0.0, end - start)}
+
+
+def segments_to_text(segments: Iterable[dict]) -> str:
+    """Plain transcript text in the copy-paste format ("[mm:ss] text" per segment), which parses back to the same starts."""
+    lines = []
+    for segment in segments:
+        seconds = int(segment["start"])
+        hours, remainder = divmod(seconds, 3600)
+        minutes, secs = divmod(remainder, 60)
+        stamp = f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+        lines.append(f"[{stamp}] {segment['text']}")
+    return "\n".join(lines)
@@ -1,101 +1,131 @@
 # learn_tube_ai/app/services/video_processing_service.py
-from .llm_service import generate_analysis_from_text
-from youtube_transcript_api import (
-    YouTubeTranscriptApi, 
-    TranscriptsDisabled, 
-    NoTranscriptFound, 
-    VideoUnavailable 
-    # Removed TooManyRequests, NotTranslatable, etc.
+from .llm_service import (
+    generate_analysis_from_text, generate_analysis_chunked, stream_analysis_from_text, stream_analysis_chunked,
+    generate_analysis_from_text_async, generate_analysis_chunked_async, stream_analysis_from_text_async, stream_analysis_chunked_async,
+    llm_client
 )
-import os 
+from .llm_providers import LLMOverloadedError
+from .youtube_fetcher import youtube_fetcher, YouTubeThrottledError
+from .singleflight import SingleFlight
+from .transcript_languages import transcript_languages, listing_metadata, resolve_language, no_transcript_error
+from app.observability import span
+import asyncio
+import logging
+import re
+from typing import Optional, List, Iterator, AsyncIterator
 
-def get_youtube_transcript(video_id: str) -> dict:
+logger = logging.getLogger(__name__)
+
+# Collapses concurrent transcript fetch + LLM analysis for the same video_id within this process.
+video_flight = SingleFlight()
+
+
+_VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{1,20}$") # YouTube ids are 11 such characters; Video.video_id holds up to 20
+
+
+def is_valid_video_id(video_id) -> bool:
+    """Whether a client-supplied video_id is safe to store and to use in file names."""
+    return isinstance(video_id, str) and bool(_VIDEO_ID.match(video_id))
+
+
+def extract_video_id(url):
+    patterns = [ r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/watch\?v=([^&]+)', r'(?:https?:\/\/)?(?:www\.)?youtu\.be\/([^?]+)', r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/embed\/([^?]+)', r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/v\/([^?]+)',]
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match: return match.group(1)
+    return None
+
+def get_youtube_transcript(video_id: str, languages: Optional[List[str]] = None, translate: Optional[bool] = None) -> dict:
     """
-    Fetches the transcript for a given YouTube video ID.
+    Fetches the transcript for a given YouTube video ID in the first available language of `languages`
+    (default: the TRANSCRIPT_LANGUAGES chain), falling back to a YouTube translation into one of them
+    when `translate` (default TRANSCRIPT_TRANSLATION_FALLBACK) allows it.
     Returns a dictionary with:
         'text': The full transcript as a single string.
         'segments': A list of segment dictionaries (e.g., {'text': str, 'start': float, 'duration': float}).
+        'language': The language of the returned transcript.
+        'translated_from': The source language when the transcript is a translation, otherwise None.
+        'listing': Metadata of the video's transcript list (see transcript_languages.listing_metadata), for caching.
         'error': An error message string if fetching fails, otherwise None.
     """
+    # Imported on first use: youtube-transcript-api (and requests) are only needed once a transcript is fetched.
+    from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+    languages = languages or transcript_languages.chain()
+    listing = None
     try:
-        print(f"SERVICE: Attempting to list transcripts for video_id: {video_id}")
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        
-        selected_transcript_obj = None
-        # Try to find a manually created or generated transcript in preferred languages
-        # The library handles the preference order if multiple languages in the list match
-        preferred_langs = ['en', 'en-US', 'en-GB']
-        try:
-            print(f"SERVICE: Trying to find transcript in {preferred_langs} for {video_id}")
-            selected_transcript_obj = transcript_list.find_transcript(preferred_langs)
-        except NoTranscriptFound:
-            print(f"SERVICE: No transcript in preferred languages {preferred_langs} found for {video_id}.")
-            # Optionally, you could try fetching ANY transcript and then translating it
-            # For now, we consider this an error if primary languages are not found.
-            # Example:
-            # try:
-            #   any_transcript = transcript_list.find_generated_transcript(transcript_list.languages) # find any
-            #   if any_transcript.is_translatable:
-            #       selected_transcript_obj = any_transcript.translate('en')
-            # except (NoTranscriptFound, NotTranslatable, TranslationLanguageNotAvailable):
-            #    pass # Stick with original error
-            if not selected_transcript_obj:
-                 return {"text": None, "segments": None, "error": f"No transcript found in preferred languages: {', '.join(preferred_langs)}."}
-
-
-        print(f"SERVICE: Fetching transcript data for {video_id} using found transcript object.")
-        fetched_segments_data = selected_transcript_obj.fetch() 
+        logger.debug("Attempting to list transcripts for video_id: %s", video_id)
+        with span("transcript_list"):
+            transcript_list = youtube_fetcher.list_transcripts(video_id) # pooled, rate-limited, retried
+        listing = listing_metadata(transcript_list)
+
+        choice = resolve_language(listing, languages, translate)
+        if choice is None:
+            logger.info("No transcript in preferred languages %s found for %s.", languages, video_id)
+            return {"text": None, "segments": None, "listing": listing, "error": no_transcript_error(languages)}
+        selected_transcript_obj = transcript_list.find_transcript([choice["source_language"]])
+        if choice["translated"]:
+            logger.info("Translating the %s transcript of %s to %s.", choice["source_language"], video_id, choice["language"])
+            selected_transcript_obj = selected_transcript_obj.translate(choice["language"])
+
+        logger.debug("Fetching transcript data for %s using found transcript object.", video_id)
+        with span("transcript_fetch"):
+            fetched_segments_data = youtube_fetcher.fetch_transcript(selected_transcript_obj)
         
         if not fetched_segments_data:
-            print(f"SERVICE: Fetched transcript data is empty for {video_id}.")
+            logger.info("Fetched transcript data is empty for %s.", video_id)
             return {"text": None, "segments": None, "error": "Fetched transcript is empty."}
 
         transcript_texts_list = []
         processed_segments_list = []
 
-        for i, seg_data in enumerate(fetched_segments_data):
-            # ... (segment processing logic as in the previous version - assuming it's correct for FetchedTranscriptSnippet) ...
-            try:
-                if hasattr(seg_data, 'text') and hasattr(seg_data, 'start') and hasattr(seg_data, 'duration'):
-                    current_text, start_time, duration_val = seg_data.text, seg_data.start, seg_data.duration
-                elif isinstance(seg_data, dict) and all(k in seg_data for k in ['text', 'start', 'duration']):
-                    current_text, start_time, duration_val = seg_data['text'], seg_data['start'], seg_data['duration']
-                else: raise ValueError("Segment format not recognized") # Force into except block
+        with span("segment_processing"):
+            for i, seg_data in enumerate(fetched_segments_data):
+                # ... (segment processing logic as in the previous version - assuming it's correct for FetchedTranscriptSnippet) ...
+                try:
+                    if hasattr(seg_data, 'text') and hasattr(seg_data, 'start') and hasattr(seg_data, 'duration'):
+                        current_text, start_time, duration_val = seg_data.text, seg_data.start, seg_data.duration
+                    elif isinstance(seg_data, dict) and all(k in seg_data for k in ['text', 'start', 'duration']):
+                        current_text, start_time, duration_val = seg_data['text'], seg_data['start'], seg_data['duration']
+                    else: raise ValueError("Segment format not recognized") # Force into except block
                 
-                transcript_texts_list.append(current_text)
-                processed_segments_list.append({"text": current_text, "start": start_time, "duration": duration_val})
-            except Exception as e_seg:
-                print(f"SERVICE: Error processing segment {i} for {video_id}: {e_seg}. Data: {str(seg_data)[:100]}")
-                transcript_texts_list.append(f"[Segment Error: {str(e_seg)[:30]}]") # Add placeholder
-                processed_segments_list.append({"text": f"[Segment Error]", "start": 0, "duration": 0, "error": str(e_seg)})
+                    transcript_texts_list.append(current_text)
+                    processed_segments_list.append({"text": current_text, "start": start_time, "duration": duration_val})
+                except Exception as e_seg:
+                    logger.warning("Error processing segment %s for %s: %s. Data: %s", i, video_id, e_seg, str(seg_data)[:100])
+                    transcript_texts_list.append(f"[Segment Error: {str(e_seg)[:30]}]") # Add placeholder
+                    processed_segments_list.append({"text": f"[Segment Error]", "start": 0, "duration": 0, "error": str(e_seg)})
 
 
         if not transcript_texts_list: # Should not happen if fetched_segments_data was not empty and processing worked
-            print(f"SERVICE: No text could be extracted from any segments for {video_id}")
+            logger.info("No text could be extracted from any segments for %s", video_id)
             return {"text": None, "segments": [], "error": "No text content in transcript segments."}
 
         full_transcript_text = " ".join(transcript_texts_list).replace('\n', ' ')
         full_transcript_text = ' '.join(full_transcript_text.split())
 
-        print(f"SERVICE: Transcript processing complete for {video_id}. Text length: {len(full_transcript_text)}, Segments: {len(processed_segments_list)}")
-        return {"text": full_transcript_text, "segments": processed_segments_list, "error": None}
+        logger.info("Transcript processing complete for %s. Text length: %s, Segments: %s", video_id, len(full_transcript_text), len(processed_segments_list))
+        return {"text": full_transcript_text, "segments": processed_segments_list, "language": choice["language"],
+                "translated_from": choice["source_language"] if choice["translated"] else None, "listing": listing, "error": None}
 
     # Specific exceptions from youtube-transcript-api
     except TranscriptsDisabled:
-        print(f"SERVICE: Transcripts are disabled for video {video_id}")
+        logger.info("Transcripts are disabled for video %s", video_id)
         return {"text": None, "segments": None, "error": "Transcripts are disabled for this video."}
     except NoTranscriptFound: # This is a valid exception from the library
-        print(f"SERVICE: No transcript found for video {video_id} (overall).")
+        logger.info("No transcript found for video %s (overall).", video_id)
         return {"text": None, "segments": None, "error": "No transcript could be found for this video."}
     except VideoUnavailable:
-        print(f"SERVICE: Video {video_id} is unavailable.")
+        logger.info("Video %s is unavailable.", video_id)
         return {"text": None, "segments": None, "error": "This video is unavailable."}
+    except YouTubeThrottledError as e:
+        logger.warning("YouTube is throttling us while fetching %s: %s", video_id, e)
+        return {"text": None, "segments": None, "error": f"Too many requests to YouTube. Try again later or use VPN. ({e})"}
     # NoTranscriptAccessible might also not be available, remove if it causes issues
     # # except NoTranscriptAccessible: 
     # #      print(f"SERVICE: No transcript is accessible for {video_id}.")
     # #      return {"text": None, "segments": None, "error": "No transcript is accessible for this video."}
     except Exception as e: 
-        print(f"SERVICE: An unexpected error occurred in youtube-transcript-api processing for {video_id}: {str(e)}")
+        logger.error("An unexpected error occurred in youtube-transcript-api processing for %s: %s", video_id, str(e))
         if "no element found" in str(e).lower():
             error_detail = "YouTube returned an unexpected page structure (possibly an error or consent page). Transcript not parsable."
             # Check for 429 type errors in the generic exception message
@@ -105,13 +135,14 @@ def get_youtube_transcript(video_id: str) -> dict:
             error_detail = str(e)
     return {"text": None, "segments": None, "error": f"Unexpected error fetching transcript: {error_detail}"}
 
-def process_video_for_llm_analysis(video_id: str, transcript_text: str) -> dict:
+def process_video_for_llm_analysis(video_id: str, transcript_text: str, transcript_segments: Optional[List[dict]] = None) -> dict:
     """
     Processes the transcript text using an LLM for analysis.
     Returns a dictionary with 'table_of_contents', 'key_terms', 'logical_flow', and 'summary'.
-    Handles missing API key gracefully by returning empty/default analysis.
+    Long transcripts with timed segments are analyzed chunk-by-chunk in parallel and merged.
+    Handles missing API key gracefully by returning empty/default analysis (LLM_PROVIDER=mock runs without one).
+    Raises LLMOverloadedError when the LLM gate sheds the call.
     """
-    api_key = os.getenv("ANTHROPIC_API_KEY") # or whatever your key variable is
     default_analysis = {
         "table_of_contents": [],
         "key_terms": [],
@@ -119,37 +150,170 @@ def process_video_for_llm_analysis(video_id: str, transcript_text: str) -> dict:
         "summary": "Summary not available." # Default message
     }
 
-    if not api_key:
-        print(f"API_KEY not found for LLM. Skipping LLM analysis for {video_id}.")
+    if not llm_client.analysis_enabled:
+        logger.info("API_KEY not found for LLM. Skipping LLM analysis for %s.", video_id)
         default_analysis["logical_flow"] = "LLM analysis skipped: API key not configured."
         default_analysis["summary"] = "Summary skipped: API key not configured."
         return default_analysis
     
     if not transcript_text or not transcript_text.strip():
-        print(f"No transcript text provided to LLM for {video_id}. Skipping LLM analysis.")
+        logger.info("No transcript text provided to LLM for %s. Skipping LLM analysis.", video_id)
         default_analysis["logical_flow"] = "LLM analysis skipped: Transcript is empty or unavailable."
         default_analysis["summary"] = "Summary skipped: Transcript is empty or unavailable."
         return default_analysis
 
     try:
-        print(f"Attempting LLM analysis for {video_id}...")
-        # Assuming generate_analysis_from_text will use the API key from environment
-        llm_response_data = generate_analysis_from_text(transcript_text) # This should return a dict
+        logger.info("Attempting LLM analysis for %s...", video_id)
+        # generate_analysis_from_text uses the API key configured on llm_client
+        if transcript_segments and len(transcript_text) > llm_client.chunk_max_chars:
+            llm_response_data = generate_analysis_chunked(transcript_segments)
+        else:
+            llm_response_data = generate_analysis_from_text(transcript_text) # This should return a dict
         
-        # Ensure all keys are present in the response, defaulting to empty/null if not
-        analysis_data = {
-            "table_of_contents": llm_response_data.get("table_of_contents", []),
-            "key_terms": llm_response_data.get("key_terms", []),
-            "logical_flow": llm_response_data.get("logical_flow", "No logical flow generated."),
-            "summary": llm_response_data.get("summary", "No summary generated.")
-        }
-        print(f"LLM Analysis for {video_id} successful (or mock successful).")
+        analysis_data = _normalize_analysis(llm_response_data)
+        logger.info("LLM Analysis for %s successful (or mock successful).", video_id)
         return analysis_data
         
+    except LLMOverloadedError:
+        raise # the caller answers 503 instead of storing a failed analysis
     except Exception as e:
-        print(f"Error during LLM analysis for {video_id}: {e}")
+        logger.warning("Error during LLM analysis for %s: %s", video_id, e)
         # import traceback
         # print(traceback.format_exc()) # For more detailed debugging if LLM call fails
         default_analysis["logical_flow"] = f"LLM analysis failed: {str(e)}"
         default_analysis["summary"] = f"Summary generation failed: {str(e)}"
-        return default_analysis
\ No newline at end of file
+        default_analysis["error"] = str(e)
+        return default_analysis
+
+
+def _normalize_analysis(llm_response_data: dict) -> dict:
+    # Ensure all keys are present in the response, defaulting to empty/null if not
+    analysis = {
+        "table_of_contents": llm_response_data.get("table_of_contents", []),
+        "key_terms": llm_response_data.get("key_terms", []),
+        "logical_flow": llm_response_data.get("logical_flow", "No logical flow generated."),
+        "summary": llm_response_data.get("summary", "No summary generated.")
+    }
+    if llm_response_data.get("error"): # the LLM call (or some chunks' calls) failed
+        analysis["error"] = llm_response_data["error"]
+    return analysis
+
+
+# logical_flow of the placeholder analyses; stored rows carry no 'error' key, so they are recognized by these.
+_PLACEHOLDER_PREFIXES = ("LLM analysis failed", "LLM call failed", "LLM analysis skipped", "LLM analysis not performed")
+
+
+def analysis_error(analysis: Optional[dict]) -> Optional[str]:
+    """Why `analysis` is not a complete LLM analysis (skipped, failed, or failed for some chunks); None if it is one."""
+    if not analysis:
+        return "No analysis."
+    if analysis.get("error"):
+        return str(analysis["error"])
+    logical_flow = str(analysis.get("logical_flow") or "")
+    return logical_flow if logical_flow.startswith(_PLACEHOLDER_PREFIXES) else None
+
+
+def analysis_succeeded(analysis: Optional[dict]) -> bool:
+    """False for the placeholder analyses returned when the LLM analysis was skipped or failed."""
+    return analysis_error(analysis) is None
+
+
+def _skip_reason(transcript_text: str) -> Optional[str]:
+    if not llm_client.analysis_enabled:
+        return "API key not configured"
+    if not transcript_text or not transcript_text.strip():
+        return "Transcript is empty or unavailable"
+    return None
+
+
+def stream_llm_analysis(video_id: str, transcript_text: str, transcript_segments: Optional[List[dict]] = None) -> Iterator[dict]:
+    """
+    Streaming counterpart of process_video_for_llm_analysis. Yields the LLM stream events
+    ('item', 'text_delta', 'chunk') as they arrive and ends with {'type': 'analysis', 'analysis': {...}}
+    in the same shape process_video_for_llm_analysis returns.
+    """
+    if _skip_reason(transcript_text):
+        # Nothing to stream; reuse the non-streaming path for its skip messages.
+        yield {"type": "analysis", "analysis": process_video_for_llm_analysis(video_id, transcript_text, transcript_segments)}
+        return
+
+    logger.info("Attempting streamed LLM analysis for %s...", video_id)
+    if transcript_segments and len(transcript_text) > llm_client.chunk_max_chars:
+        events = stream_analysis_chunked(transcript_segments)
+    else:
+        events = stream_analysis_from_text(transcript_text)
+    for event in events:
+        if event["type"] == "analysis":
+            event = {"type": "analysis", "analysis": _normalize_analysis(event["analysis"])}
+        yield event
+
+
+def fetch_and_analyze_video(video_id: str, languages: Optional[List[str]] = None) -> dict:
+    """
+    Fetches the transcript for `video_id` (see get_youtube_transcript for `languages`) and, if that worked,
+    runs the LLM analysis. Returns the transcript fetch result dict with an extra 'analysis' key (None on fetch failure).
+    """
+    transcript_fetch_result = get_youtube_transcript(video_id, languages)
+    transcript_text = transcript_fetch_result.get("text")
+    if transcript_fetch_result.get("error") or not transcript_text:
+        return {**transcript_fetch_result, "analysis": None}
+    logger.info("Transcript for %s fetched. Length: %s. Processing for LLM.", video_id, len(transcript_text))
+    analysis_results = process_video_for_llm_analysis(video_id, transcript_text, transcript_fetch_result.get("segments"))
+    return {**transcript_fetch_result, "analysis": analysis_results}
+
+
+# --- ASYNC VARIANTS (used by the ASGI entry point, see asgi.py) ---
+async def get_youtube_transcript_async(video_id: str, languages: Optional[List[str]] = None) -> dict:
+    """
+    Async variant of get_youtube_transcript. youtube-transcript-api only speaks blocking `requests`,
+    so the fetch runs on a worker thread; the shared youtube_fetcher still bounds connections and rate.
+    """
+    return await asyncio.to_thread(get_youtube_transcript, video_id, languages)
+
+
+async def process_video_for_llm_analysis_async(video_id: str, transcript_text: str, transcript_segments: Optional[List[dict]] = None) -> dict:
+    """Async variant of process_video_for_llm_analysis; waiting on the LLM does not hold a thread."""
+    if _skip_reason(transcript_text):
+        return process_video_for_llm_analysis(video_id, transcript_text, transcript_segments) # returns the skip messages without calling the LLM
+    try:
+        logger.info("Attempting async LLM analysis for %s...", video_id)
+        if transcript_segments and len(transcript_text) > llm_client.chunk_max_chars:
+            llm_response_data = await generate_analysis_chunked_async(transcript_segments)
+        else:
+            llm_response_data = await generate_analysis_from_text_async(transcript_text)
+        return _normalize_analysis(llm_response_data)
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning("Error during LLM analysis for %s: %s", video_id, e)
+        return {
+            "table_of_contents": [], "key_terms": [],
+            "logical_flow": f"LLM analysis failed: {str(e)}",
+            "summary": f"Summary generation failed: {str(e)}",
+            "error": str(e)
+        }
+
+
+async def stream_llm_analysis_async(video_id: str, transcript_text: str, transcript_segments: Optional[List[dict]] = None) -> AsyncIterator[dict]:
+    """Async variant of stream_llm_analysis (same events)."""
+    if _skip_reason(transcript_text):
+        yield {"type": "analysis", "analysis": process_video_for_llm_analysis(video_id, transcript_text, transcript_segments)}
+        return
+    if transcript_segments and len(transcript_text) > llm_client.chunk_max_chars:
+        events = stream_analysis_chunked_async(transcript_segments)
+    else:
+        events = stream_analysis_from_text_async(transcript_text)
+    async for event in events:
+        if event["type"] == "analysis":
+            event = {"type": "analysis", "analysis": _normalize_analysis(event["analysis"])}
+        yield event
+
+
+async def fetch_and_analyze_video_async(video_id: str, languages: Optional[List[str]] = None) -> dict:
+    """Async variant of fetch_and_analyze_video."""
+    transcript_fetch_result = await get_youtube_transcript_async(video_id, languages)
+    transcript_text = transcript_fetch_result.get("text")
+    if transcript_fetch_result.get("error") or not transcript_text:
+        return {**transcript_fetch_result, "analysis": None}
+    analysis_results = await process_video_for_llm_analysis_async(video_id, transcript_text, transcript_fetch_result.get("segments"))
+    return {**transcript_fetch_result, "analysis": analysis_results}
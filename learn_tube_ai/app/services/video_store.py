@@ -0,0 +1,142 @@
+# learn_tube_ai/app/services/video_store.py
+import logging
+from typing import Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Video, TranscriptSegment, AnalysisChunk
+from app.observability import span
+from .search_service import index_video
+from .payload_cache import store_payloads
+from .transcript_languages import transcript_languages
+
+logger = logging.getLogger(__name__)
+
+
+def build_video_response(video_obj: Video, message: str, analysis: Optional[dict] = None) -> dict:
+    """
+    Builds the JSON payload returned by the video endpoints for a stored Video.
+    If `analysis` is given it is returned as-is, otherwise it is read from the row.
+    """
+    if analysis is None:
+        analysis = {
+            "table_of_contents": video_obj.table_of_contents or [],
+            "key_terms": video_obj.key_terms or [],
+            "logical_flow": video_obj.logical_flow or "Analysis previously cached.",
+            "summary": video_obj.summary or "Summary previously cached."
+        }
+    return {
+        "message": message,
+        "video_id": video_obj.video_id,
+        "video_url": video_obj.video_url,
+        "title": video_obj.title or f"Video: {video_obj.video_id}",
+        "language": video_obj.language,
+        "translated_from": video_obj.translated_from,
+        "transcript_text": video_obj.transcript_text or "",
+        "segments": video_obj.transcript_segments or [],
+        "analysis": analysis
+    }
+
+
+def build_unsaved_video_response(video_id: str, video_url: str, fetch_result: dict, analysis: dict, analysis_problem: str) -> dict:
+    """
+    Payload of build_video_response for a fetched transcript whose LLM analysis was skipped or failed
+    (see analysis_error). Nothing is stored, so the next request processes the video again.
+    """
+    return {
+        "message": "Transcript retrieved, but the analysis did not complete and was not saved.",
+        "video_id": video_id,
+        "video_url": video_url,
+        "title": f"Video: {video_id}",
+        "language": fetch_result.get("language"),
+        "translated_from": fetch_result.get("translated_from"),
+        "transcript_text": fetch_result.get("text") or "",
+        "segments": fetch_result.get("segments") or [],
+        "analysis": analysis,
+        "analysis_error": analysis_problem,
+    }
+
+
+def save_video_results(video_id: str, video_url: str, transcript_text: str, transcript_segments: Optional[list],
+                       analysis_results: dict, title: Optional[str] = None, commit: bool = True,
+                       analysis_chunks: Optional[list] = None, language: Optional[str] = None,
+                       translated_from: Optional[str] = None) -> Video:
+    """
+    Creates or updates the Video row for (`video_id`, `language`) with a transcript and its LLM analysis.
+    `language` defaults to the first language of the TRANSCRIPT_LANGUAGES chain; `translated_from` is the
+    source language of a translated transcript.
+    With commit=False the write is flushed inside a SAVEPOINT so callers can batch several
+    videos into one transaction.
+    If another worker inserted the same (video_id, language) concurrently, the unique constraint rejects our
+    INSERT; in that case we roll back and update the row that won the race instead.
+    Raises on other database errors; the caller is responsible for rolling back.
+    `analysis_chunks` (rows from incremental_analysis) replaces the stored per-chunk analyses; None leaves them as they are.
+    """
+    args = (video_id, language or transcript_languages.default_language, translated_from, video_url,
+            transcript_text, transcript_segments, analysis_results, title, analysis_chunks)
+    try:
+        return _apply_video_results(args, commit)
+    except IntegrityError:
+        if commit:
+            db.session.rollback()
+        logger.warning("Concurrent insert detected for %s. Retrying as update.", video_id)
+        return _apply_video_results(args, commit)
+
+
+def _apply_video_results(args, commit):
+    if commit:
+        with span("db_write"):
+            video_obj = _write_video_results(*args)
+        with span("db_commit"):
+            db.session.commit()
+        return video_obj
+    with span("db_write"), db.session.begin_nested():
+        return _write_video_results(*args)
+
+
+def _write_video_results(video_id, language, translated_from, video_url, transcript_text, transcript_segments, analysis_results, title, analysis_chunks):
+    video_obj = Video.query.filter_by(video_id=video_id, language=language).first()
+    if not video_obj:
+        video_obj = Video(video_id=video_id, language=language, video_url=video_url)
+        db.session.add(video_obj)
+    video_obj.translated_from = translated_from
+    video_obj.title = title or video_obj.title or f"Video: {video_id}"
+    video_obj.transcript_text = transcript_text
+    video_obj.transcript_segments = transcript_segments
+    video_obj.table_of_contents = analysis_results.get("table_of_contents")
+    video_obj.key_terms = analysis_results.get("key_terms")
+    video_obj.logical_flow = analysis_results.get("logical_flow")
+    video_obj.summary = analysis_results.get("summary")
+    db.session.flush() # assigns video_obj.id for new rows
+    replace_transcript_segments(video_obj, transcript_segments)
+    if analysis_chunks is not None:
+        replace_analysis_chunks(video_obj, analysis_chunks)
+    index_video(video_obj) # keep the full-text index in the same transaction as the row
+    store_payloads(video_obj) # pre-rendered cache-hit responses, likewise
+    return video_obj
+
+
+def replace_transcript_segments(video_obj: Video, transcript_segments: Optional[list]):
+    """Rewrites the normalized transcript_segment rows for a (flushed) video with one DELETE and one bulk INSERT."""
+    db.session.execute(delete(TranscriptSegment).where(TranscriptSegment.video_pk == video_obj.id))
+    rows = [
+        {
+            "video_pk": video_obj.id,
+            "ordinal": ordinal,
+            "start": float(segment.get("start") or 0.0),
+            "duration": float(segment.get("duration") or 0.0),
+            "text": segment.get("text") or "",
+        }
+        for ordinal, segment in enumerate(transcript_segments or [])
+    ]
+    if rows:
+        db.session.execute(insert(TranscriptSegment), rows)
+
+
+def replace_analysis_chunks(video_obj: Video, analysis_chunks: list):
+    """Rewrites the analysis_chunk rows for a (flushed) video."""
+    db.session.execute(delete(AnalysisChunk).where(AnalysisChunk.video_pk == video_obj.id))
+    if analysis_chunks:
+        db.session.execute(insert(AnalysisChunk), [{**chunk, "video_pk": video_obj.id} for chunk in analysis_chunks])
@@ -0,0 +1,199 @@
+# learn_tube_ai/app/services/youtube_fetcher.py
+# Shared, rate-limited, retrying access to YouTube transcripts. requests and youtube-transcript-api are
+# imported on the first YouTube call, not when the app starts.
+import logging
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from .rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class YouTubeThrottledError(Exception):
+    """YouTube is rate-limiting us (429/blocked) and retries were exhausted, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive throttling/server failures and fails fast for
+    `reset_timeout` seconds. After that a single trial call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("Circuit breaker OPEN for %ss after %s failures.", self.reset_timeout, self._failures)
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+_STATUS_CODE_PATTERN = re.compile(r"\b([45]\d\d)\b")
+
+
+def _http_status_of(error: Exception) -> Optional[int]:
+    """Best-effort HTTP status code of a YouTubeRequestFailed (the library only keeps the HTTPError message)."""
+    match = _STATUS_CODE_PATTERN.search(getattr(error, "reason", "") or str(error))
+    return int(match.group(1)) if match else None
+
+
+class YouTubeFetcher:
+    """
+    Wraps youtube-transcript-api with:
+      - one pooled keep-alive HTTPAdapter shared by all threads (per-thread Sessions, since the
+        library mutates session cookies/headers),
+      - a default request timeout,
+      - a token-bucket rate limit on YouTube calls,
+      - exponential backoff with full jitter on 429/blocked/5xx/network errors,
+      - a circuit breaker that fails fast while YouTube keeps throttling us.
+    """
+
+    def __init__(self, timeout: float = 10.0, pool_size: int = 10, rate_per_second: Optional[float] = 2.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 breaker_threshold: int = 5, breaker_reset_seconds: float = 60.0, base_url: Optional[str] = None):
+        self.configure(timeout=timeout, pool_size=pool_size, rate_per_second=rate_per_second, max_retries=max_retries,
+                       backoff_base=backoff_base, backoff_max=backoff_max, breaker_threshold=breaker_threshold,
+                       breaker_reset_seconds=breaker_reset_seconds, base_url=base_url)
+
+    def configure(self, timeout, pool_size, rate_per_second, max_retries, backoff_base, backoff_max,
+                  breaker_threshold, breaker_reset_seconds, base_url):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = TokenBucket(rate_per_second) if rate_per_second else None
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset_seconds)
+        self._adapter_settings = {"timeout": timeout, "base_url": base_url, "pool_size": pool_size}
+        self._adapter = None # built on first use (see _api)
+        self._adapter_lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = getattr(self, "_generation", 0) + 1 # invalidates per-thread clients after reconfiguring
+
+    def init_app(self, app):
+        self.configure(
+            timeout=app.config.get("YOUTUBE_TIMEOUT", 10.0),
+            pool_size=app.config.get("YOUTUBE_POOL_SIZE", 10),
+            rate_per_second=app.config.get("YOUTUBE_RATE_PER_SECOND", 2.0),
+            max_retries=app.config.get("YOUTUBE_MAX_RETRIES", 3),
+            backoff_base=app.config.get("YOUTUBE_BACKOFF_BASE", 0.5),
+            backoff_max=app.config.get("YOUTUBE_BACKOFF_MAX", 8.0),
+            breaker_threshold=app.config.get("YOUTUBE_BREAKER_THRESHOLD", 5),
+            breaker_reset_seconds=app.config.get("YOUTUBE_BREAKER_RESET_SECONDS", 60.0),
+            base_url=app.config.get("YOUTUBE_BASE_URL"),
+        )
+        app.extensions["youtube_fetcher"] = self
+
+    @property
+    def adapter(self):
+        """The pooled HTTPAdapter shared by all threads' sessions."""
+        if self._adapter is None:
+            with self._adapter_lock:
+                if self._adapter is None:
+                    from .youtube_http import PooledHTTPAdapter
+                    settings = self._adapter_settings
+                    self._adapter = PooledHTTPAdapter(timeout=settings["timeout"], base_url=settings["base_url"],
+                                                      pool_connections=settings["pool_size"], pool_maxsize=settings["pool_size"], pool_block=True)
+        return self._adapter
+
+    def _api(self):
+        if getattr(self._local, "generation", None) != self._generation:
+            import requests
+            from youtube_transcript_api import YouTubeTranscriptApi
+            session = requests.Session()
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+            self._local.api = YouTubeTranscriptApi(http_client=session)
+            self._local.generation = self._generation
+        return self._local.api
+
+    @staticmethod
+    def _classify(error: Exception) -> Optional[str]:
+        """'throttled', 'transient' or None (not worth retrying, e.g. transcripts disabled)."""
+        import requests # both already loaded by the call that raised
+        from youtube_transcript_api import RequestBlocked, YouTubeRequestFailed
+        if isinstance(error, RequestBlocked):
+            return "throttled"
+        if isinstance(error, YouTubeRequestFailed):
+            status = _http_status_of(error)
+            if status == 429:
+                return "throttled"
+            if status is not None and status >= 500:
+                return "transient"
+            return None
+        if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return "transient"
+        return None
+
+    def _call(self, video_id: str, operation: Callable):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise YouTubeThrottledError(f"YouTube requests are paused for {self.breaker.retry_after():.0f}s after repeated throttling.")
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                result = operation()
+            except Exception as e:
+                kind = self._classify(e)
+                if kind is None:
+                    self.breaker.record_success() # YouTube answered; the failure is about this video
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    if kind == "throttled":
+                        raise YouTubeThrottledError(f"YouTube is rate-limiting requests (gave up after {attempt + 1} attempts).") from e
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                logger.warning("%s error for %s (%s); retry %s/%s in %.2fs.", kind, video_id, type(e).__name__, attempt + 1, self.max_retries, delay)
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def list_transcripts(self, video_id: str):
+        return self._call(video_id, lambda: self._api().list(video_id))
+
+    def fetch_transcript(self, transcript):
+        """Fetches a Transcript object obtained from list_transcripts() (retried like any other call)."""
+        return self._call(transcript.video_id, transcript.fetch)
+
+
+youtube_fetcher = YouTubeFetcher()
@@ -0,0 +1,28 @@
+# learn_tube_ai/app/services/youtube_http.py
+# The HTTP transport of youtube_fetcher. Kept apart so that requests is only imported once the fetcher
+# makes its first call.
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from requests.adapters import HTTPAdapter
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with a default timeout and an optional base URL rewrite.
+    With `base_url` set, every request is sent to that scheme/host instead of YouTube's,
+    which lets the fetcher run against a local stub server.
+    """
+
+    def __init__(self, timeout: float = 10.0, base_url: Optional[str] = None, **kwargs):
+        self.timeout = timeout
+        self.base_url = urlsplit(base_url) if base_url else None
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if self.base_url:
+            parts = urlsplit(request.url)
+            request.url = urlunsplit((self.base_url.scheme, self.base_url.netloc, parts.path, parts.query, parts.fragment))
+        return super().send(request, **kwargs)
@@ -0,0 +1,18 @@
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.routing import Mount
+
+from app import create_app
+from app.async_views import build_async_routes
+
+# ASGI entry point: the async views (streaming, LLM-bound endpoints) run on the event loop,
+# every other path is served by the regular Flask app.
+#   uvicorn asgi:app --port 5000
+flask_app = create_app()
+
+app = Starlette(
+    routes=build_async_routes(flask_app) + [Mount('/', app=WSGIMiddleware(flask_app))],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+)
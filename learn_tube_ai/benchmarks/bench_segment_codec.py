@@ -0,0 +1,82 @@
+# learn_tube_ai/benchmarks/bench_segment_codec.py
+# Storage size, decode time and peak decode memory of transcript segments stored as JSON text (the old
+# video.transcript_segments column) versus the binary columnar format of app/services/segment_codec.py.
+# Decode times include reading the value back from an SQLite table, like a cached read does.
+#
+#   python benchmarks/bench_segment_codec.py --segments 1000 10000 100000 --repeat 5
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.segment_codec import decode_columns, decode_segments, encode_segments, zstandard # noqa: E402
+
+
+def synthetic_segments(count: int) -> list:
+    """YouTube-like segments: ~4s apart, millisecond timestamps, 40-80 characters of text."""
+    return [{"text": f"and this is where the gradient of segment {i} points {'downhill ' * (i % 5)}".strip(),
+             "start": round(i * 3.917, 3), "duration": round(3.5 + (i % 7) * 0.113, 3)} for i in range(count)]
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(count: int, repeat: int) -> list:
+    segments = synthetic_segments(count)
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE video (id INTEGER PRIMARY KEY, value)")
+    variants = [("json", json.dumps(segments), json.loads)]
+    for compression in ("none", "zlib", "zstd"):
+        if compression == "zstd" and zstandard is None:
+            continue
+        variants.append((f"packed/{compression}", encode_segments(segments, compression), decode_segments))
+    variants.append(("packed/columns", encode_segments(segments, "none"), decode_columns)) # no per-segment dicts
+
+    lines = []
+    for row_id, (name, stored, decode) in enumerate(variants):
+        db.execute("INSERT INTO video (id, value) VALUES (?, ?)", (row_id, stored))
+
+        def read(row_id=row_id, decode=decode):
+            return decode(db.execute("SELECT value FROM video WHERE id = ?", (row_id,)).fetchone()[0])
+
+        if name != "packed/columns":
+            assert read() == (segments if name == "json" else [{**s, "duration": float(s["duration"]), "start": float(s["start"])} for s in segments])
+        size = len(stored.encode("utf-8")) if isinstance(stored, str) else len(stored)
+        seconds = _best_of(repeat, read)
+        peak = _peak_bytes(read)
+        lines.append(f"{count:>8} segs  {name:<15} size {size / 1024:9.1f}KiB  decode {seconds * 1000:8.2f}ms  peak {peak / 2**20:7.2f}MiB")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for count in args.segments:
+        for line in bench(count, args.repeat):
+            print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# learn_tube_ai/benchmarks/bench_sync_vs_async.py
+# Concurrent-request throughput of the sync (Flask/WSGI) and async (asgi.py) paths against the mock LLM client.
+# The sync path models one worker with --threads request threads; the async path is one event loop.
+# All requests are issued at once; latency is measured from that moment, so it includes queueing.
+#
+#   python benchmarks/bench_sync_vs_async.py --requests 200 --threads 8 --endpoint /api/process_custom_text
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+os.environ["LLM_CACHE_SQLITE_PATH"] = "" # every request is a cache miss anyway (unique texts); keep it in memory
+os.environ["LLM_PROVIDER"] = "mock"
+# The LLM gate would otherwise cap both paths at the same in-flight limit; override from the environment to include it.
+os.environ.setdefault("LLM_MAX_IN_FLIGHT", "1000")
+os.environ.setdefault("LLM_QUEUE_MAX_WAIT", "300")
+
+import httpx # noqa: E402
+
+from asgi import app as asgi_app, flask_app # noqa: E402
+
+
+def _payload(endpoint: str) -> dict:
+    text = f"benchmark text {uuid.uuid4().hex} " * 20 # unique, so the LLM cache never short-circuits
+    if endpoint == "/api/explain_text":
+        return {"selected_text": text}
+    return {"custom_text": text, "title": "bench"}
+
+
+def _summary(name: str, latencies: list, elapsed: float, errors: int) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    return (f"{name:>5}: {len(latencies) / elapsed:7.1f} req/s  p50={statistics.median(latencies) * 1000:7.1f}ms  "
+            f"p95={p95 * 1000:7.1f}ms  wall={elapsed:.2f}s  errors={errors}")
+
+
+def run_sync(endpoint: str, requests: int, threads: int) -> str:
+    client = flask_app.test_client()
+    started = time.perf_counter()
+
+    def one(_):
+        response = client.post(endpoint, json=_payload(endpoint))
+        return time.perf_counter() - started, response.status_code # includes time queued for a free thread
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    return _summary("sync", [r[0] for r in results], elapsed, sum(1 for r in results if r[1] != 200))
+
+
+async def run_async(endpoint: str, requests: int) -> str:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+
+        async def one():
+            response = await client.post(endpoint, json=_payload(endpoint))
+            return time.perf_counter() - started, response.status_code
+
+        results = await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    return _summary("async", [r[0] for r in results], elapsed, sum(1 for r in results if r[1] != 200))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="concurrent requests per run")
+    parser.add_argument("--threads", type=int, default=8, help="request threads of the sync worker")
+    parser.add_argument("--endpoint", default="/api/process_custom_text", choices=["/api/process_custom_text", "/api/explain_text"])
+    args = parser.parse_args()
+
+    sync_line = run_sync(args.endpoint, args.requests, args.threads)
+    async_line = asyncio.run(run_async(args.endpoint, args.requests))
+    print(f"\n{args.requests} concurrent requests to {args.endpoint} (sync worker: {args.threads} threads)")
+    print(sync_line)
+    print(async_line)
+
+
+if __name__ == "__main__":
+    main()
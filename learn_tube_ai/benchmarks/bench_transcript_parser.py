@@ -0,0 +1,91 @@
+# learn_tube_ai/benchmarks/bench_transcript_parser.py
+# Throughput and peak memory of app/services/transcript_parser.py on synthetic transcripts.
+# Each format is parsed from an in-memory string (the JSON body path) and streamed from a file
+# (the multipart upload path); peak memory is measured with tracemalloc on a separate run.
+#
+#   python benchmarks/bench_transcript_parser.py --lines 1000 10000 100000 1000000 --formats youtube srt vtt
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.transcript_parser import iter_segments, parse_transcript # noqa: E402
+
+
+def _stamp(seconds: float, separator: str = ".") -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{int(seconds * 1000) % 1000:03d}"
+
+
+def synthetic_transcript(fmt: str, lines: int) -> str:
+    """About `lines` lines of transcript in `fmt`; cues are 0.25s apart so even 1M lines stays within two-digit hours."""
+    out = ["WEBVTT", ""] if fmt == "vtt" else []
+    index = 0
+    while len(out) < lines:
+        start, end = index * 0.25, index * 0.25 + 0.2
+        text = f"this is caption number {index} about gradient descent and learning rates"
+        if fmt == "youtube":
+            hours, remainder = divmod(int(start), 3600)
+            out += [f"{hours}:{remainder // 60:02d}:{remainder % 60:02d}" if hours else f"{remainder // 60}:{remainder % 60:02d}", text]
+        elif fmt == "srt":
+            out += [str(index + 1), f"{_stamp(start, ',')} --> {_stamp(end, ',')}", text, ""]
+        else:
+            out += [f"{_stamp(start)} --> {_stamp(end)} align:start position:0%", f"<c>{text}</c>", ""]
+        index += 1
+    return "\n".join(out)
+
+
+def _timed(fn) -> tuple:
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+
+def _peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _count_streamed(path: str, fmt: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in iter_segments(f, fmt))
+
+
+def bench(fmt: str, lines: int, directory: str) -> str:
+    text = synthetic_transcript(fmt, lines)
+    path = os.path.join(directory, f"{fmt}-{lines}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    string_seconds, segments = _timed(lambda: parse_transcript(text))
+    stream_seconds, streamed = _timed(lambda: _count_streamed(path, "auto"))
+    assert streamed == len(segments), (streamed, len(segments))
+    string_peak = _peak_bytes(lambda: parse_transcript(text))
+    stream_peak = _peak_bytes(lambda: _count_streamed(path, "auto"))
+    return (f"{fmt:>7} {lines:>9} lines  {len(segments):>8} segs  "
+            f"string {lines / string_seconds / 1e6:5.2f}M lines/s peak {string_peak / 2**20:7.1f}MiB  "
+            f"stream {lines / stream_seconds / 1e6:5.2f}M lines/s peak {stream_peak / 2**20:7.1f}MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--formats", nargs="+", default=["youtube", "srt", "vtt"], choices=["youtube", "srt", "vtt"])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in args.formats:
+            for lines in args.lines:
+                print(bench(fmt, lines, directory), flush=True)
+
+
+if __name__ == "__main__":
+    main()
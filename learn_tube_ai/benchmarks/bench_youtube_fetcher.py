@@ -0,0 +1,44 @@
+# learn_tube_ai/benchmarks/bench_youtube_fetcher.py
+# Throughput of get_youtube_transcript against the local YouTube stub (no network needed).
+#
+#   python benchmarks/bench_youtube_fetcher.py --videos 200 --concurrency 16 --latency 0.05 --throttle-rate 0.05
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.youtube_stub_server import StubProfile, start_stub_server # noqa: E402
+from app.services.youtube_fetcher import youtube_fetcher # noqa: E402
+from app.services.video_processing_service import get_youtube_transcript # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=0, help="fetcher rate limit (calls/s, 0 = unlimited)")
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+
+    server, base_url, stats = start_stub_server(StubProfile(latency=args.latency, throttle_rate=args.throttle_rate, segments=args.segments))
+    youtube_fetcher.configure(timeout=10, pool_size=args.pool_size, rate_per_second=args.rate or None, max_retries=3,
+                              backoff_base=0.05, backoff_max=1.0, breaker_threshold=50, breaker_reset_seconds=5, base_url=base_url)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(get_youtube_transcript, [f"stub{i:07d}" for i in range(args.videos)]))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    ok = sum(1 for result in results if not result["error"])
+    print(f"{args.videos} videos in {elapsed:.2f}s -> {args.videos / elapsed:.1f} videos/s; ok={ok} failed={args.videos - ok}; stub stats={stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# learn_tube_ai/benchmarks/import_budget.py
+# Startup import cost of the app, measured with `python -X importtime` in a fresh interpreter. Fails (exit
+# status 1) when the total exceeds --budget-ms or when a module that must be loaded lazily (transcript
+# fetcher, LLM SDK, embedding libraries) is imported at startup, so it can run as a CI check.
+#
+#   python benchmarks/import_budget.py --budget-ms 1500 --repeat 3
+#   python benchmarks/import_budget.py --command "import run"
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_COMMAND = "from app import create_app; create_app()"
+# Top-level packages that must not be imported until they are used.
+DEFAULT_FORBIDDEN = ("numpy", "requests", "youtube_transcript_api", "anthropic", "sentence_transformers", "torch")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def measure(command: str) -> list:
+    """(module, self_us, cumulative_us, depth) for every import made by `command` in a fresh interpreter."""
+    env = dict(os.environ)
+    env.pop("ANTHROPIC_API_KEY", None)
+    scratch = tempfile.mkdtemp()
+    env.update({
+        "LLM_PROVIDER": "mock",
+        "DATABASE_URL": "sqlite:///" + os.path.join(scratch, "import_budget.db"),
+        "EMBEDDING_DIR": os.path.join(scratch, "embeddings"),
+        "LLM_CACHE_SQLITE_PATH": "",
+        "LOG_LEVEL": "WARNING",
+    })
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", command], cwd=APP_DIR, env=env,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise SystemExit(f"`{command}` failed:\n{completed.stderr[-2000:]}")
+    imports = []
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            imports.append((match.group(4), int(match.group(1)), int(match.group(2)), (len(match.group(3)) - 1) // 2))
+    return imports
+
+
+def total_ms(imports: list) -> float:
+    return sum(cumulative for _, _, cumulative, depth in imports if depth == 0) / 1000
+
+
+def imported_by(imports: list, package: str):
+    """The top-level import that pulled in `package` (importtime lists children before their parent), or None."""
+    for index, (module, _, _, _) in enumerate(imports):
+        if module.split(".")[0] == package:
+            return next((parent for parent, _, _, depth in imports[index:] if depth == 0), module)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the app's startup import time against a budget.")
+    parser.add_argument("--command", default=DEFAULT_COMMAND, help="Python code to time (run from the app directory)")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", 1500)))
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to run; the fastest counts")
+    parser.add_argument("--forbid", nargs="*", default=list(DEFAULT_FORBIDDEN), help="packages that must not be imported")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    runs = [measure(args.command) for _ in range(max(args.repeat, 1))]
+    imports = min(runs, key=total_ms)
+    total = total_ms(imports)
+
+    print(f"{args.command}: {total:.1f}ms of imports (best of {len(runs)}, budget {args.budget_ms:.0f}ms)")
+    for module, _, cumulative, _ in sorted((i for i in imports if i[3] == 0), key=lambda i: -i[2])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {module}")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"import time {total:.1f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+    for package in args.forbid:
+        importer = imported_by(imports, package)
+        if importer:
+            failures.append(f"'{package}' is imported at startup (via {importer}); import it where it is used")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
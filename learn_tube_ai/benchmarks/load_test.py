@@ -0,0 +1,295 @@
+# learn_tube_ai/benchmarks/load_test.py
+# Load test of the /api/* endpoints with YouTube and the LLM replaced by local stand-ins.
+# Boots create_app() on a temp SQLite DB (migrated to head) behind a threaded local HTTP server, points
+# the YouTube fetcher at benchmarks/youtube_stub_server.py and uses the mock LLM provider, both with
+# configurable latency / error profiles. Each scenario is driven by --concurrency client threads
+# (closed loop: a thread sends its next request when the previous one finished) and reports throughput
+# and p50/p95/p99 latency. Miss scenarios run first and fill the database / LLM cache that the
+# matching hit scenarios then read.
+#
+# Results go to a JSON file (default: benchmarks/results/load_test-<commit>-<time>.json); pass an
+# earlier file as --baseline to print the change per scenario and fail on p95 regressions.
+#
+#   python benchmarks/load_test.py --requests 100 --concurrency 8 --llm-latency 0.5 --youtube-latency 0.05
+#   python benchmarks/load_test.py --scenarios process_video_miss process_video_hit --baseline benchmarks/results/old.json
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests # noqa: E402
+
+from benchmarks.youtube_stub_server import StubProfile, start_stub_server # noqa: E402
+
+EXPLAIN_SELECTION = "stub sentence 3 about topic 3" # text the stub puts into every transcript
+
+
+def _percentile(ordered: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _custom_text(seed: str) -> str:
+    return " ".join(f"Sentence {i} of load test text {seed} explains gradient descent step {i}." for i in range(40))
+
+
+class LoadTest:
+    """One booted app + stub server; `run(scenario)` drives a scenario and returns its result dict."""
+
+    def __init__(self, base_url: str, requests_per_scenario: int, concurrency: int, poll_interval: float, timeout: float):
+        self.base_url = base_url
+        self.requests = requests_per_scenario
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.run_id = uuid.uuid4().hex[:4]
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        # One keep-alive session per client thread.
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def video_url(self, i: int, group: str) -> str:
+        return f"https://www.youtube.com/watch?v=lt{group}{self.run_id}{i:05d}"
+
+    def video_id(self, i: int, group: str) -> str:
+        return f"lt{group}{self.run_id}{i:05d}"
+
+    # --- one request per scenario; each returns the final HTTP status ("ok" means < 400) ---
+
+    def process_video(self, i: int) -> int:
+        response = self.session.post(f"{self.base_url}/api/process_video", json={"video_url": self.video_url(i, "p")}, timeout=self.timeout)
+        if response.status_code != 202:
+            return response.status_code
+        # Cache miss: the work runs on the job queue; the latency that matters is until the job is done.
+        status_url = self.base_url + response.json()["status_url"]
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            time.sleep(self.poll_interval)
+            job = self.session.get(status_url, timeout=self.timeout).json()
+            if job.get("status") in ("done", "failed"):
+                return job.get("result_status") or 500
+        return 504
+
+    def video_detail(self, i: int) -> int:
+        return self.session.get(f"{self.base_url}/api/videos/{self.video_id(i, 'p')}", timeout=self.timeout).status_code
+
+    def process_video_stream(self, i: int) -> int:
+        response = self.session.get(f"{self.base_url}/api/process_video/stream", params={"video_url": self.video_url(i, "s")}, timeout=self.timeout)
+        if response.status_code >= 400:
+            return response.status_code
+        return response.status_code if "event: done" in response.text else 502 # the stream ended with an 'error' event
+
+    def process_custom_text(self, i: int) -> int:
+        return self.session.post(f"{self.base_url}/api/process_custom_text", json={"custom_text": _custom_text(f"{self.run_id}-{i}"), "title": "load test"},
+                                 timeout=self.timeout).status_code
+
+    def explain_text(self, i: int) -> int:
+        return self.session.post(f"{self.base_url}/api/explain_text", json={"selected_text": EXPLAIN_SELECTION, "video_id": self.video_id(i, "p")},
+                                 timeout=self.timeout).status_code
+
+    def search(self, i: int) -> int:
+        return self.session.get(f"{self.base_url}/api/search", params={"q": f"topic {i % 13}"}, timeout=self.timeout).status_code
+
+    def retrieve(self, i: int) -> int:
+        return self.session.get(f"{self.base_url}/api/videos/{self.video_id(i, 'p')}/retrieve", params={"q": f"topic {i % 13}"},
+                                timeout=self.timeout).status_code
+
+    def run(self, name: str) -> dict:
+        endpoint, path, method = SCENARIOS[name]
+        one = getattr(self, method)
+
+        def timed(i: int):
+            started = time.perf_counter()
+            try:
+                status = one(i)
+            except requests.RequestException:
+                status = 599 # connection error / client timeout
+            return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(timed, range(self.requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds for seconds, _ in results)
+        status_counts = {}
+        for _, status in results:
+            status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+        return {
+            "scenario": name,
+            "endpoint": endpoint,
+            "path": path,
+            "requests": len(results),
+            "concurrency": self.concurrency,
+            "errors": sum(1 for _, status in results if status >= 400),
+            "status_counts": status_counts,
+            "wall_seconds": round(elapsed, 4),
+            "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 50) * 1000, 2),
+                "p95": round(_percentile(latencies, 95) * 1000, 2),
+                "p99": round(_percentile(latencies, 99) * 1000, 2),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+        }
+
+
+# name -> (endpoint, path, LoadTest method). Order matters: a hit scenario reads what its miss scenario stored.
+SCENARIOS = {
+    "process_video_miss": ("POST /api/process_video", "miss", "process_video"),
+    "process_video_hit": ("POST /api/process_video", "hit", "process_video"),
+    "video_detail_hit": ("GET /api/videos/<video_id>", "hit", "video_detail"),
+    "process_video_stream_miss": ("GET /api/process_video/stream", "miss", "process_video_stream"),
+    "process_video_stream_hit": ("GET /api/process_video/stream", "hit", "process_video_stream"),
+    "process_custom_text_miss": ("POST /api/process_custom_text", "miss", "process_custom_text"),
+    "process_custom_text_hit": ("POST /api/process_custom_text", "hit", "process_custom_text"),
+    "explain_text": ("POST /api/explain_text", "llm", "explain_text"),
+    "search": ("GET /api/search", "db", "search"),
+    "retrieve": ("GET /api/videos/<video_id>/retrieve", "db", "retrieve"),
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def boot_app(args, work_dir: str):
+    """Configures the environment, migrates a fresh DB and serves create_app() locally. Returns (server, stub_server, base_url, stub_stats)."""
+    stub, stub_url, stub_stats = start_stub_server(StubProfile(latency=args.youtube_latency, jitter=args.youtube_jitter,
+                                                               throttle_rate=args.youtube_throttle_rate,
+                                                               server_error_rate=args.youtube_error_rate, segments=args.segments))
+    os.environ.update({
+        "DATABASE_URL": "sqlite:///" + os.path.join(work_dir, "load_test.db"),
+        "EMBEDDING_DIR": os.path.join(work_dir, "embeddings"),
+        "LLM_CACHE_SQLITE_PATH": "", # in-memory LRU only, so every run starts cold
+        "LLM_PROVIDER": "mock",
+        "LLM_MOCK_LATENCY": str(args.llm_latency),
+        "LLM_MOCK_JITTER": str(args.llm_jitter),
+        "LLM_MOCK_ERROR_RATE": str(args.llm_error_rate),
+        "YOUTUBE_BASE_URL": stub_url,
+        "YOUTUBE_RATE_PER_SECOND": str(args.youtube_rate),
+        "YOUTUBE_BACKOFF_BASE": "0.05",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    os.environ.pop("ANTHROPIC_API_KEY", None) # never call the real API from a benchmark
+
+    # Imported only now: create_app reads the settings above from the environment (a few, like LLM chunking, at import time).
+    from flask_migrate import upgrade
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, "migrations"))
+    logging.getLogger("werkzeug").setLevel(logging.WARNING) # no access log line per request (alembic's logging config enables it)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True, name="load-test-server").start()
+    return server, stub, f"http://127.0.0.1:{server.server_port}", stub_stats
+
+
+def compare(results: list, baseline_path: str, max_regression: float) -> bool:
+    """Prints the change against `baseline_path` per scenario; False if any p95 got worse by more than `max_regression`."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {entry["scenario"]: entry for entry in baseline["results"]}
+    print(f"\nvs {baseline_path} (commit {baseline['meta'].get('commit')})")
+    ok = True
+    for entry in results:
+        before = previous.get(entry["scenario"])
+        if before is None:
+            continue
+        deltas = {}
+        for key in ("p50", "p95", "p99"):
+            old = before["latency_ms"][key]
+            deltas[key] = (entry["latency_ms"][key] - old) / old if old else 0.0
+        regressed = deltas["p95"] > max_regression
+        ok = ok and not regressed
+        print(f"{entry['scenario']:<28} " + "  ".join(f"{key} {value:+7.1%}" for key, value in deltas.items())
+              + f"  rps {entry['throughput_rps']:8.1f} (was {before['throughput_rps']:.1f})" + ("  REGRESSION" if regressed else ""))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the /api endpoints against local YouTube/LLM stand-ins.")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads per scenario")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per request (process_video: until the job is done)")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="seconds between job status polls")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mock LLM seconds per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="extra random seconds per LLM call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--youtube-latency", type=float, default=0.05, help="stub seconds per YouTube request")
+    parser.add_argument("--youtube-jitter", type=float, default=0.0)
+    parser.add_argument("--youtube-throttle-rate", type=float, default=0.0, help="fraction of stub requests answered with 429")
+    parser.add_argument("--youtube-error-rate", type=float, default=0.0, help="fraction of stub requests answered with 503")
+    parser.add_argument("--youtube-rate", type=float, default=0, help="fetcher rate limit in calls/s (0 = unlimited)")
+    parser.add_argument("--segments", type=int, default=200, help="segments per stub transcript")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/load_test-<commit>-<time>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative p95 increase vs --baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        server, stub, base_url, stub_stats = boot_app(args, work_dir)
+        load_test = LoadTest(base_url, args.requests, args.concurrency, args.poll_interval, args.timeout)
+        results = []
+        try:
+            for name in [name for name in SCENARIOS if name in args.scenarios]:
+                result = load_test.run(name)
+                results.append(result)
+                latency = result["latency_ms"]
+                print(f"{name:<28} {result['throughput_rps']:8.1f} req/s  p50={latency['p50']:8.1f}ms  p95={latency['p95']:8.1f}ms  "
+                      f"p99={latency['p99']:8.1f}ms  errors={result['errors']}", flush=True)
+        finally:
+            server.shutdown()
+            stub.shutdown()
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "youtube_stub": stub_stats,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"load_test-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
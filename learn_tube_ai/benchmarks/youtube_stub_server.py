@@ -0,0 +1,121 @@
+# learn_tube_ai/benchmarks/youtube_stub_server.py
+# A local stand-in for the two YouTube endpoints youtube-transcript-api talks to
+# (the watch page and the timedtext XML), with configurable latency and error rates.
+#
+# Run standalone:   python benchmarks/youtube_stub_server.py --port 8765 --latency 0.2 --throttle-rate 0.1
+# Point the app at it:   YOUTUBE_BASE_URL=http://127.0.0.1:8765
+import argparse
+import json
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class StubProfile:
+    """Latency/error profile of the stub. `latency` is seconds per request (+/- `jitter`)."""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 server_error_rate: float = 0.0, segments: int = 200, languages=("en",)):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.server_error_rate = server_error_rate
+        self.segments = segments
+        self.languages = list(languages)
+
+
+def _watch_page(video_id: str, profile: StubProfile) -> str:
+    caption_tracks = [
+        {
+            "baseUrl": f"https://www.youtube.com/api/timedtext?v={video_id}&lang={lang}",
+            "name": {"simpleText": f"Stub ({lang})"},
+            "languageCode": lang,
+            "kind": "asr",
+            "isTranslatable": True,
+        }
+        for lang in profile.languages
+    ]
+    player_response = {
+        "playabilityStatus": {"status": "OK"},
+        "captions": {"playerCaptionsTracklistRenderer": {
+            "captionTracks": caption_tracks,
+            "translationLanguages": [{"languageCode": code, "languageName": {"simpleText": code}} for code in ("en", "de", "es", "fr")],
+        }},
+    }
+    return f"<html><body><script>var ytInitialPlayerResponse = {json.dumps(player_response)};</script></body></html>"
+
+
+def _timedtext(video_id: str, lang: str, profile: StubProfile) -> str:
+    lines = [
+        f'<text start="{i * 4.0:.1f}" dur="4.0">{escape(f"[{lang}] {video_id} stub sentence {i} about topic {i % 13}")}</text>'
+        for i in range(profile.segments)
+    ]
+    return '<?xml version="1.0" encoding="utf-8" ?><transcript>' + "".join(lines) + "</transcript>"
+
+
+def make_handler(profile: StubProfile, stats: dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive, like YouTube
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8"):
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            stats["requests"] = stats.get("requests", 0) + 1
+            time.sleep(max(0.0, profile.latency + random.uniform(-profile.jitter, profile.jitter)))
+            roll = random.random()
+            if roll < profile.throttle_rate:
+                stats["throttled"] = stats.get("throttled", 0) + 1
+                return self._send(429, "Too Many Requests")
+            if roll < profile.throttle_rate + profile.server_error_rate:
+                stats["errors"] = stats.get("errors", 0) + 1
+                return self._send(503, "Service Unavailable")
+
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            video_id = (query.get("v") or [""])[0]
+            if url.path == "/watch":
+                return self._send(200, _watch_page(video_id, profile))
+            if url.path == "/api/timedtext":
+                lang = (query.get("tlang") or query.get("lang") or ["en"])[0]
+                return self._send(200, _timedtext(video_id, lang, profile), "text/xml; charset=utf-8")
+            return self._send(404, "Not Found")
+
+    return Handler
+
+
+def start_stub_server(profile: StubProfile = None, host: str = "127.0.0.1", port: int = 0):
+    """Starts the stub in a daemon thread. Returns (server, base_url, stats); call server.shutdown() to stop."""
+    profile = profile or StubProfile()
+    stats = {}
+    server = ThreadingHTTPServer((host, port), make_handler(profile, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="youtube-stub").start()
+    return server, f"http://{host}:{server.server_address[1]}", stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--segments", type=int, default=200)
+    args = parser.parse_args()
+    stub_profile = StubProfile(args.latency, args.jitter, args.throttle_rate, args.server_error_rate, args.segments)
+    stub_server = ThreadingHTTPServer((args.host, args.port), make_handler(stub_profile, {}))
+    print(f"YouTube stub listening on http://{args.host}:{args.port}")
+    stub_server.serve_forever()
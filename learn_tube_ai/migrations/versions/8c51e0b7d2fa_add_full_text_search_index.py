@@ -0,0 +1,87 @@
+"""Add full-text search index over transcripts and analyses
+
+Revision ID: 8c51e0b7d2fa
+Revises: 3f9a1c2d7b44
+Create Date: 2025-06-09 20:47:03.511920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c51e0b7d2fa'
+down_revision = '3f9a1c2d7b44'
+branch_labels = None
+depends_on = None
+
+# Must match app/services/search_service.py
+SQLITE_ROWID_BLOCK = 1000000
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE transcript_fts USING fts5(video_id UNINDEXED, start UNINDEXED, kind UNINDEXED, text)")
+        # Backfill existing videos: segments first, then summary and key terms at the end of each video's rowid block.
+        op.execute(f"""
+            INSERT INTO transcript_fts (rowid, video_id, start, kind, text)
+            SELECT v.id * {SQLITE_ROWID_BLOCK} + CAST(j.key AS INTEGER), v.video_id, json_extract(j.value, '$.start'), 'segment', json_extract(j.value, '$.text')
+            FROM video AS v, json_each(v.transcript_segments) AS j
+            WHERE v.transcript_segments IS NOT NULL AND coalesce(json_extract(j.value, '$.text'), '') != ''
+        """)
+        op.execute(f"""
+            INSERT INTO transcript_fts (rowid, video_id, start, kind, text)
+            SELECT v.id * {SQLITE_ROWID_BLOCK} + {SQLITE_ROWID_BLOCK - 2}, v.video_id, NULL, 'summary', v.summary
+            FROM video AS v WHERE coalesce(v.summary, '') != ''
+        """)
+        op.execute(f"""
+            INSERT INTO transcript_fts (rowid, video_id, start, kind, text)
+            SELECT v.id * {SQLITE_ROWID_BLOCK} + {SQLITE_ROWID_BLOCK - 1}, v.video_id, NULL, 'key_terms',
+                   group_concat(coalesce(json_extract(j.value, '$.term'), '') || ': ' || coalesce(json_extract(j.value, '$.definition'), ''), ' ')
+            FROM video AS v, json_each(v.key_terms) AS j
+            WHERE v.key_terms IS NOT NULL
+            GROUP BY v.id
+        """)
+    elif dialect == 'postgresql':
+        op.create_table('transcript_search',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.String(length=20), nullable=False),
+        sa.Column('start', sa.Float(), nullable=True),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('tsv', postgresql.TSVECTOR(), sa.Computed("to_tsvector('english', text)", persisted=True)),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_transcript_search_video_id', 'transcript_search', ['video_id'])
+        op.create_index('ix_transcript_search_tsv', 'transcript_search', ['tsv'], postgresql_using='gin')
+        op.execute("""
+            INSERT INTO transcript_search (video_id, start, kind, text)
+            SELECT v.video_id, (seg.value->>'start')::float, 'segment', seg.value->>'text'
+            FROM video AS v, jsonb_array_elements(v.transcript_segments::jsonb) WITH ORDINALITY AS seg(value, ordinal)
+            WHERE v.transcript_segments IS NOT NULL AND coalesce(seg.value->>'text', '') != ''
+            ORDER BY v.id, seg.ordinal
+        """)
+        op.execute("""
+            INSERT INTO transcript_search (video_id, start, kind, text)
+            SELECT v.video_id, NULL, 'summary', v.summary FROM video AS v WHERE coalesce(v.summary, '') != ''
+        """)
+        op.execute("""
+            INSERT INTO transcript_search (video_id, start, kind, text)
+            SELECT v.video_id, NULL, 'key_terms',
+                   string_agg(coalesce(term.value->>'term', '') || ': ' || coalesce(term.value->>'definition', ''), ' ')
+            FROM video AS v, jsonb_array_elements(v.key_terms::jsonb) AS term(value)
+            WHERE v.key_terms IS NOT NULL
+            GROUP BY v.video_id
+        """)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS transcript_fts")
+    elif dialect == 'postgresql':
+        op.drop_index('ix_transcript_search_tsv', table_name='transcript_search')
+        op.drop_index('ix_transcript_search_video_id', table_name='transcript_search')
+        op.drop_table('transcript_search')
@@ -0,0 +1,59 @@
+"""Store video.transcript_segments in the binary columnar format
+
+Revision ID: 9e3b6a0c4d18
+Revises: 5b7e2c9d1f43
+Create Date: 2025-06-27 09:31:54.208733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.segment_codec import encode_segments, decode_segments
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b6a0c4d18'
+down_revision = '5b7e2c9d1f43'
+branch_labels = None
+depends_on = None
+
+CONVERT_BATCH_SIZE = 200 # videos per round trip; a long transcript is a few MB of JSON
+
+
+def _convert(source_column, target_column, convert):
+    """Copies every video's segments from `source_column` to `target_column`, a batch of videos at a time."""
+    video_table = sa.table('video', sa.column('id', sa.Integer), source_column, target_column)
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        videos = connection.execute(
+            sa.select(video_table.c.id, video_table.c[source_column.name])
+            .where(video_table.c.id > last_id, video_table.c[source_column.name].isnot(None))
+            .order_by(video_table.c.id)
+            .limit(CONVERT_BATCH_SIZE)
+        ).all()
+        if not videos:
+            break
+        for video_pk, value in videos:
+            connection.execute(video_table.update().where(video_table.c.id == video_pk).values({target_column.name: convert(value)}))
+        last_id = videos[-1][0]
+
+
+def upgrade():
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('transcript_segments_bin', sa.LargeBinary(), nullable=True))
+
+    _convert(sa.column('transcript_segments', sa.JSON), sa.column('transcript_segments_bin', sa.LargeBinary), encode_segments)
+
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.drop_column('transcript_segments')
+
+
+def downgrade():
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('transcript_segments', sa.JSON(), nullable=True))
+
+    _convert(sa.column('transcript_segments_bin', sa.LargeBinary), sa.column('transcript_segments', sa.JSON), decode_segments)
+
+    with op.batch_alter_table('video', schema=None) as batch_op:
+        batch_op.drop_column('transcript_segments_bin')
@@ -0,0 +1,27 @@
+"""Drop video payloads stored with body-hash ETags
+
+Revision ID: f3a9c1d7e284
+Revises: e5d2b8c47a19
+Create Date: 2025-07-04 11:02:37.184406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c1d7e284'
+down_revision = 'e5d2b8c47a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Payloads now carry the same ETag as the regular route path (http_cache.video_etag). The stored ones
+    # have the sha1 of their body instead; they are re-rendered on each video's next cache hit.
+    op.execute(sa.text("DELETE FROM video_payload"))
+
+
+def downgrade():
+    # Nothing to restore: payloads are a cache and are rendered again on demand.
+    pass
@@ -0,0 +1,74 @@
+# learn_tube_ai/tests/conftest.py
+# `app` is a fresh application on a migrated SQLite database in a temp directory, with the mock LLM
+# (an ANTHROPIC_API_KEY from the environment is never used) and no background prefetching.
+# Tests marked `large` (benchmarks on 100k+ line inputs) only run with --run-large.
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-large", action="store_true", default=False, help="also run tests marked 'large'")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "large: slow benchmark on a large input; needs --run-large")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-large"):
+        return
+    skip_large = pytest.mark.skip(reason="large input; run with --run-large")
+    for item in items:
+        if "large" in item.keywords:
+            item.add_marker(skip_large)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    for name, value in {
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}",
+        "EMBEDDING_DIR": str(tmp_path / "embeddings"),
+        "LLM_CACHE_SQLITE_PATH": "",
+        "LLM_PROVIDER": "mock",
+        "LLM_MOCK_LATENCY": "0",
+        "LLM_MOCK_JITTER": "0",
+        "PREFETCH_ENABLED": "0",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        monkeypatch.setenv(name, value)
+    from flask_migrate import upgrade
+    from app import create_app, db
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, "migrations"))
+        db.session.remove()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def singleflight_joins(monkeypatch):
+    """Records every SingleFlight caller that found its key in flight and is about to wait for it."""
+    from app.services import singleflight
+    joins = []
+    debug = singleflight.logger.debug
+
+    def record(msg, *args, **kwargs):
+        if msg.startswith("Joining"):
+            joins.append(args)
+        debug(msg, *args, **kwargs)
+
+    monkeypatch.setattr(singleflight.logger, "debug", record)
+    return joins
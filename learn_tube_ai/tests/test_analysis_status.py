@@ -0,0 +1,42 @@
+# learn_tube_ai/tests/test_analysis_status.py
+# Failed or skipped LLM analyses must stay recognizable after normalizing and merging,
+# so they are never stored as (or written over) a real analysis.
+from app.services.llm_service import _failed_analysis, merge_chunk_analyses
+from app.services.video_processing_service import _normalize_analysis, analysis_error, analysis_succeeded
+
+CHUNKS = [{"index": 0, "start": 0.0, "end": 60.0}, {"index": 1, "start": 60.0, "end": 120.0}]
+GOOD = {"table_of_contents": [{"title": "Intro", "timestamp_seconds": 5}], "key_terms": [{"term": "cell"}],
+        "logical_flow": "Starts with cells.", "summary": "About cells."}
+
+
+def test_failed_llm_call_survives_normalize():
+    analysis = _normalize_analysis(_failed_analysis(RuntimeError("boom")))
+    assert not analysis_succeeded(analysis)
+    assert analysis_error(analysis) == "boom"
+
+
+def test_placeholders_without_error_key_are_failures():
+    # stored rows keep only the text fields
+    for logical_flow in ("LLM call failed: boom", "LLM analysis failed: boom", "LLM analysis skipped: API key not configured.",
+                         "LLM analysis not performed."):
+        assert not analysis_succeeded({"logical_flow": logical_flow})
+    assert not analysis_succeeded(None)
+
+
+def test_real_analysis_succeeds():
+    assert analysis_succeeded(_normalize_analysis(GOOD))
+    assert analysis_succeeded(_normalize_analysis(merge_chunk_analyses(CHUNKS, [GOOD, GOOD])))
+
+
+def test_partially_failed_merge_is_marked_and_keeps_error_text_out():
+    merged = _normalize_analysis(merge_chunk_analyses(CHUNKS, [GOOD, _failed_analysis(RuntimeError("boom"))]))
+    assert not analysis_succeeded(merged)
+    assert "1 of 2 chunks failed" in analysis_error(merged)
+    assert "failed" not in merged["logical_flow"] and "failed" not in merged["summary"]
+    assert merged["summary"] == "About cells."
+
+
+def test_fully_failed_merge_is_a_failure():
+    merged = _normalize_analysis(merge_chunk_analyses(CHUNKS, [_failed_analysis(RuntimeError("boom"))] * 2))
+    assert not analysis_succeeded(merged)
+    assert merged["table_of_contents"] == [] and merged["key_terms"] == []
@@ -0,0 +1,37 @@
+# learn_tube_ai/tests/test_import_budget.py
+# Startup stays within benchmarks/import_budget.py's budget (IMPORT_BUDGET_MS, default 1500ms), and the
+# heavy dependencies are still imported lazily. Both run in fresh interpreters, as the app starts.
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.import_budget import APP_DIR, DEFAULT_FORBIDDEN
+
+LAZY = ("anthropic", "numpy", "requests", "youtube_transcript_api")
+
+
+def _env(tmp_path) -> dict:
+    env = dict(os.environ)
+    env.pop("ANTHROPIC_API_KEY", None)
+    env.update({"LLM_PROVIDER": "mock", "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}",
+                "EMBEDDING_DIR": str(tmp_path / "embeddings"), "LLM_CACHE_SQLITE_PATH": "",
+                "PREFETCH_ENABLED": "0", "LOG_LEVEL": "WARNING"})
+    return env
+
+
+def test_startup_imports_are_within_budget(tmp_path):
+    script = os.path.join(APP_DIR, "benchmarks", "import_budget.py")
+    completed = subprocess.run([sys.executable, script, "--repeat", "3"], cwd=APP_DIR, env=_env(tmp_path),
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+
+
+def test_create_app_leaves_heavy_dependencies_unimported(tmp_path):
+    assert set(LAZY) <= set(DEFAULT_FORBIDDEN)
+    command = ("import json, sys; from app import create_app; create_app(); "
+               f"print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}} & {set(LAZY)!r})))")
+    completed = subprocess.run([sys.executable, "-c", command], cwd=APP_DIR, env=_env(tmp_path),
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,197 @@
+# learn_tube_ai/tests/test_job_queue.py
+# Abandoned-job detection goes by heartbeat, not by progress, and a job failed as abandoned stays failed.
+# Concurrent submits and pipeline runs for one (video_id, languages) share a single execution.
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app import db
+from app.models import Job
+from app.services import job_service
+from app.services.job_service import job_queue
+
+LONG_AGO = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _add_job(status="queued", heartbeat_at=None, created_at=LONG_AGO) -> str:
+    job = Job(id=uuid.uuid4().hex, kind="process_video", status=status, progress=status, video_id="dQw4w9WgXcQ",
+              payload={"video_id": "dQw4w9WgXcQ", "languages": None}, created_at=created_at, heartbeat_at=heartbeat_at)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def _status(job_id) -> str:
+    db.session.expire_all()
+    return db.session.get(Job, job_id).status
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+        with job_queue._held_lock:
+            job_queue._held.clear()
+
+
+def test_stale_jobs_are_failed_but_jobs_with_a_recent_heartbeat_are_not(ctx):
+    dead = _add_job(status="running", heartbeat_at=LONG_AGO)
+    slow = _add_job(status="running", heartbeat_at=datetime.now(timezone.utc).replace(tzinfo=None))
+
+    assert job_queue.fail_stale_jobs() == 1
+    assert _status(dead) == "failed"
+    assert _status(slow) == "running"
+
+
+def test_heartbeat_keeps_a_backlogged_job_alive(ctx):
+    backlogged = _add_job(status="queued", heartbeat_at=LONG_AGO)
+    with job_queue._held_lock:
+        job_queue._held.add(backlogged)
+
+    assert job_queue.beat() == 1
+    assert job_queue.fail_stale_jobs() == 0
+    assert job_queue.fail_if_stale(db.session.get(Job, backlogged)).status == "queued"
+
+
+def test_run_skips_a_job_that_was_failed_while_queued(ctx, monkeypatch):
+    calls = []
+    monkeypatch.setitem(job_service.JOB_HANDLERS, "process_video", lambda job, report: calls.append(job.id) or ({}, 200))
+    job_id = _add_job(status="queued", heartbeat_at=LONG_AGO)
+    assert job_queue.fail_stale_jobs() == 1
+
+    job_queue._run(job_id)
+
+    assert calls == []
+    assert _status(job_id) == "failed"
+
+
+def test_run_keeps_the_failure_of_a_job_abandoned_while_running(ctx, monkeypatch):
+    def handler(job, report_progress):
+        job_queue.fail_if_stale(db.session.get(Job, job.id)) # heartbeat_at was just stamped: not stale
+        job_queue._mark_abandoned(db.session.get(Job, job.id)) # another process gave up on it anyway
+        db.session.commit()
+        report_progress("llm_analysis")
+        return {"message": "ok"}, 200
+
+    monkeypatch.setitem(job_service.JOB_HANDLERS, "process_video", handler)
+    job_id = _add_job(status="queued")
+
+    job_queue._run(job_id)
+
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.progress) == ("failed", "failed")
+
+
+def test_run_claims_a_queued_job_and_records_its_result(ctx, monkeypatch):
+    monkeypatch.setitem(job_service.JOB_HANDLERS, "process_video", lambda job, report: ({"message": "ok"}, 200))
+    job_id = _add_job(status="queued")
+
+    job_queue._run(job_id)
+
+    db.session.expire_all()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.progress, job.result, job.result_status) == ("done", "done", {"message": "ok"}, 200)
+    assert job.worker == job_queue.worker_id and job.heartbeat_at is not None
+
+
+def _submit_concurrently(app, languages_per_caller) -> list:
+    def submit(languages):
+        with app.app_context():
+            return job_queue.submit("process_video", {"video_id": "dQw4w9WgXcQ", "video_url": "https://youtu.be/dQw4w9WgXcQ",
+                                                      "languages": languages}, video_id="dQw4w9WgXcQ").id
+    with ThreadPoolExecutor(len(languages_per_caller)) as pool:
+        return list(pool.map(submit, languages_per_caller))
+
+
+def _wait_for_jobs(job_ids):
+    wait_until(lambda: all(_status(job_id) in ("done", "failed") for job_id in job_ids))
+
+
+def test_concurrent_submits_for_one_video_share_a_job(app, ctx, monkeypatch):
+    release, runs = threading.Event(), []
+
+    def handler(job, report_progress):
+        runs.append(job.id)
+        release.wait(5)
+        return {"message": "ok"}, 200
+
+    monkeypatch.setitem(job_service.JOB_HANDLERS, "process_video", handler)
+    job_ids = _submit_concurrently(app, [["en"]] * 8)
+    release.set()
+    _wait_for_jobs(set(job_ids))
+
+    assert len(set(job_ids)) == 1
+    assert runs == job_ids[:1]
+
+
+def test_submits_with_different_languages_get_their_own_jobs(app, ctx, monkeypatch):
+    release, runs = threading.Event(), []
+
+    def handler(job, report_progress):
+        runs.append(tuple(job.payload["languages"]))
+        release.wait(5)
+        return {"message": "ok"}, 200
+
+    monkeypatch.setitem(job_service.JOB_HANDLERS, "process_video", handler)
+    job_ids = _submit_concurrently(app, [["en"], ["de"], ["en"], ["de"]])
+    release.set()
+    _wait_for_jobs(set(job_ids))
+
+    assert len(set(job_ids)) == 2
+    assert sorted(runs) == [("de",), ("en",)]
+
+
+def _run_pipelines(pool, app, languages_per_job) -> list:
+    def run(languages):
+        job = SimpleNamespace(payload={"video_id": "dQw4w9WgXcQ", "video_url": "https://youtu.be/dQw4w9WgXcQ", "languages": languages})
+        with app.app_context():
+            return job_service.run_process_video_job(job, lambda stage: None)
+    return [pool.submit(run, languages) for languages in languages_per_job]
+
+
+def test_concurrent_pipelines_for_one_key_fetch_once_and_share_errors(app, ctx, monkeypatch, singleflight_joins):
+    # Jobs of other processes are not deduplicated by submit; video_flight still runs their fetch once.
+    release, fetches = threading.Event(), []
+
+    def fetch_and_analyze_video(video_id, languages):
+        fetches.append(languages)
+        release.wait(5)
+        raise job_service.LLMOverloadedError("busy", retry_after=3)
+
+    monkeypatch.setattr(job_service, "fetch_and_analyze_video", fetch_and_analyze_video)
+    with ThreadPoolExecutor(6) as pool:
+        futures = _run_pipelines(pool, app, [["en"]] * 6)
+        wait_until(lambda: len(fetches) + len(singleflight_joins) == 6)
+        release.set()
+        statuses = [future.result(5)[1] for future in futures]
+
+    assert fetches == [["en"]]
+    assert statuses == [503] * 6
+
+
+def test_concurrent_pipelines_for_different_languages_are_not_merged(app, ctx, monkeypatch):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fetch_and_analyze_video(video_id, languages):
+        barrier.wait() # only returns if both languages are fetched at the same time
+        return {"text": None, "error": f"no {languages[0]} transcript", "analysis": None, "listing": None}
+
+    monkeypatch.setattr(job_service, "fetch_and_analyze_video", fetch_and_analyze_video)
+    with ThreadPoolExecutor(2) as pool:
+        futures = _run_pipelines(pool, app, [["en"], ["de"]])
+        details = [future.result(5)[0]["details"] for future in futures]
+
+    assert details == ["no en transcript", "no de transcript"]
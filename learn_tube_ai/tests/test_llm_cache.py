@@ -0,0 +1,159 @@
+# learn_tube_ai/tests/test_llm_cache.py
+# LLMCache keys, backends and stats, and that failed, incomplete or placeholder analyses are never cached.
+import threading
+
+import pytest
+
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMCache, MemoryLRUBackend, SQLiteBackend, llm_cache
+from app.services.llm_providers import LLMResult
+from app.services.llm_service import generate_analysis_from_text, llm_client, stream_analysis_from_text
+from app.services.video_processing_service import process_video_for_llm_analysis
+
+ANALYSIS = {"table_of_contents": [{"title": "Intro", "timestamp_seconds": 0}], "key_terms": [],
+            "logical_flow": "Starts with cells.", "summary": "About cells."}
+
+
+class FakeProvider:
+    """Answers complete() with `text` (or raises `error`) and stream() with `text` in small deltas."""
+
+    name = "fake"
+
+    def __init__(self, text="", error=None):
+        self.text, self.error, self.calls = text, error, 0
+
+    def complete(self, model, max_tokens, messages, system=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return LLMResult(text=self.text, input_tokens=1, output_tokens=1)
+
+    def stream(self, model, max_tokens, messages, system=None):
+        self.calls += 1
+        for i in range(0, len(self.text), 7):
+            yield self.text[i:i + 7]
+
+
+@pytest.fixture
+def provider(app, monkeypatch):
+    """The app's llm_cache (memory backend only) with llm_client answering through a FakeProvider."""
+    fake = FakeProvider()
+    monkeypatch.setattr(llm_client, "_provider", fake)
+    llm_cache.clear()
+    yield fake
+    llm_cache.clear()
+
+
+def _entries(cache) -> int:
+    return sum(backend["entries"] for backend in cache.stats()["backends"])
+
+
+def test_keys_are_stable_and_unambiguous():
+    # A different key scheme would orphan every entry of the persistent SQLite cache.
+    assert LLMCache.make_key("prompt", "model", "text") == "9cd43a4e3606e1b2794c2f2d774e29ce66f16b99dc877fd04aac4319375efbf4"
+    assert LLMCache.make_key("ab", "c", "") != LLMCache.make_key("a", "bc", "")
+    assert LLMCache.make_key("prompt", "model", "text") != LLMCache.make_key("prompt", "other-model", "text")
+    assert LLMCache.make_key(None, "model", "text") == LLMCache.make_key("", "model", "text")
+    assert LLMCache.make_key("p", "m", "schön") != LLMCache.make_key("p", "m", "schon")
+
+
+def test_memory_backend_evicts_the_least_recently_used_entry():
+    backend = MemoryLRUBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1 # "b" is now the least recently used
+    backend.set("c", 3)
+    assert (backend.get("a"), backend.get("b"), backend.get("c"), len(backend)) == (1, None, 3, 2)
+
+
+def test_memory_backend_expires_entries_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+    backend = MemoryLRUBackend(ttl_seconds=60)
+    backend.set("a", 1)
+    now[0] += 59
+    assert backend.get("a") == 1
+    now[0] += 2
+    assert backend.get("a") is None and len(backend) == 0
+
+
+def test_sqlite_backend_uses_one_connection_per_thread(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "llm_cache.db"))
+    connections, errors = {}, []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                backend.set(f"{n}-{i}", {"n": n, "i": i})
+                assert backend.get(f"{n}-{i}") == {"n": n, "i": i}
+            connections[n] = backend._connect()
+            assert backend._connect() is connections[n]
+        except Exception as e: # surfaced below; an assert in a thread would be lost
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len({id(conn) for conn in connections.values()} | {id(backend._connect())}) == 5
+    assert len(backend) == 80
+    assert SQLiteBackend(str(tmp_path / "llm_cache.db")).get("3-19") == {"n": 3, "i": 19} # persisted
+
+
+def test_stats_count_hits_and_misses_and_promote_slower_hits(tmp_path):
+    memory, sqlite = MemoryLRUBackend(), SQLiteBackend(str(tmp_path / "llm_cache.db"))
+    sqlite.set("warm", ANALYSIS)
+    cache = LLMCache([memory, sqlite])
+
+    assert cache.stats()["hit_ratio"] is None
+    assert cache.get("cold") is None
+    assert cache.get("warm") == ANALYSIS
+    assert memory.get("warm") == ANALYSIS # copied into the faster backend
+    assert cache.get_or_compute("p", "m", "t", lambda: ANALYSIS) == ANALYSIS # miss, then stored
+    assert cache.get_or_compute("p", "m", "t", lambda: pytest.fail("computed twice")) == ANALYSIS
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (2, 2, 0.5)
+    assert stats["backends"] == [{"name": "memory", "entries": 2}, {"name": "sqlite", "entries": 2}]
+
+
+def test_failures_are_not_stored():
+    def fail():
+        raise RuntimeError("LLM down")
+
+    cache = LLMCache()
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("p", "m", "t", fail)
+    assert cache.get_or_compute("p", "m", "t", lambda: {"error": "LLM down"}) == {"error": "LLM down"}
+    cache.set("k", None)
+    assert _entries(cache) == 0
+
+
+def test_failed_llm_call_is_not_cached(provider):
+    provider.error = RuntimeError("connection reset")
+    assert generate_analysis_from_text("cells make energy")["error"] == "connection reset"
+    assert _entries(llm_cache) == 0
+
+    provider.error, provider.text = None, '{"summary": "About cells."}'
+    assert generate_analysis_from_text("cells make energy") == {"summary": "About cells."}
+    assert generate_analysis_from_text("cells make energy") == {"summary": "About cells."}
+    assert provider.calls == 2 and _entries(llm_cache) == 1
+
+
+def test_cut_off_stream_is_not_cached(provider):
+    provider.text = '{"table_of_contents": [{"title": "Intro", "timestamp_seconds": 0}], "key_terms": [], "logical_fl'
+    analysis = list(stream_analysis_from_text("cells make energy"))[-1]["analysis"]
+    assert analysis["table_of_contents"] == [{"title": "Intro", "timestamp_seconds": 0}]
+    assert analysis["error"].startswith("LLM response was cut off")
+    assert _entries(llm_cache) == 0
+
+
+def test_placeholder_analysis_is_not_cached(provider, monkeypatch):
+    monkeypatch.setattr(llm_client, "provider_name", "auto")
+    monkeypatch.setattr(llm_client, "api_key", None)
+    analysis = process_video_for_llm_analysis("aaaaaaaaaaa", "cells make energy")
+    assert analysis["logical_flow"].startswith("LLM analysis skipped")
+    assert provider.calls == 0 and _entries(llm_cache) == 0
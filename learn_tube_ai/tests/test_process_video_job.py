@@ -0,0 +1,52 @@
+# learn_tube_ai/tests/test_process_video_job.py
+# /api/process_video's job only caches a video whose LLM analysis completed.
+from types import SimpleNamespace
+
+from app.models import Video, VideoPayload
+from app.services import job_service
+from app.services.llm_service import _failed_analysis, merge_chunk_analyses
+from app.services.video_processing_service import _normalize_analysis
+
+VIDEO_ID = "aaaaaaaaaaa"
+CHUNKS = [{"index": 0, "start": 0.0, "end": 60.0}, {"index": 1, "start": 60.0, "end": 120.0}]
+GOOD = {"table_of_contents": [{"title": "Intro", "timestamp_seconds": 5}], "key_terms": [{"term": "cell"}],
+        "logical_flow": "Starts with cells.", "summary": "About cells."}
+
+
+def _fetch_result(analysis):
+    return {"text": "cells make energy", "segments": [{"text": "cells make energy", "start": 0.0, "duration": 2.0}],
+            "language": "en", "translated_from": None, "listing": None, "error": None, "analysis": analysis}
+
+
+def _run_job(monkeypatch, analysis):
+    monkeypatch.setattr(job_service, "fetch_and_analyze_video", lambda video_id, languages: _fetch_result(analysis))
+    job = SimpleNamespace(payload={"video_id": VIDEO_ID, "video_url": f"https://youtu.be/{VIDEO_ID}", "languages": None})
+    return job_service.run_process_video_job(job, lambda stage: None)
+
+
+def test_partial_chunk_failure_is_returned_but_not_cached(app, monkeypatch):
+    analysis = _normalize_analysis(merge_chunk_analyses(CHUNKS, [GOOD, _failed_analysis(RuntimeError("boom"))]))
+    with app.app_context():
+        payload, status = _run_job(monkeypatch, analysis)
+        assert status == 200
+        assert payload["transcript_text"] == "cells make energy"
+        assert payload["analysis_error"].startswith("1 of 2 chunks failed")
+        assert payload["analysis"]["summary"] == "About cells."
+        assert Video.query.filter_by(video_id=VIDEO_ID).count() == 0
+        assert VideoPayload.query.count() == 0
+
+
+def test_placeholder_analysis_is_not_cached(app, monkeypatch):
+    with app.app_context():
+        payload, status = _run_job(monkeypatch, {"table_of_contents": [], "key_terms": [], "summary": "Summary skipped.",
+                                                 "logical_flow": "LLM analysis skipped: API key not configured."})
+        assert status == 200 and payload["analysis_error"].startswith("LLM analysis skipped")
+        assert Video.query.filter_by(video_id=VIDEO_ID).count() == 0
+
+
+def test_complete_analysis_is_cached(app, monkeypatch):
+    with app.app_context():
+        payload, status = _run_job(monkeypatch, _normalize_analysis(merge_chunk_analyses(CHUNKS, [GOOD, GOOD])))
+        assert status == 200 and "analysis_error" not in payload
+        assert Video.query.filter_by(video_id=VIDEO_ID).one().summary == "About cells. About cells."
+        assert VideoPayload.query.count() > 0
@@ -0,0 +1,67 @@
+# learn_tube_ai/tests/test_process_video_stream.py
+# /api/process_video/stream only saves a video whose streamed LLM analysis completed.
+import json
+
+from app import routes
+from app.models import Video
+
+VIDEO_ID = "bbbbbbbbbbb"
+FETCH_RESULT = {"text": "cells make energy", "segments": [{"text": "cells make energy", "start": 0.0, "duration": 2.0}],
+                "language": "en", "translated_from": None, "error": None,
+                "listing": {"transcripts": [{"language_code": "en", "language": "English", "is_generated": False, "is_translatable": True}],
+                            "translation_languages": []}}
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if line.startswith(("event:", "data:")))
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _stream(client, monkeypatch, analysis):
+    monkeypatch.setattr(routes, "get_youtube_transcript", lambda video_id, languages: dict(FETCH_RESULT))
+    monkeypatch.setattr(routes, "stream_llm_analysis", lambda video_id, text, segments: iter([{"type": "analysis", "analysis": analysis}]))
+    response = client.get(f"/api/process_video/stream?video_url=https://youtu.be/{VIDEO_ID}")
+    return _events(response.get_data(as_text=True))
+
+
+def test_failed_analysis_is_streamed_then_reported_not_saved(app, client, monkeypatch):
+    failed = {"table_of_contents": [], "key_terms": [], "logical_flow": "LLM call failed: boom",
+              "summary": "Summary generation failed: boom", "error": "boom"}
+    events = _stream(client, monkeypatch, failed)
+    assert [name for name, _ in events] == ["transcript", "analysis", "error"]
+    assert events[-1][1]["details"] == "boom"
+    with app.app_context():
+        assert Video.query.filter_by(video_id=VIDEO_ID).count() == 0
+
+
+def test_complete_analysis_is_saved(app, client, monkeypatch):
+    good = {"table_of_contents": [], "key_terms": [], "logical_flow": "Starts with cells.", "summary": "About cells."}
+    events = _stream(client, monkeypatch, good)
+    assert [name for name, _ in events] == ["transcript", "analysis", "done"]
+    with app.app_context():
+        assert Video.query.filter_by(video_id=VIDEO_ID).one().summary == "About cells."
+
+
+def test_asgi_stream_does_not_save_failed_analysis(app, monkeypatch):
+    from starlette.applications import Starlette
+    from starlette.testclient import TestClient
+    from app import async_views
+
+    async def fetch(video_id, languages):
+        return dict(FETCH_RESULT)
+
+    async def analyze(video_id, text, segments):
+        yield {"type": "analysis", "analysis": {"table_of_contents": [], "key_terms": [], "logical_flow": "LLM call failed: boom",
+                                                "summary": "Summary generation failed: boom", "error": "boom"}}
+
+    monkeypatch.setattr(async_views, "get_youtube_transcript_async", fetch)
+    monkeypatch.setattr(async_views, "stream_llm_analysis_async", analyze)
+    with TestClient(Starlette(routes=async_views.build_async_routes(app))) as asgi_client:
+        response = asgi_client.get(f"/api/process_video/stream?video_url=https://youtu.be/{VIDEO_ID}")
+    assert [name for name, _ in _events(response.text)] == ["transcript", "analysis", "error"]
+    with app.app_context():
+        assert Video.query.filter_by(video_id=VIDEO_ID).count() == 0
@@ -0,0 +1,69 @@
+# learn_tube_ai/tests/test_segment_codec.py
+# Round trips of app/services/segment_codec.py for every compression (zstd only with zstandard installed).
+import struct
+
+import pytest
+
+from app.services import segment_codec
+from app.services.segment_codec import FLAG_ZLIB, MAGIC, decode_columns, decode_segments, encode_segments
+
+COMPRESSIONS = ["none", "zlib", pytest.param("zstd", marks=pytest.mark.skipif(
+    segment_codec.zstandard is None, reason="zstandard is not installed"))]
+
+SEGMENTS = [
+    {"text": "Gradient descent, step by step", "start": 0.0, "duration": 4.2},
+    {"text": "Lernrate – größer ist nicht besser", "start": 4.2, "duration": 3.05},
+    {"text": "学习率 🚀", "start": 7.25, "duration": 12.34},
+    {"text": "", "start": 3600.5, "duration": 0.001},
+]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_round_trip(compression):
+    assert decode_segments(encode_segments(SEGMENTS, compression)) == SEGMENTS
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_empty_list_round_trips(compression):
+    blob = encode_segments([], compression)
+    assert decode_segments(blob) == []
+    starts, durations, texts = decode_columns(blob)
+    assert (list(starts), list(durations), texts) == ([], [], [])
+
+
+def test_ascii_and_non_ascii_texts_decode_alike():
+    ascii_only = [{"text": "plain", "start": 1, "duration": 2}, {"text": "text", "start": 3, "duration": 4}]
+    assert decode_columns(encode_segments(ascii_only))[2] == ["plain", "text"]
+    assert decode_columns(encode_segments(SEGMENTS))[2] == [s["text"] for s in SEGMENTS]
+
+
+def test_times_are_rounded_to_milliseconds():
+    segments = [{"text": "a", "start": 12.3456, "duration": 0.0004}, {"text": "b", "start": 2.0004, "duration": None},
+                {"text": "c"}, {"text": "d", "start": 1.9999999, "duration": 0.0015}]
+    assert [(s["start"], s["duration"]) for s in decode_segments(encode_segments(segments))] == [
+        (12.346, 0.0), (2.0, 0.0), (0.0, 0.0), (2.0, 0.002)]
+
+
+def test_compressed_blobs_carry_their_flag():
+    blob = encode_segments(SEGMENTS, "zlib")
+    assert blob[:4] == MAGIC and blob[4] == FLAG_ZLIB
+    assert len(blob) < len(encode_segments(SEGMENTS * 20, "none"))
+
+
+def test_unknown_compression_is_rejected():
+    with pytest.raises(ValueError):
+        encode_segments(SEGMENTS, "lz4")
+
+
+@pytest.mark.parametrize("blob", [
+    b"",
+    b"LTS1\x00",
+    b"JSON" + encode_segments(SEGMENTS)[4:],
+    encode_segments(SEGMENTS)[:9],
+    encode_segments(SEGMENTS)[:40],
+    encode_segments(SEGMENTS)[:-1],
+    struct.pack("<4sBI", MAGIC, FLAG_ZLIB, len(SEGMENTS)) + b"not zlib data",
+], ids=["empty", "short_header", "bad_magic", "header_only", "truncated_columns", "truncated_text", "corrupt_zlib"])
+def test_corrupt_blobs_raise_value_error(blob):
+    with pytest.raises(ValueError):
+        decode_segments(blob)
@@ -0,0 +1,70 @@
+# learn_tube_ai/tests/test_singleflight.py
+# Concurrent SingleFlight.do calls: one execution per key, shared result or exception, distinct keys apart.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_concurrent_callers_share_one_execution(singleflight_joins):
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def work(key):
+        calls.append(key)
+        release.wait(5)
+        return {"key": key}
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(flight.do, ("vid", ("en",)), work, "vid") for _ in range(CALLERS)]
+        wait_until(lambda: len(calls) + len(singleflight_joins) == CALLERS)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert calls == ["vid"]
+    assert all(result is results[0] for result in results)
+    assert not flight.in_flight(("vid", ("en",)))
+
+
+def test_different_keys_are_not_merged():
+    flight, barrier = SingleFlight(), threading.Barrier(2, timeout=5)
+
+    def work(languages):
+        barrier.wait() # only returns if both keys run at the same time
+        return languages
+
+    with ThreadPoolExecutor(2) as pool:
+        en = pool.submit(flight.do, ("vid", ("en",)), work, ("en",))
+        de = pool.submit(flight.do, ("vid", ("de",)), work, ("de",))
+        assert (en.result(5), de.result(5)) == (("en",), ("de",))
+
+
+def test_exception_reaches_every_waiter_and_clears_the_key(singleflight_joins):
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        raise RuntimeError("transcript fetch failed")
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(flight.do, "vid", work) for _ in range(CALLERS)]
+        wait_until(lambda: len(calls) + len(singleflight_joins) == CALLERS)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="transcript fetch failed"):
+                future.result(5)
+
+    assert len(calls) == 1
+    assert flight.do("vid", lambda: "retried") == "retried"
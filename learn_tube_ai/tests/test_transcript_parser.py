@@ -0,0 +1,166 @@
+# learn_tube_ai/tests/test_transcript_parser.py
+# Format fixtures for app/services/transcript_parser.py, plus pytest-benchmark cases on the synthetic
+# transcripts of benchmarks/bench_transcript_parser.py (100k and 1M lines need --run-large).
+import functools
+import importlib.util
+
+import pytest
+
+from app.services.transcript_parser import iter_segments, parse_transcript, segments_to_text
+from benchmarks.bench_transcript_parser import synthetic_transcript
+
+# Copy-paste from YouTube's "Show transcript" panel: timestamps on their own line or in front of the text.
+COPY_PASTE = """Notes from the lecture
+0:00
+Welcome back to the channel
+0:04
+today we're looking at gradient descent
+
+[0:09] and why the learning rate matters
+1:15.5
+  a smaller step   size converges
+more slowly
+1:02:03 thanks for watching
+"""
+
+# What the parser inlined in process_video_with_custom_transcript_route returned for COPY_PASTE.
+COPY_PASTE_SEGMENTS = [
+    {"text": "Notes from the lecture", "start": 0.0, "duration": 0.1},
+    {"text": "Welcome back to the channel", "start": 0.0, "duration": 4.0},
+    {"text": "today we're looking at gradient descent", "start": 4.0, "duration": 5.0},
+    {"text": "and why the learning rate matters", "start": 9.0, "duration": 66.5},
+    {"text": "a smaller step   size converges more slowly", "start": 75.5, "duration": 3647.5},
+    {"text": "thanks for watching", "start": 3723.0, "duration": 2.0},
+]
+
+SRT = """1
+00:00:01,000 --> 00:00:03,500
+Hello there
+second line
+
+2
+00:00:04,000 --> 00:00:06,000
+42
+
+3
+01:00:00,250 --> 01:00:01,000
+<i>the end</i>
+"""
+
+VTT = """﻿WEBVTT - Lecture 3
+Kind: captions
+Language: en
+
+NOTE
+This comment spans
+two lines.
+
+STYLE
+::cue { color: yellow }
+
+intro
+00:01.000 --> 00:03.250 align:start position:0%
+<v Instructor>Hello <c.yellow>world</c></v>
+
+00:00:04.000 --> 00:00:05.000
+<00:00:04.500>karaoke
+"""
+
+
+def test_copy_paste_parses_like_the_inline_parser():
+    assert parse_transcript(COPY_PASTE) == COPY_PASTE_SEGMENTS
+    assert parse_transcript(COPY_PASTE, "youtube") == COPY_PASTE_SEGMENTS
+
+
+def test_text_after_the_last_timestamp_keeps_that_timestamp():
+    # The inline parser appended it to the previous segment, dropping the 0:09 start.
+    assert parse_transcript("0:00\nfirst\n0:09\nsecond\nand more") == [
+        {"text": "first", "start": 0.0, "duration": 9.0},
+        {"text": "second and more", "start": 9.0, "duration": 2.0},
+    ]
+
+
+def test_durations_are_filled_in_from_the_next_start():
+    segments = parse_transcript("0:10 a\n0:10 b\n0:12.25 c\n" + "0:20 " + "x" * 60)
+    assert [s["duration"] for s in segments] == [0.1, 2.25, 7.75, 4.0]
+
+
+def test_srt_drops_indices_and_keeps_digit_only_text():
+    assert parse_transcript(SRT) == [
+        {"text": "Hello there second line", "start": 1.0, "duration": 2.5},
+        {"text": "42", "start": 4.0, "duration": 2.0},
+        {"text": "the end", "start": 3600.25, "duration": 0.75},
+    ]
+
+
+def test_srt_without_blank_lines_between_cues():
+    srt = "1\n00:00:01,000 --> 00:00:02,000\nFirst\n2\n00:00:02,500 --> 00:00:04,000\nSecond\n"
+    assert parse_transcript(srt, "srt") == [
+        {"text": "First", "start": 1.0, "duration": 1.0},
+        {"text": "Second", "start": 2.5, "duration": 1.5},
+    ]
+
+
+def test_vtt_drops_header_note_style_identifiers_and_tags():
+    assert parse_transcript(VTT) == [
+        {"text": "Hello world", "start": 1.0, "duration": 2.25},
+        {"text": "karaoke", "start": 4.0, "duration": 1.0},
+    ]
+
+
+def test_text_without_timestamps():
+    assert parse_transcript("just some text") == [{"text": "just some text", "start": 0.0, "duration": 2.0}]
+    assert parse_transcript("0:05") == [{"text": "0:05", "start": 0, "duration": 600}]
+    assert parse_transcript("") == [] and parse_transcript("  \n") == []
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        parse_transcript("0:00 hi", "sbv")
+
+
+def test_streamed_file_parses_like_the_string(tmp_path):
+    path = tmp_path / "captions.vtt"
+    path.write_text(VTT, encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        assert list(iter_segments(f)) == parse_transcript(VTT)
+
+
+def test_segments_to_text_round_trips_starts():
+    segments = parse_transcript(SRT)
+    assert [s["start"] for s in parse_transcript(segments_to_text(segments))] == [1.0, 4.0, 3600.0]
+
+
+# --- Benchmarks ---
+
+requires_benchmark = pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None,
+                                        reason="pytest-benchmark is not installed")
+SIZES = [1_000, 10_000, pytest.param(100_000, marks=pytest.mark.large), pytest.param(1_000_000, marks=pytest.mark.large)]
+
+
+@functools.lru_cache(maxsize=None)
+def _transcript(fmt: str, lines: int) -> str:
+    return synthetic_transcript(fmt, lines)
+
+
+@requires_benchmark
+@pytest.mark.parametrize("lines", SIZES)
+@pytest.mark.parametrize("fmt", ["youtube", "srt", "vtt"])
+def test_benchmark_parse(benchmark, fmt, lines):
+    text = _transcript(fmt, lines)
+    segments = benchmark.pedantic(parse_transcript, args=(text, fmt), rounds=3 if lines > 10_000 else 10, iterations=1)
+    per_cue = {"youtube": 2, "srt": 4, "vtt": 3}[fmt]
+    assert len(segments) == pytest.approx(lines / per_cue, abs=1)
+
+
+@requires_benchmark
+@pytest.mark.parametrize("lines", SIZES)
+def test_benchmark_parse_streamed(benchmark, tmp_path, lines):
+    path = tmp_path / "captions.srt"
+    path.write_text(_transcript("srt", lines), encoding="utf-8")
+
+    def count():
+        with open(path, encoding="utf-8") as f:
+            return sum(1 for _ in iter_segments(f, "srt"))
+
+    assert benchmark.pedantic(count, rounds=3 if lines > 10_000 else 10, iterations=1) == lines // 4